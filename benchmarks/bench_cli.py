@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# bench_cli -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Latency benchmarks of clocking command-line with cold and warm processes
+
+Every command runs the real entry point in a new process:
+cold runs compile every module, like the first run after install;
+warm runs use the bytecode cache, like every other run.
+
+python benchmarks/bench_cli.py --runs 30 --importtime
+python benchmarks/bench_cli.py --baseline cli.json --save
+"""
+
+# region imports
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+from bench_core import THRESHOLD, compare
+from clocking import __version__, generate_working_hours, make_database
+
+# endregion
+
+# region globals
+COMMANDS = {
+    "version": ["--version"],
+    "print": ["print", "--year", "2010", "--month", "5"],
+    "set": ["set", "--hours", "8", "--date", "06/05/2030"],
+    "config": ["config", "--print"],
+    "report": ["report", "--year", "2010"],
+}
+PERCENTILES = (50, 90, 99)
+
+
+# endregion
+
+
+# region functions
+def entry_point():
+    """Command of clk entry point
+
+    :return: list
+    """
+    script = shutil.which("clk")
+    # Not installed: same main function of entry point
+    return [script] if script else [sys.executable, "-m", "clocking.client"]
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile
+
+    :param values: list of numbers
+    :param percent: percentile from 0 to 100
+    :return: float
+    """
+    values = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+def run_command(argv, env):
+    """Time command in a new process
+
+    :param argv: command-line arguments
+    :param env: environment of process
+    :return: float seconds
+    :raise: CalledProcessError
+    """
+    start = time.perf_counter()
+    subprocess.run(argv, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def time_command(argv, env, runs, cold_runs):
+    """Time cold and warm processes of command
+
+    :param argv: command-line arguments
+    :param env: environment of processes
+    :param runs: number of warm runs
+    :param cold_runs: number of cold runs
+    :return: dict of percentiles by mode
+    """
+    timings = {"cold": [], "warm": []}
+    for _ in range(cold_runs):
+        # Empty bytecode cache: every import compiles its module
+        with TemporaryDirectory() as pycache:
+            timings["cold"].append(
+                run_command(
+                    argv,
+                    {
+                        **env,
+                        "PYTHONPYCACHEPREFIX": pycache,
+                        "PYTHONDONTWRITEBYTECODE": "1",
+                    },
+                )
+            )
+    # First run fills bytecode cache
+    run_command(argv, env)
+    for _ in range(runs):
+        timings["warm"].append(run_command(argv, env))
+    return {
+        mode: {f"p{percent}": percentile(values, percent) for percent in PERCENTILES}
+        for mode, values in timings.items()
+        if values
+    }
+
+
+def import_times(argv, env, top=10):
+    """Slowest imports of command by -X importtime
+
+    :param argv: command-line arguments
+    :param env: environment of process
+    :param top: number of imports
+    :return: list of module, self and cumulative microseconds
+    """
+    command = [sys.executable, "-X", "importtime", "-m", "clocking.client"]
+    result = subprocess.run(
+        command + argv[len(entry_point()) :],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    imports = []
+    # import time: self [us] | cumulative | imported package
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_time, cumulative, module = line[len("import time:") :].split("|")
+        imports.append((module.strip(), int(self_time), int(cumulative)))
+    return sorted(imports, key=lambda item: item[2], reverse=True)[:top]
+
+
+def get_args():
+    """Get command-line arguments
+
+    :return: Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="latency benchmarks of clocking command-line",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("-r", "--runs", help="warm runs", type=int, default=20)
+    parser.add_argument("-c", "--cold-runs", help="cold runs", type=int, default=5)
+    parser.add_argument(
+        "-k", "--select", help="run commands that contain NAME", nargs="*"
+    )
+    parser.add_argument(
+        "-I",
+        "--importtime",
+        help="print slowest imports of every command",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-T", "--top", help="number of slowest imports", type=int, default=10
+    )
+    parser.add_argument("-b", "--baseline", help="JSON baseline file", metavar="FILE")
+    parser.add_argument(
+        "-s", "--save", help="save results as baseline", action="store_true"
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        help="allowed slowdown of p50, 0.2 is 20%%",
+        type=float,
+        default=THRESHOLD,
+    )
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = get_args()
+    results = {}
+    with TemporaryDirectory() as directory:
+        database = os.path.join(directory, "bench.db")
+        make_database(database)
+        generate_working_hours(database, users=1, years=1, prefix="bench")
+        # Never forward commands to a running daemon
+        env = {**os.environ, "CLOCKING_SOCKET": os.path.join(directory, "none.sock")}
+        for name, argv in COMMANDS.items():
+            if args.select and not any(selected in name for selected in args.select):
+                continue
+            argv = entry_point() + argv
+            if name != "version":
+                argv += ["--database", database, "--user", "bench0"]
+            timings = time_command(argv, env, args.runs, args.cold_runs)
+            for mode, percentiles in timings.items():
+                results[f"{name}:{mode}"] = percentiles["p50"]
+                print(
+                    f"{name:<8} {mode:<5} "
+                    + " ".join(
+                        f"{key} {seconds * 1e3:>8.1f} ms"
+                        for key, seconds in percentiles.items()
+                    )
+                )
+            if args.importtime:
+                for module, self_time, cumulative in import_times(argv, env, args.top):
+                    print(f"    {module:<40} {self_time:>8} us {cumulative:>8} us")
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)["results"]
+    if args.save and args.baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(
+                {
+                    "clocking": __version__,
+                    "python": platform.python_version(),
+                    "results": {**baseline, **results},
+                },
+                fh,
+                indent=4,
+            )
+        print(f"baseline saved into {args.baseline}")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, ratio in regressions:
+        print(
+            f"error: {name} p50 regressed {ratio * 100:.1f}%: "
+            f"{before * 1e3:.1f} ms -> {after * 1e3:.1f} ms"
+        )
+    if regressions:
+        sys.exit(1)
+
+
+# endregion
+
+# region main
+if __name__ == "__main__":
+    main()
+
+# endregion
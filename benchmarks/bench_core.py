@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# bench_core -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks of clocking core operations with baseline regression checks
+
+Run every benchmark on a synthetic database and compare with a baseline:
+python benchmarks/bench_core.py --years 10 --baseline baseline.json
+
+Save current results as new baseline:
+python benchmarks/bench_core.py --years 10 --baseline baseline.json --save
+"""
+
+# region imports
+import argparse
+import io
+import json
+import os
+import platform
+import sqlite3
+import sys
+import timeit
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from itertools import count
+from tempfile import TemporaryDirectory
+
+from clocking import (
+    __version__,
+    datestring_to_datetime,
+    generate_working_hours,
+    get_all_days,
+    get_current_configuration,
+    get_users_hours,
+    get_whole_month,
+    get_whole_year,
+    get_working_hours,
+    insert_working_hours,
+    make_database,
+    print_working_table,
+    sum_rewards,
+    Session,
+)
+
+# endregion
+
+# region globals
+BENCHMARKS = {}
+THRESHOLD = 0.2
+REPEAT = 5
+START = date(2010, 1, 4)
+
+
+# endregion
+
+
+# region functions
+def benchmark(name):
+    """Register benchmark function
+
+    Benchmark function gets database, user and number of years,
+    and returns the function to time.
+
+    :param name: name of benchmark
+    :return: decorator
+    """
+
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+@benchmark("get_working_hours")
+def bench_get_day(database, user, years):
+    return lambda: get_working_hours(
+        database, user, day=START.day, month=START.month, year=START.year
+    ).fetchall()
+
+
+@benchmark("get_whole_month")
+def bench_get_month(database, user, years):
+    return lambda: get_whole_month(database, user, START.year, START.month).fetchall()
+
+
+@benchmark("get_whole_year")
+def bench_get_year(database, user, years):
+    return lambda: get_whole_year(database, user, START.year).fetchall()
+
+
+@benchmark("get_all_days")
+def bench_get_all(database, user, years):
+    return lambda: get_all_days(database, user).fetchall()
+
+
+@benchmark("get_users_hours")
+def bench_get_users(database, user, years):
+    return lambda: get_users_hours(database, year=START.year).fetchall()
+
+
+@benchmark("datestring_to_datetime")
+def bench_datestring(database, user, years):
+    dates = ("2024-05-06", "06/05/2024", "2024.31.12", "20240506", "06.05.24")
+    return lambda: [datestring_to_datetime(string) for string in dates]
+
+
+@benchmark("sum_rewards")
+def bench_rewards(database, user, years):
+    rows = get_all_days(database, user).fetchall()
+    configuration = get_current_configuration(database, user)
+    return lambda: sum_rewards(rows, configuration)
+
+
+@benchmark("print_working_table")
+def bench_print(database, user, years):
+    def run():
+        with redirect_stdout(io.StringIO()):
+            print_working_table(get_all_days(database, user))
+
+    return run
+
+
+@benchmark("insert_working_hours")
+def bench_insert(database, user, years):
+    # Every call inserts a new day, after the last day of readers
+    after = date(START.year + years, 1, 1)
+    dates = (after + timedelta(days=day) for day in count())
+
+    def run():
+        day = next(dates)
+        insert_working_hours(
+            database, user, 8, day=day.day, month=day.month, year=day.year
+        )
+
+    return run
+
+
+def run_benchmarks(database, user, years, repeat=REPEAT, names=None):
+    """Time registered benchmarks
+
+    :param database: database file path
+    :param user: user of benchmarks
+    :param years: number of years of user
+    :param repeat: number of timing repetitions; best one is kept
+    :param names: names of benchmarks to run; None is every benchmark
+    :return: dict of seconds by call
+    """
+    results = {}
+    for name, func in BENCHMARKS.items():
+        if names and not any(selected in name for selected in names):
+            continue
+        timer = timeit.Timer(func(database, user, years))
+        # Number of calls of about 0.2 seconds
+        number, _ = timer.autorange()
+        results[name] = min(timer.repeat(repeat, number)) / number
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Compare results with baseline
+
+    :param results: dict of seconds by call
+    :param baseline: dict of seconds by call
+    :param threshold: allowed slowdown ratio
+    :return: list of regressions: name, baseline, result and ratio
+    """
+    regressions = []
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name] - 1
+        if ratio > threshold:
+            regressions.append((name, baseline[name], seconds, ratio))
+    return regressions
+
+
+def get_args():
+    """Get command-line arguments
+
+    :return: Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="benchmarks of clocking core operations",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "-Y", "--years", help="years of every user", type=int, default=1
+    )
+    parser.add_argument("-U", "--users", help="number of users", type=int, default=1)
+    parser.add_argument(
+        "-S", "--seed", help="seed of synthetic data", type=int, default=0
+    )
+    parser.add_argument(
+        "-r", "--repeat", help="timing repetitions", type=int, default=REPEAT
+    )
+    parser.add_argument(
+        "-k", "--select", help="run benchmarks that contain NAME", nargs="*"
+    )
+    parser.add_argument("-b", "--baseline", help="JSON baseline file", metavar="FILE")
+    parser.add_argument(
+        "-s", "--save", help="save results as baseline", action="store_true"
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        help="allowed slowdown, 0.2 is 20%%",
+        type=float,
+        default=THRESHOLD,
+    )
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = get_args()
+    with TemporaryDirectory() as directory:
+        database = os.path.join(directory, "bench.db")
+        make_database(database)
+        # Same synthetic data for same size and seed
+        users = list(
+            generate_working_hours(
+                database, args.users, args.years, args.seed, START.year
+            )
+        )
+        # Warm connection like command-line
+        with Session(database):
+            results = run_benchmarks(
+                database, users[0], args.years, args.repeat, args.select
+            )
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            data = json.load(fh)
+        # Baselines are comparable only on same data
+        size = ("years", "users", "seed")
+        if [data.get(key) for key in size] == [getattr(args, key) for key in size]:
+            baseline = data["results"]
+        else:
+            print(f"warning: baseline {args.baseline} has other data")
+    for name, seconds in results.items():
+        line = f"{name:<24} {seconds * 1e6:>12.1f} us"
+        if name in baseline:
+            line += f" {(seconds / baseline[name] - 1) * 100:>+8.1f}%"
+        print(line)
+    if args.save and args.baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(
+                {
+                    "clocking": __version__,
+                    "python": platform.python_version(),
+                    "sqlite": sqlite3.sqlite_version,
+                    "years": args.years,
+                    "users": args.users,
+                    "seed": args.seed,
+                    "results": {**baseline, **results},
+                },
+                fh,
+                indent=4,
+            )
+        print(f"baseline saved into {args.baseline}")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, ratio in regressions:
+        print(
+            f"error: {name} regressed {ratio * 100:.1f}%: "
+            f"{before * 1e6:.1f} us -> {after * 1e6:.1f} us"
+        )
+    if regressions:
+        sys.exit(1)
+
+
+# endregion
+
+# region main
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# bench_memory -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Memory benchmarks of print and save of working hours tables
+
+Measure peak and steady-state memory of print_working_table and
+save_working_table, in every format, with tracemalloc:
+python benchmarks/bench_memory.py --rows 10000 100000 1000000
+
+Tracing slows down rendering: rows of 1000000 need a long time
+and some GB of memory; select sizes with --rows.
+"""
+
+# region imports
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from tempfile import TemporaryDirectory
+
+from bench_core import THRESHOLD, compare
+from clocking import (
+    __version__,
+    generate_working_hours,
+    get_all_days,
+    get_current_configuration,
+    import_working_hours,
+    make_database,
+    print_working_table,
+    save_working_table,
+    Session,
+)
+
+# endregion
+
+# region globals
+ROWS = (10000, 100000, 1000000)
+FORMATS = ("table", "csv", "json", "html")
+USER = "bench0"
+START = date(2000, 1, 1)
+
+
+# endregion
+
+
+# region functions
+def make_rows_database(database, rows):
+    """Make database with a user of exactly rows working days
+
+    :param database: database file path
+    :param rows: number of working days
+    :return: None
+    """
+    make_database(database)
+    # Default configuration of generated users
+    generate_working_hours(database, users=1, years=0, prefix="bench")
+    days = (
+        json.dumps(
+            {
+                "date": (START + timedelta(days=day)).strftime("%d/%m/%Y"),
+                "hours": 8 + day % 3,
+                "description": f"task {day % 10}",
+            }
+        )
+        for day in range(rows)
+    )
+    import_working_hours(database, USER, days, fmt="ndjson", batch_size=50000)
+
+
+def measure(func, *args, **kwargs):
+    """Peak and steady-state memory of function
+
+    :param func: function to measure
+    :param args: arguments of function
+    :param kwargs: keyword arguments of function
+    :return: tuple of peak and steady-state bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        # Memory still referenced after call
+        gc.collect()
+        steady, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - start, steady - start
+
+
+def run_benchmarks(database, rows, directory, formats=FORMATS):
+    """Measure print and save in every format
+
+    :param database: database file path
+    :param rows: number of working days of database
+    :param directory: directory of saved files
+    :param formats: formats of tables
+    :return: dict of tuples of peak and steady-state bytes
+    """
+    results = {}
+    configuration = get_current_configuration(database, USER)
+    file = os.path.join(directory, "table.out")
+    # Modules and caches of first rendering aren't measured
+    from prettytable import PrettyTable
+
+    warm_up = PrettyTable(["warm"])
+    warm_up.add_row(["up"])
+    warm_up.get_string()
+
+    with open(os.devnull, "w") as devnull:
+
+        def options(fmt):
+            return {} if fmt == "table" else {fmt: True}
+
+        def print_table(fmt, **rewards):
+            # Output isn't kept in memory
+            with redirect_stdout(devnull):
+                print_working_table(
+                    get_all_days(database, USER), **options(fmt), **rewards
+                )
+
+        def save_table(fmt):
+            save_working_table(get_all_days(database, USER), file, **options(fmt))
+
+        for fmt in formats:
+            results[f"print:{fmt}:{rows}"] = measure(print_table, fmt)
+            results[f"save:{fmt}:{rows}"] = measure(save_table, fmt)
+        results[f"print:rewards:{rows}"] = measure(
+            print_table, "table", rewards=configuration
+        )
+    return results
+
+
+def get_args():
+    """Get command-line arguments
+
+    :return: Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="memory benchmarks of print and save of working hours tables",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "-n", "--rows", help="rows of tables", type=int, nargs="+", default=ROWS
+    )
+    parser.add_argument(
+        "-f", "--formats", help="formats of tables", nargs="+", default=FORMATS
+    )
+    parser.add_argument("-b", "--baseline", help="JSON baseline file", metavar="FILE")
+    parser.add_argument(
+        "-s", "--save", help="save results as baseline", action="store_true"
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        help="allowed growth of peak memory, 0.2 is 20%%",
+        type=float,
+        default=THRESHOLD,
+    )
+    return parser.parse_args()
+
+
+def main():
+    """main function"""
+    args = get_args()
+    results = {}
+    with TemporaryDirectory() as directory:
+        for rows in args.rows:
+            database = os.path.join(directory, f"bench{rows}.db")
+            make_rows_database(database, rows)
+            # Warm connection like command-line
+            with Session(database):
+                for name, (peak, steady) in run_benchmarks(
+                    database, rows, directory, args.formats
+                ).items():
+                    results[name] = peak
+                    print(
+                        f"{name:<24} peak {peak / 2**20:>10.1f} MiB "
+                        f"steady {steady / 2**20:>8.1f} MiB "
+                        f"{peak / rows:>8.0f} B/row"
+                    )
+            os.remove(database)
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)["results"]
+    if args.save and args.baseline:
+        with open(args.baseline, "w") as fh:
+            json.dump(
+                {
+                    "clocking": __version__,
+                    "python": platform.python_version(),
+                    "results": {**baseline, **results},
+                },
+                fh,
+                indent=4,
+            )
+        print(f"baseline saved into {args.baseline}")
+        return
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, ratio in regressions:
+        print(
+            f"error: {name} peak grew {ratio * 100:.1f}%: "
+            f"{before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB"
+        )
+    if regressions:
+        sys.exit(1)
+
+
+# endregion
+
+# region main
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -22,6 +22,146 @@
 
 __version__ = "0.1.2"
 
-from .core import *  # noqa: F403
-from .exception import *  # noqa: F403
-from .util import *  # noqa: F403
+# Public names of sub-modules, imported on first attribute access
+_SUBMODULES = {
+    "core": (
+        "SCHEMA_VERSION",
+        "IMPORT_FORMATS",
+        "EXPORT_FORMATS",
+        "GENERATE_START_YEAR",
+        "DOCTOR_FIXES",
+        "database_exists",
+        "make_database",
+        "delete_database",
+        "get_current_version",
+        "get_schema_version",
+        "migrate_database",
+        "update_version",
+        "diagnose_database",
+        "repair_database",
+        "create_configuration_table",
+        "add_configuration",
+        "enable_configuration",
+        "reset_configuration",
+        "get_configurations",
+        "get_current_configuration",
+        "get_working_hours",
+        "get_whole_year",
+        "get_whole_month",
+        "get_all_days",
+        "get_location_hours",
+        "get_users_hours",
+        "get_databases_hours",
+        "delete_configuration",
+        "create_working_hours_table",
+        "unify_working_hours_tables",
+        "insert_working_hours",
+        "remove_working_hours",
+        "delete_working_hours",
+        "delete_whole_year",
+        "delete_whole_month",
+        "delete_user",
+        "import_working_hours",
+        "generate_working_hours",
+        "print_configurations",
+        "print_working_table",
+        "save_working_table",
+        "export_working_tables",
+    ),
+    "exception": (
+        "WorkingDayError",
+        "UserConfigurationError",
+    ),
+    "session": (
+        "CACHED_STATEMENTS",
+        "Session",
+        "ConnectionPool",
+        "PooledSession",
+        "SQLTrace",
+        "QueryProgress",
+        "connect",
+        "open_connection",
+        "current_session",
+        "current_pool",
+        "current_trace",
+        "current_progress",
+    ),
+    "util": (
+        "UserConfiguration",
+        "DataTable",
+        "Finding",
+        "WorkingFlag",
+        "datestring_to_datetime",
+        "build_dateid",
+        "split_dateid",
+        "build_flags",
+        "flags_condition",
+        "quote_identifier",
+        "make_printable_table",
+        "sum_rewards",
+        "check_default_hours",
+        "find_extraordinary_hours",
+        "check_working_day",
+        "datetime",
+    ),
+    "log": (
+        "LOG_FORMATS",
+        "ClockingLogger",
+        "logger",
+        "setup_logging",
+    ),
+    "loghandler": (
+        "ElapsedFilter",
+        "TextFormatter",
+        "JSONFormatter",
+        "StderrHandler",
+    ),
+    "metrics": (
+        "METRICS_FORMATS",
+        "METRICS_INTERVAL",
+        "Histogram",
+        "Metrics",
+        "MeasuredCursor",
+        "measured",
+        "current_metrics",
+    ),
+    "server": (
+        "DEFAULT_HOST",
+        "DEFAULT_PORT",
+        "ClockingServer",
+        "ClockingRequestHandler",
+        "serve",
+    ),
+    "aio": (
+        "READERS",
+        "AsyncCursor",
+        "AsyncClocking",
+    ),
+}
+_NAMES = {name: submodule for submodule, names in _SUBMODULES.items() for name in names}
+
+
+def __getattr__(name):
+    """Lazy load public names of sub-modules
+
+    :param name: attribute name
+    :return: object
+    :raise: AttributeError
+    """
+    from importlib import import_module
+
+    # Star import: all public names, without importing sub-modules
+    if name == "__all__":
+        names = list(_NAMES)
+        globals()["__all__"] = names
+        return names
+    # Unknown names never import sub-modules
+    if name not in _NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_NAMES[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__getattr__("__all__")))
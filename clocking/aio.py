@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# aio -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""clocking module that contains asyncio API of core functions"""
+
+# region imports
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from . import core
+from .metrics import MeasuredCursor
+from .session import CACHED_STATEMENTS, Session
+
+# endregion
+
+# region globals
+__all__ = ("READERS", "AsyncCursor", "AsyncClocking")
+READERS = 4
+ARRAYSIZE = 256
+READ_FUNCTIONS = (
+    "database_exists",
+    "get_current_version",
+    "get_schema_version",
+    "get_configurations",
+    "get_current_configuration",
+    "get_working_hours",
+    "get_whole_year",
+    "get_whole_month",
+    "get_all_days",
+    "get_location_hours",
+    "get_users_hours",
+)
+WRITE_FUNCTIONS = (
+    "make_database",
+    "delete_database",
+    "migrate_database",
+    "update_version",
+    "create_configuration_table",
+    "add_configuration",
+    "enable_configuration",
+    "reset_configuration",
+    "delete_configuration",
+    "create_working_hours_table",
+    "unify_working_hours_tables",
+    "insert_working_hours",
+    "remove_working_hours",
+    "delete_working_hours",
+    "delete_whole_year",
+    "delete_whole_month",
+    "delete_user",
+)
+
+
+# endregion
+
+
+# region classes
+class AsyncCursor:
+    """Awaitable wrapper of cursor returned by a core getter
+
+    Rows are fetched on the reader threads, in chunks when iterated
+    with async for.
+
+    :param cursor: sqlite3 Cursor object
+    :param executor: executor of reader threads
+    :param arraysize: number of rows fetched by chunk
+    """
+
+    def __init__(self, cursor, executor, arraysize=ARRAYSIZE):
+        self.cursor = cursor
+        self.executor = executor
+        self.arraysize = arraysize
+
+    @property
+    def description(self):
+        """Column descriptions of cursor
+
+        :return: tuple
+        """
+        return self.cursor.description
+
+    async def _run(self, func, *args):
+        """Run cursor method on reader threads
+
+        :param func: cursor method
+        :param args: arguments of method
+        :return: result of method
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def fetchone(self):
+        """Fetch next row
+
+        :return: tuple
+        """
+        return await self._run(self.cursor.fetchone)
+
+    async def fetchmany(self, size=None):
+        """Fetch next rows
+
+        :param size: number of rows
+        :return: list
+        """
+        return await self._run(self.cursor.fetchmany, size or self.arraysize)
+
+    async def fetchall(self):
+        """Fetch all remaining rows
+
+        :return: list
+        """
+        return await self._run(self.cursor.fetchall)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        """Yield rows fetched by chunks
+
+        :return: AsyncGenerator
+        """
+        while rows := await self.fetchmany():
+            for row in rows:
+                yield row
+
+
+class AsyncClocking:
+    """Awaitable core functions of a clocking database
+
+    Writes run on one dedicated thread and reads on a small pool of threads;
+    every thread keeps its own session connection. With WAL journal mode,
+    readers don't wait the writer, so concurrent reports overlap.
+
+    Core functions are methods without database argument:
+    await AsyncClocking(database).get_whole_month(user, 2024, 5)
+
+    :param database: database file path
+    :param readers: number of reader threads
+    :param wal: enable WAL journal mode on database
+    :param timeout: seconds to wait a locked database
+    :param cached_statements: number of prepared statements cached by connection
+    """
+
+    def __init__(
+        self,
+        database,
+        readers=READERS,
+        wal=True,
+        timeout=5.0,
+        cached_statements=CACHED_STATEMENTS,
+    ):
+        self.database = database
+        self.connect_options = {
+            "cached_statements": cached_statements,
+            "timeout": timeout,
+            # Connections are closed by the thread of close method
+            "check_same_thread": False,
+        }
+        self._sessions = []
+        self._lock = threading.Lock()
+        # Readers don't block writer and vice versa
+        if wal:
+            with sqlite3.connect(database) as conn:
+                conn.execute("PRAGMA journal_mode=WAL;")
+            conn.close()
+        self.writer = ThreadPoolExecutor(
+            1, thread_name_prefix="clocking-writer", initializer=self._open_session
+        )
+        self.reader = ThreadPoolExecutor(
+            readers,
+            thread_name_prefix="clocking-reader",
+            initializer=self._open_session,
+        )
+
+    def _open_session(self):
+        """Open session of worker thread
+
+        :return: None
+        """
+        session = Session(self.database, **self.connect_options)
+        session.__enter__()
+        with self._lock:
+            self._sessions.append(session)
+
+    async def run(self, func, *args, write=False, **kwargs):
+        """Run function on reader or writer threads
+
+        :param func: function to run
+        :param args: arguments of function
+        :param write: run on writer thread
+        :param kwargs: keyword arguments of function
+        :return: result of function
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.writer if write else self.reader
+        result = await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+        if isinstance(result, (sqlite3.Cursor, MeasuredCursor)):
+            return AsyncCursor(result, self.reader)
+        return result
+
+    def close(self):
+        """Wait pending functions and close all connections
+
+        :return: None
+        """
+        self.writer.shutdown()
+        self.reader.shutdown()
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+
+    async def aclose(self):
+        """Close without blocking event loop
+
+        :return: None
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+
+# endregion
+
+
+# region functions
+def _awaitable(name, write):
+    """Build awaitable method of core function
+
+    :param name: name of core function
+    :param write: function writes into database
+    :return: coroutine function
+    """
+    func = getattr(core, name)
+
+    async def method(self, *args, **kwargs):
+        return await self.run(func, self.database, *args, write=write, **kwargs)
+
+    method.__name__ = name
+    method.__qualname__ = f"AsyncClocking.{name}"
+    method.__doc__ = f"Awaitable {name} on {'writer' if write else 'reader'} threads"
+    return method
+
+
+for _name in READ_FUNCTIONS:
+    setattr(AsyncClocking, _name, _awaitable(_name, write=False))
+for _name in WRITE_FUNCTIONS:
+    setattr(AsyncClocking, _name, _awaitable(_name, write=True))
+
+
+# endregion
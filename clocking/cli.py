@@ -22,101 +22,32 @@
 
 # region imports
 import argparse
+import io
 import os.path
+import shlex
 import sqlite3
+import sys
+from contextlib import nullcontext
 from getpass import getuser
+from sys import exit
 
-from clocking import (
-    datestring_to_datetime,
-    database_exists,
-    make_database,
-    delete_database,
-    get_current_version,
-    update_version,
-    create_configuration_table,
-    add_configuration,
-    get_current_configuration,
-    enable_configuration,
-    reset_configuration,
-    delete_configuration,
-    get_configurations,
-    print_configurations,
-    insert_working_hours,
-    remove_working_hours,
-    delete_working_hours,
-    delete_whole_month,
-    delete_whole_year,
-    delete_user,
-    get_working_hours,
-    print_working_table,
-    save_working_table,
-    get_whole_month,
-    get_whole_year,
-    get_all_days,
-    datetime,
-    __version__,
-)
+# Commands import their functions: startup loads only the selected one
+from clocking import __version__
+from clocking.log import logger
 
 
 # endregion
 
 
 # region functions
-def get_args():
-    """Get command-line arguments
+def add_config_parser(subparser, common_parser, date_parser):
+    """Add config command parser
 
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
     :return: ArgumentParser
     """
-    # Principal parser
-    parser = argparse.ArgumentParser(
-        description="tracking or monitoring worked hours",
-        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
-        prog="clocking",
-    )
-    parser.add_argument(
-        "-V", "--version", help="print version", action="version", version=__version__
-    )
-    # Common parser
-    common_parser = argparse.ArgumentParser(add_help=False)
-    common_parser.add_argument(
-        "-v", "--verbose", help="enable verbosity", action="store_true"
-    )
-    common_parser.add_argument(
-        "-B",
-        "--database",
-        help="select database file",
-        metavar="FILE",
-        type=str,
-        default=os.path.expanduser("~/.clocking.db"),
-    )
-    common_parser.add_argument(
-        "-u", "--user", help="change user", metavar="USER", default=getuser()
-    )
-    # Date parser
-    date_parser = argparse.ArgumentParser(add_help=False)
-    date_parser.add_argument("-D", "--date", help="set literally date", metavar="DATE")
-    date_parser.add_argument(
-        "-d",
-        "--day",
-        help="set day",
-        choices=range(1, 32),
-        metavar="DAY[1-31]",
-        type=int,
-    )
-    date_parser.add_argument(
-        "-m",
-        "--month",
-        help="set month",
-        choices=range(1, 13),
-        metavar="MONTH[1-12]",
-        type=int,
-    )
-    date_parser.add_argument("-y", "--year", help="set year", metavar="YEAR", type=int)
-    subparser = parser.add_subparsers(
-        dest="command", help="commands to run", required=True
-    )
-
-    # Config subparser
     config = subparser.add_parser(
         "config",
         help="default's configuration",
@@ -279,8 +210,24 @@ def get_args():
         help="force delete action without prompt confirmation",
         action="store_true",
     )
+    database_group = config.add_argument_group("database")
+    database_group.add_argument(
+        "-M",
+        "--unify",
+        help="move all user tables into one working hours table",
+        action="store_true",
+    )
+    return config
+
+
+def add_set_parser(subparser, common_parser, date_parser):
+    """Add set command parser
 
-    # Set subparser
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
     set_parse = subparser.add_parser(
         "set",
         help="setting values",
@@ -349,8 +296,17 @@ def get_args():
         metavar="HOURS",
     )
     set_parse.add_argument("-t", "--description", help="set description", type=str)
+    return set_parse
+
 
-    # Delete subparser
+def add_delete_parser(subparser, common_parser, date_parser):
+    """Add delete command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
     deleting_parse = subparser.add_parser(
         "delete",
         help="remove values",
@@ -366,8 +322,17 @@ def get_args():
         help="force delete action without prompt confirmation",
         action="store_true",
     )
+    return deleting_parse
+
 
-    # Print subparser
+def add_print_parser(subparser, common_parser, date_parser):
+    """Add print command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
     printing_parse = subparser.add_parser(
         "print",
         help="print values",
@@ -416,23 +381,528 @@ def get_args():
     printing_parse.add_argument(
         "-r", "--rewards", help="print rewards", action="store_true"
     )
+    return printing_parse
 
-    args = parser.parse_args()
-    return args
 
+def add_serve_parser(subparser, common_parser, date_parser):
+    """Add serve command parser
 
-def vprint(*messages, verbose=False):
-    """Print verbose messages
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
+    from clocking.server import DEFAULT_HOST, DEFAULT_PORT
 
-    :param messages: messages to print
-    :param verbose: verbosity boolean
-    :return: None
+    serving_parse = subparser.add_parser(
+        "serve",
+        help="serve database as JSON endpoints",
+        aliases=["srv"],
+        parents=[common_parser],
+    )
+    serving_parse.add_argument(
+        "-H", "--host", help="listening address", default=DEFAULT_HOST
+    )
+    serving_parse.add_argument(
+        "-P", "--port", help="listening port", type=int, default=DEFAULT_PORT
+    )
+    return serving_parse
+
+
+def add_daemon_parser(subparser, common_parser, date_parser):
+    """Add daemon command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
+    from clocking.client import DEFAULT_SOCKET
+
+    daemon_parse = subparser.add_parser(
+        "daemon",
+        help="run commands on a background process",
+        aliases=["dmn"],
+        parents=[common_parser],
+    )
+    daemon_parse.add_argument(
+        "-S",
+        "--socket",
+        help="socket file path",
+        metavar="FILE",
+        default=DEFAULT_SOCKET,
+    )
+    daemon_parse.add_argument(
+        "-k", "--stop", help="stop running daemon", action="store_true"
+    )
+    return daemon_parse
+
+
+def add_batch_parser(subparser, common_parser, date_parser):
+    """Add batch command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
+    batch_parse = subparser.add_parser(
+        "batch",
+        help="run commands of file in one transaction",
+        aliases=["bat"],
+        parents=[common_parser],
+    )
+    batch_parse.add_argument(
+        "file",
+        help="file with one command per line; - is stdin",
+        metavar="FILE",
+        nargs="?",
+        default="-",
+    )
+    batch_parse.add_argument(
+        "-n",
+        "--commit-every",
+        help="commit every NUMBER commands; 0 is one transaction",
+        metavar="NUMBER",
+        type=int,
+        default=0,
+    )
+    return batch_parse
+
+
+def add_import_parser(subparser, common_parser, date_parser):
+    """Add import command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
+    from clocking import IMPORT_FORMATS
+
+    import_parse = subparser.add_parser(
+        "import",
+        help="import working days from file",
+        aliases=["imp"],
+        parents=[common_parser],
+    )
+    import_parse.add_argument(
+        "file",
+        help="csv, json or ndjson file of working days; - is stdin",
+        metavar="FILE",
+    )
+    import_parse.add_argument(
+        "-F",
+        "--format",
+        help="format of file; default is file extension",
+        choices=IMPORT_FORMATS,
+    )
+    import_parse.add_argument(
+        "-n",
+        "--batch-size",
+        help="number of working days written in one transaction",
+        metavar="NUMBER",
+        type=int,
+        default=1000,
+    )
+    import_parse.add_argument(
+        "-k",
+        "--checkpoint",
+        help="name of checkpoint to resume import; default is file path",
+        metavar="NAME",
+    )
+    import_parse.add_argument(
+        "-N",
+        "--no-checkpoint",
+        help="don't save checkpoint of import",
+        action="store_true",
+    )
+    return import_parse
+
+
+def add_report_parser(subparser, common_parser, date_parser):
+    """Add report command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
+    report_parse = subparser.add_parser(
+        "report",
+        help="print worked hours grouped by user",
+        aliases=["rpt"],
+        parents=[common_parser],
+    )
+    report_parse.add_argument(
+        "-m",
+        "--month",
+        help="set month",
+        choices=range(1, 13),
+        metavar="MONTH[1-12]",
+        type=int,
+    )
+    report_parse.add_argument("-y", "--year", help="set year", metavar="YEAR", type=int)
+    report_parse.add_argument(
+        "-a",
+        "--databases",
+        help="glob pattern of databases to merge, instead of database",
+        metavar="GLOB",
+    )
+    report_parse.add_argument(
+        "-w",
+        "--workers",
+        help="number of processes that read databases; default is number of CPUs",
+        metavar="NUMBER",
+        type=int,
+    )
+    report_fmt_group = report_parse.add_mutually_exclusive_group()
+    report_fmt_group.add_argument(
+        "-c", "--csv", help="print in csv format", action="store_true"
+    )
+    report_fmt_group.add_argument(
+        "-j", "--json", help="print in json format", action="store_true"
+    )
+    report_fmt_group.add_argument(
+        "-l", "--html", help="print in html format", action="store_true"
+    )
+    report_parse.add_argument(
+        "-E",
+        "--export",
+        help="suppress output and export value into file",
+        metavar="FILE",
+    )
+    return report_parse
+
+
+def add_export_parser(subparser, common_parser, date_parser):
+    """Add export command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
+    from clocking import EXPORT_FORMATS
+
+    export_parse = subparser.add_parser(
+        "export",
+        help="export working days of users, one file per user",
+        aliases=["exp"],
+        parents=[common_parser],
+    )
+    export_parse.add_argument(
+        "-o",
+        "--output-dir",
+        help="directory of exported files",
+        metavar="DIR",
+        required=True,
+    )
+    export_parse.add_argument(
+        "-A",
+        "--all-users",
+        help="export every user with active configuration",
+        action="store_true",
+    )
+    export_parse.add_argument(
+        "-m",
+        "--month",
+        help="set month",
+        choices=range(1, 13),
+        metavar="MONTH[1-12]",
+        type=int,
+    )
+    export_parse.add_argument("-y", "--year", help="set year", metavar="YEAR", type=int)
+    export_parse.add_argument(
+        "-f",
+        "--format",
+        help="format of exported files",
+        choices=EXPORT_FORMATS,
+        default="txt",
+    )
+    export_parse.add_argument(
+        "-r", "--rewards", help="export rewards", action="store_true"
+    )
+    export_parse.add_argument(
+        "-w",
+        "--workers",
+        help="number of processes that export users; default is number of CPUs",
+        metavar="NUMBER",
+        type=int,
+    )
+    return export_parse
+
+
+def add_generate_parser(subparser, common_parser, date_parser):
+    """Add generate command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
+    from clocking import GENERATE_START_YEAR
+
+    generate_parse = subparser.add_parser(
+        "generate",
+        help="generate synthetic working days for load tests",
+        aliases=["gen"],
+        parents=[common_parser],
+    )
+    generate_parse.add_argument(
+        "-U", "--users", help="number of users", metavar="NUMBER", type=int, default=1
+    )
+    generate_parse.add_argument(
+        "-Y",
+        "--years",
+        help="number of years of every user",
+        metavar="NUMBER",
+        type=int,
+        default=1,
+    )
+    generate_parse.add_argument(
+        "-S",
+        "--seed",
+        help="seed of random data",
+        metavar="NUMBER",
+        type=int,
+        default=0,
+    )
+    generate_parse.add_argument(
+        "--start-year",
+        help="first year of data",
+        metavar="YEAR",
+        type=int,
+        default=GENERATE_START_YEAR,
+    )
+    generate_parse.add_argument(
+        "--prefix",
+        help="prefix of user names, followed by user number",
+        metavar="PREFIX",
+        default="user",
+    )
+    generate_parse.add_argument(
+        "-n",
+        "--batch-size",
+        help="number of working days written in one transaction",
+        metavar="NUMBER",
+        type=int,
+        default=1000,
+    )
+    return generate_parse
+
+
+def add_doctor_parser(subparser, common_parser, date_parser):
+    """Add doctor command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
+    from clocking import DOCTOR_FIXES
+
+    doctor_parse = subparser.add_parser(
+        "doctor",
+        help="check query plans, pragmas, indexes and types of databases",
+        aliases=["doc"],
+        parents=[common_parser],
+    )
+    doctor_parse.add_argument(
+        "-a",
+        "--databases",
+        help="glob pattern of databases to check, instead of database",
+        metavar="GLOB",
+    )
+    doctor_parse.add_argument(
+        "-f",
+        "--fix",
+        help="apply fixes of findings; without FIX every fix",
+        nargs="*",
+        choices=DOCTOR_FIXES,
+        metavar="FIX",
+    )
+    doctor_parse.add_argument(
+        "-j", "--json", help="print findings in json lines", action="store_true"
+    )
+    return doctor_parse
+
+
+def add_shell_parser(subparser, common_parser, date_parser):
+    """Add shell command parser
+
+    :param subparser: subparsers of principal parser
+    :param common_parser: common options parser
+    :param date_parser: date options parser
+    :return: ArgumentParser
+    """
+    shell_parse = subparser.add_parser(
+        "shell",
+        help="run commands on interactive shell",
+        aliases=["sh"],
+        parents=[common_parser],
+    )
+    return shell_parse
+
+
+def get_parser(command=None, **defaults):
+    """Build command-line parser
+
+    :param command: build only parser of this command; None is every command
+    :param defaults: default values of common options
+    :return: ArgumentParser
+    """
+    from clocking import CACHED_STATEMENTS, LOG_FORMATS
+
+    # Principal parser
+    parser = argparse.ArgumentParser(
+        description="tracking or monitoring worked hours",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        prog="clocking",
+    )
+    parser.add_argument(
+        "-V", "--version", help="print version", action="version", version=__version__
+    )
+    # Common parser
+    common_parser = argparse.ArgumentParser(add_help=False)
+    common_parser.add_argument(
+        "-v", "--verbose", help="enable verbosity", action="store_true"
+    )
+    common_parser.add_argument(
+        "--log-format",
+        help="format of verbose messages: text or JSON lines with elapsed seconds",
+        choices=LOG_FORMATS,
+        default="text",
+    )
+    common_parser.add_argument(
+        "-B",
+        "--database",
+        help="select database file",
+        metavar="FILE",
+        type=str,
+        default=os.path.expanduser("~/.clocking.db"),
+    )
+    common_parser.add_argument(
+        "-u", "--user", help="change user", metavar="USER", default=getuser()
+    )
+    common_parser.add_argument(
+        "--cached-statements",
+        help="number of prepared statements cached by database connection",
+        metavar="NUMBER",
+        type=int,
+        default=CACHED_STATEMENTS,
+    )
+    common_parser.add_argument(
+        "--profile",
+        help="profile command and save pstats into file",
+        metavar="FILE",
+    )
+    common_parser.add_argument(
+        "--profile-top",
+        help="profile command and print its NUMBER slowest functions",
+        metavar="NUMBER",
+        type=int,
+    )
+    common_parser.add_argument(
+        "--trace-sql",
+        help="print count, time and slowest SQL statements of command",
+        action="store_true",
+    )
+    common_parser.add_argument(
+        "--trace-slow",
+        help="trace SQL and print statements slower than MILLISECONDS",
+        metavar="MILLISECONDS",
+        type=float,
+    )
+    common_parser.add_argument(
+        "--trace-top",
+        help="number of slowest SQL statements of trace",
+        metavar="NUMBER",
+        type=int,
+        default=5,
+    )
+    common_parser.add_argument(
+        "--timeout",
+        help="interrupt queries of command, or of every request of serve, "
+        "after SECONDS",
+        metavar="SECONDS",
+        type=float,
+    )
+    common_parser.add_argument(
+        "--progress",
+        help="show progress of long queries and imports on stderr",
+        action="store_true",
+    )
+    common_parser.add_argument(
+        "--metrics",
+        help="record latency and rows of operations into Prometheus or .json file",
+        metavar="FILE",
+    )
+    common_parser.set_defaults(**defaults)
+    # Date parser
+    date_parser = argparse.ArgumentParser(add_help=False)
+    date_parser.add_argument("-D", "--date", help="set literally date", metavar="DATE")
+    date_parser.add_argument(
+        "-d",
+        "--day",
+        help="set day",
+        choices=range(1, 32),
+        metavar="DAY[1-31]",
+        type=int,
+    )
+    date_parser.add_argument(
+        "-m",
+        "--month",
+        help="set month",
+        choices=range(1, 13),
+        metavar="MONTH[1-12]",
+        type=int,
+    )
+    date_parser.add_argument("-y", "--year", help="set year", metavar="YEAR", type=int)
+    subparser = parser.add_subparsers(
+        dest="command", help="commands to run", required=True
+    )
+    builders = {
+        ("config", "cfg", "c"): add_config_parser,
+        ("set", "st", "s"): add_set_parser,
+        ("delete", "del", "d"): add_delete_parser,
+        ("print", "prt", "p"): add_print_parser,
+        ("serve", "srv"): add_serve_parser,
+        ("daemon", "dmn"): add_daemon_parser,
+        ("batch", "bat"): add_batch_parser,
+        ("import", "imp"): add_import_parser,
+        ("report", "rpt"): add_report_parser,
+        ("export", "exp"): add_export_parser,
+        ("generate", "gen"): add_generate_parser,
+        ("doctor", "doc"): add_doctor_parser,
+        ("shell", "sh"): add_shell_parser,
+    }
+    # Build only the selected command; every command for help and errors
+    selected = [builder for aliases, builder in builders.items() if command in aliases]
+    for builder in selected or builders.values():
+        builder(subparser, common_parser, date_parser)
+    return parser
+
+
+def get_command(argv):
+    """Get command name of command-line arguments
+
+    :param argv: command-line arguments
+    :return: str
     """
-    # Set level message
-    level = "debug:"
-    # Print level and all messages
-    if verbose:
-        print(level, *messages)
+    return next((arg for arg in argv if not arg.startswith("-")), None)
+
+
+def get_args(argv=None, **defaults):
+    """Get command-line arguments
+
+    :param argv: command-line arguments; default is sys.argv
+    :param defaults: default values of common options
+    :return: ArgumentParser
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    args = get_parser(get_command(argv), **defaults).parse_args(argv)
+    return args
 
 
 def confirm(message, default="n"):
@@ -457,34 +927,6 @@ def confirm(message, default="n"):
     return answer == "y"
 
 
-def check_default_hours(hours, default, t=""):
-    """Check if hours value is into defaults
-
-    :param hours: hour values
-    :param default: default hour values
-    :param t: type of hours
-    :return: float
-    """
-    if default:
-        if hours / default < 1.0:
-            hours = 0
-            print(f"warning: {t} hours must be greater than default {default}")
-    return hours
-
-
-def find_extraordinary_hours(hours, default):
-    """Find extraordinary hours into worked hours
-
-    :param hours: hour values
-    :param default: default hour values
-    :return: float
-    """
-    extraordinary = 0
-    if hours > default:
-        extraordinary = hours - default
-    return extraordinary
-
-
 def output_command(*args, **kwargs):
     """Select output command
 
@@ -492,6 +934,8 @@ def output_command(*args, **kwargs):
     :param kwargs: keyword arguments of *_working_table
     :return: None
     """
+    from clocking import print_working_table, save_working_table
+
     if kwargs.get("file"):
         save_working_table(*args, **kwargs)
     else:
@@ -505,38 +949,56 @@ def configurate(**options):
     :param options: options dictionary
     :return: None
     """
+    from clocking import (
+        delete_database,
+        create_configuration_table,
+        add_configuration,
+        get_current_configuration,
+        enable_configuration,
+        reset_configuration,
+        delete_configuration,
+        get_configurations,
+        print_configurations,
+        unify_working_hours_tables,
+    )
+
     db = options.get("database")
-    verbosity = options.get("verbose")
     user = options.get("user")
     # Get force for deletion
     force = options.get("force")
-    vprint("check configuration table", verbose=verbosity)
+    logger.debug("check configuration table")
     create_configuration_table(db)
     # Delete database
     if options.get("delete_db"):
-        vprint(f"delete database {options.get('delete_db')}", verbose=verbosity)
+        logger.debug("delete database %s", options.get("delete_db"))
         if force or confirm(f"Delete database {options.get('delete_db')}."):
             delete_database(db)
             exit(0)
     # Delete configuration
     if options.get("delete_id"):
-        vprint(f"delete configuration id {options.get('delete_id')}", verbose=verbosity)
+        logger.debug("delete configuration id %s", options.get("delete_id"))
         if force or confirm(f"Delete configuration id {options.get('delete_id')}."):
             if not delete_configuration(db, options.get("delete_id")):
                 print(
                     f"error: delete configuration id {options.get('delete_id')} failed"
                 )
                 exit(4)
+    # Unify working hours tables
+    if options.get("unify"):
+        logger.debug("move user tables into working hours table")
+        if force or confirm("Move all user tables into one table."):
+            users = unify_working_hours_tables(db)
+            logger.debug("moved users: %s", ", ".join(users))
     # Reset configurations
     if options.get("reset"):
-        vprint("reset configuration table", verbose=verbosity)
+        logger.debug("reset configuration table")
         if force or confirm("Reset configuration table."):
             if not reset_configuration(db):
                 print("error: reset configuration table failed or table is empty")
                 exit(4)
     # Create new configuration
     if options.get("daily_hours"):
-        vprint("create new configuration", verbose=verbosity)
+        logger.debug("create new configuration")
         add_configuration(
             db,
             False,
@@ -558,10 +1020,7 @@ def configurate(**options):
         )
     # Enable configuration
     if options.get("select_id"):
-        vprint(
-            f"enable configuration with id {options.get('select_id')}",
-            verbose=verbosity,
-        )
+        logger.debug("enable configuration with id %s", options.get("select_id"))
         if get_current_configuration(db, user) and get_current_configuration(db, user)[
             0
         ] == options.get("select_id"):
@@ -574,15 +1033,13 @@ def configurate(**options):
                 exit(1)
     # Print configuration
     if options.get("print"):
-        vprint(
-            f"print current enabled configuration for user: {user}", verbose=verbosity
-        )
+        logger.debug("print current enabled configuration for user: %s", user)
         print_configurations(get_configurations(db, user, enabled=True))
     if options.get("print_user"):
-        vprint(f"print all configurations for user: {user}", verbose=verbosity)
+        logger.debug("print all configurations for user: %s", user)
         print_configurations(get_configurations(db, user))
     if options.get("print_all"):
-        vprint("print all configurations", verbose=verbosity)
+        logger.debug("print all configurations")
         print_configurations(get_configurations(db))
 
 
@@ -592,12 +1049,21 @@ def setting(**options):
     :param options: options dictionary
     :return: None
     """
+    from clocking import (
+        datestring_to_datetime,
+        check_working_day,
+        get_current_configuration,
+        insert_working_hours,
+        remove_working_hours,
+        delete_working_hours,
+        datetime,
+    )
+
     db = options.get("database")
-    verbosity = options.get("verbose")
     user = options.get("user")
     # Get force for deletion
     force = options.get("force")
-    vprint(f"insert data into database {db} for user {user}", verbose=verbosity)
+    logger.debug("insert data into database %s for user %s", db, user)
     # Set filled daily values
     today = (
         datestring_to_datetime(options.get("date"))
@@ -609,107 +1075,46 @@ def setting(**options):
     month = today.month if not options.get("month") else options.get("month")
     day = today.day if not options.get("day") else options.get("day")
     if options.get("date"):
-        vprint(f"setting date is {options.get('date')}", verbose=verbosity)
+        logger.debug("setting date is %s", options.get("date"))
     else:
-        vprint(
-            f"setting date is day={day}, month={month}, year={year}", verbose=verbosity
-        )
+        logger.debug("setting date is day=%s, month=%s, year=%s", day, month, year)
     # Get current configuration
     user_configuration = get_current_configuration(db, user)
     if not user_configuration:
         print(f"error: no active configuration found for user '{user}'")
         exit(1)
-    # Default configuration values
-    description = options.get("description")
-    empty_value = (
-        options.get("empty_value")
-        if options.get("empty_value")
-        else user_configuration.empty_value
-    )
-    # Default: check hours value
-    hours_value = (
-        options.get("hours") if options.get("hours") else options.get("custom")
-    )
-    if not hours_value:
-        hours_value = empty_value
-    # Default: check disease value
-    if options.get("disease"):
-        hours_value = 0
-        description = user_configuration.disease
-    # Default: check extraordinary value
-    extraordinary = (
-        check_default_hours(
-            options.get("extraordinary", 0),
-            user_configuration.extraordinary,
-            "extraordinary",
-        )
-        if options.get("extraordinary")
-        else 0
-    )
-    # Default: check permit value
-    permit = (
-        check_default_hours(
-            options.get("permit"),
-            user_configuration.permit_hours,
-            "permit",
-        )
-        if options.get("permit")
-        else 0
-    )
-    # Default: check other value
-    other = (
-        check_default_hours(
-            options.get("other"),
-            user_configuration.other_hours,
-            "other",
-        )
-        if options.get("other")
-        else 0
-    )
-    if isinstance(hours_value, (int, float)) and isinstance(
-        extraordinary, (int, float)
-    ):
-        # Check if day is in working days
-        if today_name not in user_configuration.working_days:
-            extraordinary = hours_value
-            hours_value = 0
-        # Check if worked hours is less than of default
-        elif hours_value < user_configuration.daily_hours and extraordinary:
-            print(
-                "warning: no extraordinary because the hours worked are "
-                f"lower than the default({user_configuration.daily_hours})"
-            )
-            extraordinary = 0
-        # Check if worked hours is greater than of default
-        elif hours_value > user_configuration.daily_hours and permit:
-            print(
-                "warning: no permit because the hours worked are "
-                f"greater than the default({user_configuration.daily_hours})"
-            )
-            permit = 0
-        # Check if permit and extraordinary are specified
-        elif permit and extraordinary:
-            print("warning: no permit and extraordinary hours in the same day")
-            permit = 0
-            extraordinary = 0
-        # Check if hours value contains extraordinary hours
-        more_extraordinary = find_extraordinary_hours(
-            hours_value, user_configuration.daily_hours
-        )
-        hours_value = hours_value - more_extraordinary
-        if more_extraordinary:
-            extraordinary = extraordinary + more_extraordinary
+    # Apply configuration rules
+    values = check_working_day(
+        user_configuration,
+        today_name,
+        hours=options.get("hours") if options.get("hours") else options.get("custom"),
+        extraordinary=options.get("extraordinary", 0),
+        permit_hours=options.get("permit"),
+        other_hours=options.get("other"),
+        disease=options.get("disease"),
+        description=options.get("description"),
+        empty_value=options.get("empty_value"),
+    )
+    hours_value = values["hours"]
+    description = values["description"]
+    extraordinary = values["extraordinary"]
+    permit = values["permit_hours"]
+    other = values["other_hours"]
+    empty_value = values["empty_value"]
     # Default: check location value
     location = (
         options.get("location")
         if options.get("location")
         else user_configuration.location
     )
-    vprint(
-        f"setting hours={hours_value}, location={location}, "
-        f"extraordinary={extraordinary}, permit={permit}, other={other} "
-        f"description={description}",
-        verbose=verbosity,
+    logger.debug(
+        "setting hours=%s, location=%s, extraordinary=%s, permit=%s, other=%s description=%s",
+        hours_value,
+        location,
+        extraordinary,
+        permit,
+        other,
+        description,
     )
     err_msg = "error: working day {} failed"
     # Insert day(s)
@@ -789,21 +1194,26 @@ def deleting(**options):
     :param options: options dictionary
     :return: None
     """
+    from clocking import (
+        delete_working_hours,
+        delete_whole_month,
+        delete_whole_year,
+        delete_user,
+        datetime,
+    )
+
     db = options.get("database")
-    verbosity = options.get("verbose")
     user = options.get("user")
-    vprint(f"delete data into database {db} for user {user}", verbose=verbosity)
+    logger.debug("delete data into database %s for user %s", db, user)
     # Set filled daily values
     today = datetime.today()
     year = today.year if not options.get("year") else options.get("year")
     month = today.month if not options.get("month") else options.get("month")
     day = today.day if not options.get("day") else options.get("day")
     if options.get("date"):
-        vprint(f"deleting date is {options.get('date')}", verbose=verbosity)
+        logger.debug("deleting date is %s", options.get("date"))
     else:
-        vprint(
-            f"deleting date is day={day}, month={month}, year={year}", verbose=verbosity
-        )
+        logger.debug("deleting date is day=%s, month=%s, year=%s", day, month, year)
     # Get force for deletion
     force = options.get("force")
     # Deleting day
@@ -847,10 +1257,18 @@ def printing(**options):
     :param options: options dictionary
     :return: None
     """
+    from clocking import (
+        get_current_configuration,
+        get_working_hours,
+        get_whole_month,
+        get_whole_year,
+        get_all_days,
+        datetime,
+    )
+
     db = options.get("database")
-    verbosity = options.get("verbose")
     user = options.get("user")
-    vprint(f"print data from database {db} for user {user}", verbose=verbosity)
+    logger.debug("print data from database %s for user %s", db, user)
     # Set filled daily values
     today = datetime.today()
     year = today.year if not options.get("year") else options.get("year")
@@ -949,6 +1367,391 @@ def printing(**options):
         )
 
 
+def serving(**options):
+    """Serve function
+
+    :param options: options dictionary
+    :return: None
+    """
+    from clocking.server import serve
+
+    db = options.get("database")
+    host = options.get("host")
+    port = options.get("port")
+    logger.debug("serve database %s on http://%s:%s", db, host, port)
+    serve(
+        db,
+        host=host,
+        port=port,
+        cached_statements=options.get("cached_statements"),
+        request_timeout=options.get("timeout"),
+    )
+
+
+def daemonizing(**options):
+    """Daemon function
+
+    :param options: options dictionary
+    :return: None
+    """
+    from clocking.daemon import run_daemon, stop_daemon
+
+    db = options.get("database")
+    socket = options.get("socket")
+    # Stop running daemon
+    if options.get("stop"):
+        if not stop_daemon(socket):
+            print(f"error: no daemon is listening on {socket}")
+            exit(5)
+        logger.debug("daemon on %s stopped", socket)
+        return
+    logger.debug("run commands of database %s sent on %s", db, socket)
+    try:
+        run_daemon(db, socket, cached_statements=options.get("cached_statements"))
+    except FileExistsError as err:
+        print(f"error: {err}")
+        exit(5)
+
+
+def batching(**options):
+    """Batch function
+
+    :param options: options dictionary
+    :return: None
+    """
+    from clocking import current_session
+
+    db = options.get("database")
+    verbosity = options.get("verbose")
+    commit_every = options.get("commit_every")
+    file = options.get("file")
+    # Lines inherit database, user and verbosity of batch
+    defaults = {"database": db, "user": options.get("user"), "verbose": verbosity}
+    session = current_session(db)
+    logger.debug("run commands of %s on database %s", file, db)
+    try:
+        stream = sys.stdin if file == "-" else open(file)
+    except OSError as err:
+        print(f"error: {err}")
+        exit(6)
+    # Prompts of commands can't read next lines
+    stdin, sys.stdin = sys.stdin, io.StringIO()
+    executed = 0
+    # Build parser of every command only once
+    parsers = {}
+    try:
+        with session.transaction():
+            for number, line in enumerate(stream, start=1):
+                argv = shlex.split(line, comments=True)
+                if not argv:
+                    continue
+                try:
+                    command = get_command(argv)
+                    if command not in parsers:
+                        parsers[command] = get_parser(command, **defaults)
+                    args = parsers[command].parse_args(argv)
+                    cmd = cli_select_command(args.command)
+                    if cmd in (batching, serving, daemonizing, interactive):
+                        print(
+                            f"error: line {number}: {args.command} not allowed in batch"
+                        )
+                        exit(6)
+                    cmd(**vars(args))
+                except SystemExit as err:
+                    # Help and version lines
+                    if not err.code:
+                        continue
+                    print(
+                        f"error: line {number}: changes not committed are rolled back"
+                    )
+                    raise
+                except EOFError:
+                    print(f"error: line {number}: confirmation required, use --force")
+                    exit(6)
+                except sqlite3.DatabaseError as err:
+                    print(
+                        f"error: line {number}: an error has occurred on database. {err}"
+                    )
+                    exit(6)
+                except ValueError as err:
+                    print(f"error: line {number}: {err}")
+                    exit(6)
+                executed += 1
+                # Commit partial work
+                if commit_every and executed % commit_every == 0:
+                    session.commit()
+                    logger.debug("%s commands committed", executed)
+    finally:
+        sys.stdin = stdin
+        if file != "-":
+            stream.close()
+    logger.debug("%s commands executed", executed)
+
+
+def importing(**options):
+    """Import function
+
+    :param options: options dictionary
+    :return: None
+    """
+    from clocking import import_working_hours, IMPORT_FORMATS
+
+    db = options.get("database")
+    user = options.get("user")
+    file = options.get("file")
+    # Format of file extension
+    fmt = options.get("format") or os.path.splitext(file)[1].lstrip(".").lower()
+    if fmt not in IMPORT_FORMATS:
+        print(f"error: unknown format of {file}, use --format")
+        exit(7)
+    # Stdin can't be resumed
+    checkpoint = None
+    if not options.get("no_checkpoint") and file != "-":
+        checkpoint = options.get("checkpoint") or os.path.abspath(file)
+    logger.debug("import %s file %s into database %s for user %s", fmt, file, db, user)
+    try:
+        stream = sys.stdin if file == "-" else open(file, newline="")
+    except OSError as err:
+        print(f"error: {err}")
+        exit(7)
+    try:
+        imported = import_working_hours(
+            db,
+            user,
+            stream,
+            fmt=fmt,
+            batch_size=options.get("batch_size"),
+            checkpoint=checkpoint,
+            warn=logger.debug,
+        )
+    except ValueError as err:
+        print(f"error: {err}")
+        if checkpoint:
+            print("error: run again the same command to resume import")
+        exit(7)
+    finally:
+        if file != "-":
+            stream.close()
+    logger.debug("%s working days imported", imported)
+
+
+def reporting(**options):
+    """Report function
+
+    :param options: options dictionary
+    :return: None
+    """
+    import glob
+
+    from clocking import get_users_hours, get_databases_hours, datetime
+
+    db = options.get("database")
+    pattern = options.get("databases")
+    year = options.get("year")
+    month = options.get("month")
+    if month and not year:
+        year = datetime.today().year
+    # Report of one database
+    if not pattern:
+        logger.debug("report worked hours of database %s", db)
+        cursor = get_users_hours(db, year=year, month=month)
+    else:
+        databases = sorted(glob.glob(os.path.expanduser(pattern), recursive=True))
+        if not databases:
+            print(f"error: no database matches {pattern}")
+            exit(8)
+        logger.debug("report worked hours of %s databases", len(databases))
+        cursor = get_databases_hours(
+            databases,
+            year=year,
+            month=month,
+            workers=options.get("workers"),
+            warn=print,
+        )
+    output_command(
+        cursor,
+        csv=options.get("csv"),
+        json=options.get("json"),
+        html=options.get("html"),
+        file=options.get("export"),
+    )
+
+
+def exporting(**options):
+    """Export function
+
+    :param options: options dictionary
+    :return: None
+    """
+    from clocking import get_current_configuration, export_working_tables, datetime
+
+    db = options.get("database")
+    directory = options.get("output_dir")
+    year = options.get("year")
+    month = options.get("month")
+    if month and not year:
+        year = datetime.today().year
+    # Only selected user, otherwise every user with active configuration
+    users = None if options.get("all_users") else [options.get("user")]
+    if users and not get_current_configuration(db, users[0]):
+        print(f"error: no active configuration found for user '{users[0]}'")
+        exit(1)
+    logger.debug("export working days of database %s into %s", db, directory)
+    start = datetime.now()
+    exported = 0
+    try:
+        for user, file, seconds in export_working_tables(
+            db,
+            directory,
+            users=users,
+            year=year,
+            month=month,
+            fmt=options.get("format"),
+            rewards=options.get("rewards"),
+            workers=options.get("workers"),
+        ):
+            # Timing of every job
+            print(f"{user}: {file} exported in {seconds:.3f}s")
+            exported += 1
+    except OSError as err:
+        print(f"error: {err}")
+        exit(9)
+    logger.debug("%s users exported in %s", exported, datetime.now() - start)
+
+
+def generating(**options):
+    """Generate function
+
+    :param options: options dictionary
+    :return: None
+    """
+    from clocking import generate_working_hours
+
+    db = options.get("database")
+    logger.debug(
+        "generate %s years of %s users into database %s with seed %s",
+        options.get("years"),
+        options.get("users"),
+        db,
+        options.get("seed"),
+    )
+    generated = generate_working_hours(
+        db,
+        users=options.get("users"),
+        years=options.get("years"),
+        seed=options.get("seed"),
+        start_year=options.get("start_year"),
+        prefix=options.get("prefix"),
+        batch_size=options.get("batch_size"),
+    )
+    for user, days in generated.items():
+        logger.debug("%s working days generated for user %s", days, user)
+
+
+def doctoring(**options):
+    """Doctor function
+
+    :param options: options dictionary
+    :return: None
+    """
+    import glob
+    import json
+
+    from clocking import (
+        database_exists,
+        diagnose_database,
+        repair_database,
+        DOCTOR_FIXES,
+    )
+
+    pattern = options.get("databases")
+    fixes = options.get("fix")
+    if pattern:
+        databases = sorted(glob.glob(os.path.expanduser(pattern), recursive=True))
+        if not databases:
+            print(f"error: no database matches {pattern}")
+            exit(8)
+    else:
+        databases = [options.get("database")]
+    unhealthy = False
+    for database in databases:
+        logger.debug("diagnose database %s", database)
+        try:
+            if not database_exists(database):
+                raise sqlite3.DatabaseError("database not found")
+            findings = diagnose_database(database)
+            # Apply only fixes of findings
+            selected = {finding.fix for finding in findings} & set(
+                fixes or DOCTOR_FIXES
+            )
+            if fixes is not None and selected:
+                applied = repair_database(database, selected)
+                print(f"{database}: applied {', '.join(applied)}")
+                findings = diagnose_database(database)
+        except sqlite3.DatabaseError as err:
+            print(f"error: {database}: {err}")
+            unhealthy = True
+            continue
+        for finding in findings:
+            if finding.severity != "info":
+                unhealthy = True
+            if options.get("json"):
+                print(json.dumps({"database": database, **finding._asdict()}))
+                continue
+            fix = f" (fix: {finding.fix})" if finding.fix else ""
+            print(
+                f"{finding.severity}: {database}: {finding.check}: "
+                f"{finding.target}: {finding.message}{fix}"
+            )
+    if unhealthy:
+        exit(11)
+
+
+def interactive(**options):
+    """Shell function
+
+    :param options: options dictionary
+    :return: None
+    """
+    from clocking import current_session
+    from clocking.shell import ClockingShell
+
+    db = options.get("database")
+    verbosity = options.get("verbose")
+    logger.debug("open shell on database %s", db)
+    # Keep lookups until database changes
+    current_session(db).cache = True
+    try:
+        ClockingShell(db, options.get("user"), verbose=verbosity).cmdloop()
+    except KeyboardInterrupt:
+        print()
+
+
+def profiling(cmd, file=None, top=None, **options):
+    """Run command under profiler
+
+    :param cmd: command function
+    :param file: file path of pstats
+    :param top: number of slowest functions to print
+    :param options: options dictionary of command
+    :return: None
+    """
+    # Import only when profiling is enabled
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile()
+    try:
+        profile.runcall(cmd, **options)
+    finally:
+        # Commands exit on errors too
+        if file:
+            profile.dump_stats(file)
+        if top:
+            stats = pstats.Stats(profile, stream=sys.stderr)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+
 def cli_select_command(command):
     """
     Select command
@@ -962,10 +1765,28 @@ def cli_select_command(command):
         "set": setting,
         "delete": deleting,
         "print": printing,
+        "serve": serving,
+        "daemon": daemonizing,
+        "batch": batching,
+        "import": importing,
+        "report": reporting,
+        "export": exporting,
+        "generate": generating,
+        "doctor": doctoring,
+        "shell": interactive,
         "cfg": configurate,
         "st": setting,
         "del": deleting,
         "prt": printing,
+        "srv": serving,
+        "dmn": daemonizing,
+        "bat": batching,
+        "imp": importing,
+        "rpt": reporting,
+        "exp": exporting,
+        "gen": generating,
+        "doc": doctoring,
+        "sh": interactive,
         "c": configurate,
         "s": setting,
         "d": deleting,
@@ -974,29 +1795,83 @@ def cli_select_command(command):
     return commands.get(command)
 
 
-def main():
-    """main function"""
-    args = get_args()
-    verbosity = args.verbose
+def run_command(args):
+    """Check database and run command of arguments
+
+    :param args: Namespace of command-line arguments
+    :return: None
+    """
+    from clocking import (
+        database_exists,
+        make_database,
+        get_schema_version,
+        update_version,
+        Session,
+        QueryProgress,
+        SCHEMA_VERSION,
+    )
+
     db = args.database
-    # Check database status
-    if not database_exists(db):
-        make_database(db)
-        vprint(f"database {db} created", verbose=verbosity)
-    # Check update version
-    if get_current_version(db) != __version__:
-        update_version(db)
-    vprint(f"clocking version {__version__}", verbose=verbosity)
+    cmd = cli_select_command(args.command)
+    # Doctor checks databases as they are
+    if cmd is not doctoring:
+        # Check database status
+        if not database_exists(db):
+            make_database(db)
+            logger.debug("database %s created", db)
+        # Check schema version and apply migrations
+        if get_schema_version(db) < SCHEMA_VERSION:
+            update_version(db)
+    logger.debug("clocking version %s", __version__)
     # Select action
     options = vars(args)
-    cmd = cli_select_command(args.command)
     if cmd:
+        # Long-running commands bound every request, not the whole command
+        if cmd in (serving, daemonizing, interactive):
+            progress = nullcontext()
+        else:
+            progress = QueryProgress(args.timeout, show=args.progress, interrupt=True)
         try:
-            cmd(**options)
+            # Share one connection with all database operations of command
+            with Session(db, cached_statements=args.cached_statements), progress:
+                if args.profile or args.profile_top:
+                    profiling(cmd, args.profile, args.profile_top, **options)
+                else:
+                    cmd(**options)
+        except TimeoutError as err:
+            print(f"error: {err}")
+            exit(10)
+        except KeyboardInterrupt:
+            print("error: command cancelled")
+            exit(130)
         except sqlite3.DatabaseError as err:
             print(f"error: an error has occurred on database. {err}")
 
 
+def main():
+    """main function"""
+    from clocking import SQLTrace, Metrics
+
+    args = get_args()
+    # Default commands discard records without importing logging
+    if args.verbose or args.log_format != "text":
+        from clocking import setup_logging
+
+        setup_logging(args.verbose, args.log_format)
+    # Record metrics of operations into file
+    with Metrics(args.metrics) if args.metrics else nullcontext():
+        if not (args.trace_sql or args.trace_slow is not None):
+            return run_command(args)
+        # Trace statements of database checks too
+        slow = args.trace_slow / 1e3 if args.trace_slow is not None else None
+        with SQLTrace(slow, args.trace_top) as trace:
+            try:
+                run_command(args)
+            finally:
+                # Commands exit on errors too
+                print(trace.report(), file=sys.stderr)
+
+
 # endregion
 
 
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# client -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""clocking module that contains thin client of daemon"""
+
+# region imports
+import json
+import os
+import socket
+import sys
+
+# endregion
+
+# region globals
+__all__ = ("DEFAULT_SOCKET", "forward", "main")
+DEFAULT_SOCKET = os.environ.get(
+    "CLOCKING_SOCKET", os.path.expanduser("~/.clocking.sock")
+)
+
+
+# endregion
+
+
+# region functions
+def forward(argv, path=DEFAULT_SOCKET):
+    """Run command-line arguments on running daemon
+
+    :param argv: command-line arguments
+    :param path: socket file path of daemon
+    :return: dict with status, stdout and stderr; None if command must run locally
+    """
+    # Daemon needs Unix domain sockets
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            # No daemon is listening
+            return None
+        sock.sendall(
+            json.dumps({"argv": list(argv), "cwd": os.getcwd()}).encode() + b"\n"
+        )
+        with sock.makefile("rb") as stream:
+            response = stream.readline()
+    if not response:
+        return None
+    response = json.loads(response)
+    return None if response.get("fallback") else response
+
+
+def main():
+    """main function: forward to daemon, otherwise run command-line locally"""
+    response = forward(sys.argv[1:])
+    if response is None:
+        from clocking.cli import main as cli_main
+
+        return cli_main()
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    sys.exit(response.get("status", 0))
+
+
+# endregion
+
+
+# region main
+if __name__ == "__main__":
+    main()
+
+# endregion
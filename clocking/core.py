@@ -25,25 +25,53 @@
 # region import
 import os.path
 import sqlite3
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import islice
 
 from clocking import __version__
-from .exception import WorkingDayError
+from .exception import WorkingDayError, UserConfigurationError
+from .metrics import current_metrics, measured
+from .session import (
+    Session,
+    connect,
+    current_progress,
+    current_session,
+    open_connection,
+    _readonly_uri,
+)
 from .util import (
     build_dateid,
     split_dateid,
+    build_flags,
+    flags_condition,
+    quote_identifier,
+    WorkingFlag,
     make_printable_table,
     sum_rewards,
+    check_working_day,
+    Finding,
     UserConfiguration,
 )
 
 # endregion
 
 __all__ = (
+    "SCHEMA_VERSION",
+    "IMPORT_FORMATS",
+    "EXPORT_FORMATS",
+    "GENERATE_START_YEAR",
+    "DOCTOR_FIXES",
     "database_exists",
     "make_database",
     "delete_database",
     "get_current_version",
+    "get_schema_version",
+    "migrate_database",
     "update_version",
+    "diagnose_database",
+    "repair_database",
     "create_configuration_table",
     "add_configuration",
     "enable_configuration",
@@ -54,20 +82,853 @@ __all__ = (
     "get_whole_year",
     "get_whole_month",
     "get_all_days",
+    "get_location_hours",
+    "get_users_hours",
+    "get_databases_hours",
     "delete_configuration",
+    "create_working_hours_table",
+    "unify_working_hours_tables",
     "insert_working_hours",
     "remove_working_hours",
     "delete_working_hours",
     "delete_whole_year",
     "delete_whole_month",
     "delete_user",
+    "import_working_hours",
+    "generate_working_hours",
     "print_configurations",
     "print_working_table",
     "save_working_table",
+    "export_working_tables",
+)
+# Tables and indexes of clocking: names of user tables never start with it
+INTERNAL_PREFIX = "clocking_"
+RESERVED_TABLES = (
+    "version",
+    "configuration",
+)
+IMPORT_FORMATS = ("csv", "json", "ndjson")
+EXPORT_FORMATS = ("txt", "csv", "json", "html")
+GENERATE_START_YEAR = 2010
+GENERATE_LOCATIONS = {"Office": 70, "Home": 25, "Customer": 5}
+GENERATE_DESCRIPTIONS = ("development", "meeting", "support", "review", "training")
+GENERATE_HOLIDAYS = ((1, 1), (6, 1), (25, 4), (1, 5), (2, 6), (15, 8), (25, 12))
+IMPORT_BATCH_SIZE = 1000
+# Fixes of doctor in order of application
+DOCTOR_FIXES = ("migrate", "types", "indexes", "analyze", "journal", "vacuum")
+DOCTOR_FREELIST = 0.25
+NUMERIC_COLUMNS = ("hours", "extraordinary", "permit_hours", "other_hours")
+WORKING_HOURS_COLUMNS = (
+    "date_id",
+    "year",
+    "month",
+    "day",
+    "hours",
+    "clocking_description.name AS description",
+    "clocking_location.name AS location",
+    "extraordinary",
+    "permit_hours",
+    "other_hours",
+    "holiday",
+    "disease",
 )
 
 
 # region functions
+def _select_working_hours(table):
+    """Build select query of working hours joined with dimension tables
+
+    :param table: working hours table
+    :return: str
+    """
+    return (
+        f"SELECT {', '.join(WORKING_HOURS_COLUMNS)} FROM {table} "
+        "LEFT JOIN clocking_description "
+        "ON clocking_description.id = description_id "
+        "LEFT JOIN clocking_location ON clocking_location.id = location_id"
+    )
+
+
+def _working_hours_schema(table, unified=False):
+    """Build create query of working hours table
+
+    :param table: table name
+    :param unified: table with user_id of all users
+    :return: str
+    """
+    return (
+        rf"CREATE TABLE IF NOT EXISTS {quote_identifier(table)} ("
+        + (
+            r"user_id INTEGER NOT NULL REFERENCES clocking_user (id),"
+            r"date_id INTEGER NOT NULL,"
+            if unified
+            else r"date_id INTEGER PRIMARY KEY,"
+        )
+        + r"year INTEGER NOT NULL,"
+        r"month INTEGER NOT NULL,"
+        r"day INTEGER NOT NULL,"
+        r"hours FLOAT NOT NULL,"
+        r"description_id INTEGER REFERENCES clocking_description (id),"
+        r"location_id INTEGER REFERENCES clocking_location (id),"
+        r"extraordinary FLOAT,"
+        r"permit_hours FLOAT,"
+        r"other_hours FLOAT ,"
+        r"holiday TEXT,"
+        r"disease TEXT,"
+        r"flags INTEGER NOT NULL DEFAULT 0"
+        + (r", PRIMARY KEY (user_id, date_id)) WITHOUT ROWID;" if unified else r");")
+    )
+
+
+def _dimension_id(cursor, table, value):
+    """Get id of value into dimension table, inserting it if not exists
+
+    :param cursor: sqlite3 Cursor object
+    :param table: dimension table name
+    :param value: value to encode
+    :return: int
+    """
+    if value is None:
+        return None
+    cursor.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?);", (value,))
+    cursor.execute(f"SELECT id FROM {table} WHERE name = ?;", (value,))
+    return cursor.fetchone()[0]
+
+
+def _is_unified(cursor):
+    """Check if database stores all users into unified working hours table
+
+    :param cursor: sqlite3 Cursor object
+    :return: bool
+    """
+    cursor.execute(
+        "SELECT name FROM sqlite_master "
+        "WHERE type='table' AND name='clocking_working_hours';"
+    )
+    return bool(cursor.fetchone())
+
+
+def _user_tables(cursor):
+    """Get all per user working hours tables
+
+    :param cursor: sqlite3 Cursor object
+    :return: list
+    """
+    # Internal tables like sqlite_stat1 of ANALYZE
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' "
+        "AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\';"
+    )
+    return [
+        row[0]
+        for row in cursor.fetchall()
+        if row[0] not in RESERVED_TABLES and not row[0].startswith(INTERNAL_PREFIX)
+    ]
+
+
+def _working_hours_source(cursor, user, create=False):
+    """Get working hours table and key columns of user
+
+    :param cursor: sqlite3 Cursor object
+    :param user: user in configuration table
+    :param create: create user table or user id if not exists
+    :return: tuple
+    """
+    # Unified table: select rows of user
+    if _is_unified(cursor):
+        if create:
+            cursor.execute(
+                "INSERT OR IGNORE INTO clocking_user (name) VALUES (?);", (user,)
+            )
+        cursor.execute("SELECT id FROM clocking_user WHERE name = ?;", (user,))
+        result = cursor.fetchone()
+        return "clocking_working_hours", {"user_id": result[0] if result else None}
+    # Per user table
+    table = _user_table(user)
+    if create:
+        cursor.execute("SELECT name FROM sqlite_master WHERE name = ?;", (user,))
+        if not cursor.fetchone():
+            _create_user_table(cursor, user)
+    return table, {}
+
+
+def _user_table(user):
+    """Validate user and quote it as table name
+
+    :param user: user in configuration table
+    :return: str
+    :raise: UserConfigurationError
+    """
+    if user in RESERVED_TABLES or str(user).startswith(INTERNAL_PREFIX):
+        raise UserConfigurationError(f"{user} is a reserved name")
+    try:
+        return quote_identifier(user)
+    except ValueError as err:
+        raise UserConfigurationError(f"{user!r} is not a valid user") from err
+
+
+def _where(key, *conditions):
+    """Build where clause of user working hours
+
+    :param key: key columns of user
+    :param conditions: other conditions
+    :return: str
+    """
+    conditions = [f"{column} = ?" for column in key] + [
+        condition for condition in conditions if condition
+    ]
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+def _create_dimension_tables(cursor):
+    """Create location and description tables
+
+    :param cursor: sqlite3 Cursor object
+    :return: None
+    """
+    for dimension in ("location", "description"):
+        cursor.execute(
+            rf"CREATE TABLE IF NOT EXISTS clocking_{dimension} ("
+            r"id INTEGER PRIMARY KEY,"
+            r"name TEXT UNIQUE NOT NULL"
+            r");"
+        )
+
+
+def _create_user_table(cursor, user):
+    """Create per user working hours table
+
+    :param cursor: sqlite3 Cursor object
+    :param user: user
+    :return: None
+    """
+    _create_dimension_tables(cursor)
+
+    # Create user table
+    cursor.execute(_working_hours_schema(user))
+    _create_user_indexes(cursor, user)
+
+
+def _user_indexes(user):
+    """Create queries of indexes of per user working hours table
+
+    :param user: user
+    :return: dict of create query by index name
+    """
+    table = _user_table(user)
+    # Location index for per location reports
+    indexes = {
+        "location": f"ON {table} (location_id)",
+        # Month and year index for monthly and yearly getters
+        "year_month": f"ON {table} (year, month)",
+    }
+    # Partial indexes for flagged days
+    for flag in WorkingFlag:
+        indexes[flag.name.lower()] = (
+            rf"ON {table} (year, month, day) "
+            rf"WHERE {flags_condition(**{flag.name.lower(): True})}"
+        )
+    queries = {}
+    for kind, index in indexes.items():
+        # Prefix and kind before user: never a user table or index of other users
+        name = f"{INTERNAL_PREFIX}{kind}_{user}"
+        queries[name] = rf"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} {index};"
+    return queries
+
+
+def _unified_indexes():
+    """Create queries of indexes of unified working hours table
+
+    :return: dict of create query by index name
+    """
+    # Indexes for monthly and per location reports
+    indexes = {
+        "clocking_working_hours_user_year_month": (
+            "ON clocking_working_hours (user_id, year, month)"
+        ),
+        "clocking_working_hours_location": (
+            "ON clocking_working_hours (user_id, location_id)"
+        ),
+    }
+    # Partial indexes for flagged days
+    for flag in WorkingFlag:
+        indexes[f"clocking_working_hours_{flag.name.lower()}"] = (
+            r"ON clocking_working_hours (user_id, year, month, day) "
+            rf"WHERE {flags_condition(**{flag.name.lower(): True})}"
+        )
+    return {
+        name: rf"CREATE INDEX IF NOT EXISTS {name} {index};"
+        for name, index in indexes.items()
+    }
+
+
+def _create_user_indexes(cursor, user):
+    """Create indexes of per user working hours table
+
+    :param cursor: sqlite3 Cursor object
+    :param user: user
+    :return: None
+    """
+    for query in _user_indexes(user).values():
+        cursor.execute(query)
+
+
+def _table_columns(cursor, table):
+    """Get column names of table
+
+    :param cursor: sqlite3 Cursor object
+    :param table: table name
+    :return: list
+    """
+    cursor.execute("SELECT name FROM pragma_table_info(?);", (table,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _migrate_flags(cursor):
+    """Migration 1: add flags bitfield and partial indexes to user tables
+
+    :param cursor: sqlite3 Cursor object
+    :return: None
+    """
+    for user in _user_tables(cursor):
+        if "flags" in _table_columns(cursor, user):
+            continue
+        table = quote_identifier(user)
+        cursor.execute(
+            rf"ALTER TABLE {table} ADD COLUMN flags INTEGER NOT NULL DEFAULT 0;"
+        )
+        cursor.execute(
+            rf"UPDATE {table} SET flags = "
+            + " | ".join(
+                f"(CASE WHEN {flag.name.lower()} IS NOT 0 "
+                f"AND {flag.name.lower()} IS NOT NULL "
+                f"THEN {flag.value} ELSE 0 END)"
+                for flag in WorkingFlag
+            )
+            + ";"
+        )
+
+
+def _migrate_dimensions(cursor):
+    """Migration 2: encode location and description into dimension tables
+
+    :param cursor: sqlite3 Cursor object
+    :return: None
+    """
+    _create_dimension_tables(cursor)
+    for user in _user_tables(cursor):
+        if "location" in _table_columns(cursor, user):
+            table = quote_identifier(user)
+            encoded = f"{INTERNAL_PREFIX}encoded"
+            for dimension in ("location", "description"):
+                cursor.execute(
+                    rf"INSERT OR IGNORE INTO clocking_{dimension} (name) "
+                    rf"SELECT DISTINCT {dimension} FROM {table} "
+                    rf"WHERE {dimension} IS NOT NULL;"
+                )
+            # Rebuild table with encoded values
+            cursor.execute(_working_hours_schema(encoded))
+            cursor.execute(
+                rf"INSERT INTO {encoded} "
+                r"SELECT date_id, year, month, day, hours, "
+                r"(SELECT id FROM clocking_description "
+                rf"WHERE name = {table}.description), "
+                rf"(SELECT id FROM clocking_location WHERE name = {table}.location), "
+                r"extraordinary, permit_hours, other_hours, holiday, disease, flags "
+                rf"FROM {table};"
+            )
+            cursor.execute(rf"DROP TABLE {table};")
+            cursor.execute(rf"ALTER TABLE {encoded} RENAME TO {table};")
+        _create_user_indexes(cursor, user)
+
+
+def _migrate_indexes(cursor):
+    """Migration 3: create missing indexes of working hours tables
+
+    :param cursor: sqlite3 Cursor object
+    :return: None
+    """
+    for user in _user_tables(cursor):
+        # Tables of other applications
+        if "date_id" in _table_columns(cursor, user):
+            _create_user_indexes(cursor, user)
+    if _is_unified(cursor):
+        for query in _unified_indexes().values():
+            cursor.execute(query)
+
+
+# Ordered schema migrations: PRAGMA user_version is the number of applied steps
+MIGRATIONS = (_migrate_flags, _migrate_dimensions, _migrate_indexes)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _create_unified_table(cursor):
+    """Create unified working hours table of all users
+
+    :param cursor: sqlite3 Cursor object
+    :return: None
+    """
+    _create_dimension_tables(cursor)
+
+    # Create user and working hours tables
+    cursor.execute(
+        r"CREATE TABLE IF NOT EXISTS clocking_user ("
+        r"id INTEGER PRIMARY KEY,"
+        r"name TEXT UNIQUE NOT NULL"
+        r");"
+    )
+    cursor.execute(_working_hours_schema("clocking_working_hours", unified=True))
+
+    # Create indexes of reports and flagged days
+    for query in _unified_indexes().values():
+        cursor.execute(query)
+
+
+def _current_configuration(database, user):
+    """Read current enabled configuration for user
+
+    :param database: database file path
+    :param user: user in configuration table
+    :return: tuple
+    """
+    # Create the database connection
+    with connect(database, readonly=True) as conn:
+        # Create cursor
+        cur = conn.cursor()
+
+        # Get active configuration for user
+        cur.execute(
+            r"SELECT * FROM configuration WHERE user = ? AND active = 1;", (user,)
+        )
+        result = cur.fetchone()
+
+        return UserConfiguration(*result) if result else ()
+
+
+def _import_rows(stream, fmt):
+    """Read rows of working hours lazily from stream
+
+    :param stream: text file object
+    :param fmt: format of stream: csv, json or ndjson
+    :return: Generator of dict
+    :raise: ValueError
+    """
+    # Import only the reader of format
+    if fmt == "csv":
+        import csv
+
+        yield from csv.DictReader(stream)
+    elif fmt == "ndjson":
+        import json
+
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == "json":
+        import json
+
+        # JSON array can't be read lazily
+        for item in json.load(stream):
+            # Skip header row of exported tables
+            if isinstance(item, dict):
+                yield item
+    else:
+        raise ValueError(f"{fmt} is not one of {', '.join(IMPORT_FORMATS)}")
+
+
+def _import_value(row, column):
+    """Get typed value of imported column
+
+    :param row: imported row
+    :param column: column name
+    :return: int, float, str or None
+    """
+    value = row.get(column)
+    if not isinstance(value, str):
+        return value
+    # Empty and exported None values
+    if value in ("", "None"):
+        return None
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _import_values(row, configuration, warn):
+    """Build values of working hours table from imported row
+
+    :param row: imported row
+    :param configuration: UserConfiguration object
+    :param warn: function that prints warning messages
+    :return: tuple
+    :raise: WorkingDayError
+    """
+    value = lambda column: _import_value(row, column)  # noqa: E731
+    # Date of working day
+    try:
+        if value("date_id"):
+            year, month, day = split_dateid(str(value("date_id")))
+        elif value("date"):
+            year, month, day = split_dateid(build_dateid(str(value("date"))))
+        else:
+            year, month, day = (
+                int(value(column)) for column in ("year", "month", "day")
+            )
+        date = datetime(year, month, day)
+    except (TypeError, ValueError) as err:
+        raise WorkingDayError(f"invalid date of row {row}") from err
+    # Apply configuration rules like set command
+    values = check_working_day(
+        configuration,
+        date.strftime("%a"),
+        hours=value("hours"),
+        extraordinary=value("extraordinary") or 0,
+        permit_hours=value("permit_hours") or 0,
+        other_hours=value("other_hours") or 0,
+        disease=value("disease"),
+        description=value("description"),
+        empty_value=value("empty_value"),
+        warn=warn,
+    )
+    hours = values["hours"]
+    hours = hours if hours else values["empty_value"] if values["empty_value"] else 0
+    location = value("location") or configuration.location
+    holiday = value("holiday")
+    return (
+        int(date.strftime("%Y%m%d")),
+        year,
+        month,
+        day,
+        hours,
+        values["description"],
+        location,
+        values["extraordinary"],
+        values["permit_hours"],
+        values["other_hours"],
+        holiday,
+        value("disease"),
+        build_flags(
+            holiday,
+            value("disease"),
+            values["extraordinary"],
+            values["permit_hours"],
+            values["other_hours"],
+        ),
+    )
+
+
+def _write_working_days(
+    database, user, days, batch_size=IMPORT_BATCH_SIZE, checkpoint=None, done=0
+):
+    """Write working days by batches, every batch in its own transaction
+
+    :param database: database file path
+    :param user: user in configuration table
+    :param days: iterable of tuples of working hours table values
+    :param batch_size: number of days written in one transaction
+    :param checkpoint: name of checkpoint updated with every batch
+    :param done: number of days written before
+    :return: int
+    """
+    days = iter(days)
+    dimensions = {}
+    written = 0
+    while batch := list(islice(days, batch_size)):
+        # Create the database connection
+        with connect(database) as conn:
+            # Create cursor
+            cur = conn.cursor()
+
+            table, key = _working_hours_source(cur, user, create=True)
+            # Encode dimension values once
+            for values in batch:
+                for table_name, value in (
+                    ("clocking_description", values[5]),
+                    ("clocking_location", values[6]),
+                ):
+                    if (table_name, value) not in dimensions:
+                        dimensions[table_name, value] = _dimension_id(
+                            cur, table_name, value
+                        )
+            cur.executemany(
+                rf"INSERT OR REPLACE INTO {table} ("
+                + "".join(f"{column}, " for column in key)
+                + r"date_id, year, month, day, hours, description_id, location_id, "
+                r"extraordinary, permit_hours, other_hours, holiday, disease, flags) "
+                r"VALUES ("
+                + "?, " * len(key)
+                + r"?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+                (
+                    (
+                        *key.values(),
+                        *values[:5],
+                        dimensions["clocking_description", values[5]],
+                        dimensions["clocking_location", values[6]],
+                        *values[7:],
+                    )
+                    for values in batch
+                ),
+            )
+            written += len(batch)
+            progress = current_progress()
+            if progress is not None:
+                progress.advance(len(batch))
+            # Save checkpoint with days of batch
+            if checkpoint:
+                cur.execute(
+                    r"INSERT OR REPLACE INTO clocking_checkpoint (name, rows) "
+                    r"VALUES (?, ?);",
+                    (checkpoint, done + written),
+                )
+
+    return written
+
+
+def _apply_step(cursor, step, version=None):
+    """Apply schema step in its own transaction
+
+    :param cursor: sqlite3 Cursor object of autocommit connection
+    :param step: function that gets cursor
+    :param version: schema version recorded with step; None is no version
+    :return: None
+    """
+    cursor.execute("BEGIN IMMEDIATE;")
+    try:
+        step(cursor)
+        if version is not None:
+            cursor.execute(f"PRAGMA user_version = {version};")
+        cursor.execute("COMMIT;")
+    except sqlite3.Error:
+        cursor.execute("ROLLBACK;")
+        raise
+
+
+def _working_hours_sources(cursor):
+    """Get working hours tables with their key columns
+
+    :param cursor: sqlite3 Cursor object
+    :return: list of tuple of table name, quoted table and key
+    """
+    sources = [
+        (user, _user_table(user), {})
+        for user in _user_tables(cursor)
+        # Tables of other applications
+        if "date_id" in _table_columns(cursor, user)
+    ]
+    if _is_unified(cursor):
+        sources.append(
+            ("clocking_working_hours", "clocking_working_hours", {"user_id": None})
+        )
+    return sources
+
+
+def _numeric_text(value):
+    """Convert numeric text, also with decimal comma
+
+    :param value: text value
+    :return: float or None
+    """
+    try:
+        return float(value.strip().replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _text_values(cursor, table, column):
+    """Get text values of numeric column
+
+    :param cursor: sqlite3 Cursor object
+    :param table: quoted table name
+    :param column: column name
+    :return: list of tuple of value and count
+    """
+    cursor.execute(
+        rf"SELECT {column}, COUNT(*) FROM {table} "
+        rf"WHERE typeof({column}) = 'text' GROUP BY {column};"
+    )
+    return cursor.fetchall()
+
+
+def _repair_types(cursor):
+    """Convert numeric text of numeric columns into numbers
+
+    :param cursor: sqlite3 Cursor object
+    :return: None
+    """
+    for _, table, _ in _working_hours_sources(cursor):
+        for column in NUMERIC_COLUMNS:
+            for value, _ in _text_values(cursor, table, column):
+                number = _numeric_text(value)
+                if number is not None:
+                    cursor.execute(
+                        rf"UPDATE {table} SET {column} = ? "
+                        rf"WHERE typeof({column}) = 'text' AND {column} = ?;",
+                        (number, value),
+                    )
+
+
+def _diagnose_pragmas(cursor):
+    """Check schema version, integrity, journal mode and free pages
+
+    :param cursor: sqlite3 Cursor object
+    :return: list of Finding
+    """
+    findings = []
+    version = cursor.execute("PRAGMA user_version;").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        findings.append(
+            Finding(
+                "warning",
+                "schema",
+                "user_version",
+                f"{SCHEMA_VERSION - version} pending migrations",
+                "migrate",
+            )
+        )
+    problems = [row[0] for row in cursor.execute("PRAGMA quick_check;").fetchall()]
+    if problems != ["ok"]:
+        findings.append(
+            Finding("error", "integrity", "database", "; ".join(problems[:5]), None)
+        )
+    journal = cursor.execute("PRAGMA journal_mode;").fetchone()[0]
+    if journal.lower() != "wal":
+        findings.append(
+            Finding(
+                "info",
+                "pragma",
+                "journal_mode",
+                f"journal mode is {journal}: readers wait writers, WAL doesn't",
+                "journal",
+            )
+        )
+    pages = cursor.execute("PRAGMA page_count;").fetchone()[0]
+    free = cursor.execute("PRAGMA freelist_count;").fetchone()[0]
+    if pages and free / pages > DOCTOR_FREELIST:
+        findings.append(
+            Finding(
+                "info",
+                "pragma",
+                "freelist_count",
+                f"{free} of {pages} pages are free",
+                "vacuum",
+            )
+        )
+    dangling = {}
+    for table, *_ in cursor.execute("PRAGMA foreign_key_check;").fetchall():
+        dangling[table] = dangling.get(table, 0) + 1
+    for table, rows in dangling.items():
+        findings.append(
+            Finding(
+                "warning",
+                "foreign_key",
+                table,
+                f"{rows} rows reference missing rows",
+                None,
+            )
+        )
+    return findings
+
+
+def _diagnose_table(cursor, name, table, key, empty_values):
+    """Check indexes, query plans of getters and types of working hours table
+
+    :param cursor: sqlite3 Cursor object
+    :param name: table name
+    :param table: quoted table name
+    :param key: key columns of table
+    :param empty_values: text values allowed as hours
+    :return: list of Finding
+    """
+    findings = []
+    # Indexes of table
+    expected = _unified_indexes() if key else _user_indexes(name)
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?;",
+        (name,),
+    )
+    missing = set(expected) - {row[0] for row in cursor.fetchall()}
+    if missing:
+        findings.append(
+            Finding(
+                "warning",
+                "index",
+                name,
+                f"missing indexes: {', '.join(sorted(missing))}",
+                "indexes",
+            )
+        )
+    # Query plans of standard getters
+    getters = {
+        "get_working_hours": ("date_id = ?",),
+        "get_whole_month": ("year = ?", "month = ?"),
+        "get_whole_year": ("year = ?",),
+    }
+    scans = []
+    for getter, conditions in getters.items():
+        query = _select_working_hours(table) + _where(key, *conditions)
+        try:
+            cursor.execute(
+                f"EXPLAIN QUERY PLAN {query}",
+                (*key.values(), *(None,) * len(conditions)),
+            )
+        except sqlite3.OperationalError:
+            # Tables of older schema: pending migrations are a finding
+            break
+        # Full scan of table, without any index
+        if any(
+            row[3] == f"SCAN {name}"
+            or row[3].startswith(f"SCAN {name} ")
+            and " USING " not in row[3]
+            for row in cursor.fetchall()
+        ):
+            scans.append(getter)
+    # Planner can scan small tables on purpose, without missing indexes
+    if scans:
+        findings.append(
+            Finding(
+                "warning" if missing else "info",
+                "plan",
+                name,
+                f"{', '.join(scans)} scan whole table",
+                "indexes" if missing else None,
+            )
+        )
+    # Text values of numeric columns
+    for column in NUMERIC_COLUMNS:
+        numeric = unknown = 0
+        examples = []
+        for value, rows in _text_values(cursor, table, column):
+            if _numeric_text(value) is not None:
+                numeric += rows
+            elif not (column == "hours" and value in empty_values):
+                unknown += rows
+                examples.append(repr(value))
+        if numeric:
+            findings.append(
+                Finding(
+                    "warning",
+                    "type",
+                    f"{name}.{column}",
+                    f"{numeric} numbers stored as text",
+                    "types",
+                )
+            )
+        if unknown:
+            findings.append(
+                Finding(
+                    "warning",
+                    "type",
+                    f"{name}.{column}",
+                    f"{unknown} text values aren't numbers: {', '.join(examples[:5])}",
+                    None,
+                )
+            )
+    return findings
+
+
 def database_exists(database):
     """Check if database exists
 
@@ -97,7 +958,7 @@ def make_database(database):
     :return: None
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -109,8 +970,11 @@ def make_database(database):
         cur.execute("SELECT version_id FROM version")
         if not cur.fetchone():
             cur.execute(
-                f"INSERT INTO version (version_id, name) VALUES ('{__version__}', 'clocking');"
+                "INSERT INTO version (version_id, name) VALUES (?, 'clocking');",
+                (__version__,),
             )
+        # New database has all migrations applied
+        cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
 
 
 def delete_database(database):
@@ -120,7 +984,7 @@ def delete_database(database):
     :return: None
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -130,7 +994,9 @@ def delete_database(database):
 
         # Drop all tables
         for table in tables:
-            cur.execute(f"DROP TABLE IF EXISTS {table};")
+            cur.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)};")
+        # Reset applied migrations
+        cur.execute("PRAGMA user_version = 0;")
 
 
 def get_current_version(database):
@@ -140,26 +1006,68 @@ def get_current_version(database):
     :return: string
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database, readonly=True) as conn:
         # Create cursor
         cur = conn.cursor()
 
-        # Get clocking version
-        cur.execute("SELECT version_id FROM version;")
+        # Get last clocking version
+        cur.execute("SELECT version_id FROM version ORDER BY rowid DESC LIMIT 1;")
+
+        result = cur.fetchone()[0]
+
+    return result
+
 
-        result = cur.fetchall()[-1][0]
+def get_schema_version(database):
+    """Get number of schema migrations applied on database
+
+    :param database: database file path
+    :return: int
+    """
+    # Create the database connection
+    with connect(database, readonly=True) as conn:
+        # Read schema version from database header
+        result = conn.execute("PRAGMA user_version;").fetchone()[0]
 
     return result
 
 
+def migrate_database(database):
+    """Apply pending schema migrations, each one in its own transaction
+
+    :param database: database file path
+    :return: list
+    """
+    applied = []
+    # Create the database connection in autocommit mode
+    conn = open_connection(database, isolation_level=None)
+    try:
+        # Create cursor
+        cur = conn.cursor()
+
+        current = cur.execute("PRAGMA user_version;").fetchone()[0]
+        for version, migration in enumerate(MIGRATIONS, start=1):
+            if version <= current:
+                continue
+            # Apply migration and record it atomically
+            _apply_step(cur, migration, version)
+            applied.append(version)
+    finally:
+        conn.close()
+
+    return applied
+
+
 def update_version(database):
-    """Update clocking version into database
+    """Update clocking version into database, applying schema migrations
 
     :param database: database file path
     :return: bool
     """
+    # Apply pending migrations
+    migrate_database(database)
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
         # Create new version table
@@ -168,7 +1076,8 @@ def update_version(database):
         )
         # Insert version into properly table
         cur.execute(
-            f"INSERT INTO version (version_id, name) VALUES ('{__version__}', 'clocking');"
+            "INSERT OR REPLACE INTO version (version_id, name) VALUES (?, 'clocking');",
+            (__version__,),
         )
 
         result = False if cur.rowcount <= 0 else True
@@ -176,6 +1085,90 @@ def update_version(database):
     return result
 
 
+def diagnose_database(database):
+    """Check schema, pragmas, indexes, query plans and column types of database
+
+    :param database: database file path
+    :return: list of Finding
+    """
+    # Own connection: plans of cached statements ignore new indexes
+    conn = open_connection(_readonly_uri(database), uri=True)
+    try:
+        # Create cursor
+        cur = conn.cursor()
+
+        findings = _diagnose_pragmas(cur)
+        # Empty values of configurations aren't wrong hours
+        empty_values = set()
+        if "empty_value" in _table_columns(cur, "configuration"):
+            cur.execute("SELECT DISTINCT empty_value FROM configuration;")
+            empty_values = {row[0] for row in cur.fetchall()}
+        for name, table, key in _working_hours_sources(cur):
+            findings.extend(_diagnose_table(cur, name, table, key, empty_values))
+        # Statistics of query planner
+        if not cur.execute(
+            "SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1';"
+        ).fetchone():
+            findings.append(
+                Finding(
+                    "info",
+                    "pragma",
+                    "sqlite_stat1",
+                    "query planner has no statistics of indexes",
+                    "analyze",
+                )
+            )
+    finally:
+        conn.close()
+
+    return findings
+
+
+def repair_database(database, fixes=DOCTOR_FIXES):
+    """Apply fixes of doctor findings, schema fixes like migrations
+
+    :param database: database file path
+    :param fixes: names of fixes: migrate, types, indexes, analyze, journal, vacuum
+    :return: list of applied fixes
+    :raise: ValueError
+    """
+    fixes = set(fixes)
+    unknown = fixes - set(DOCTOR_FIXES)
+    if unknown:
+        raise ValueError(
+            f"{', '.join(sorted(unknown))} not in {', '.join(DOCTOR_FIXES)}"
+        )
+    applied = []
+    # Pending migrations before other fixes
+    if "migrate" in fixes:
+        migrate_database(database)
+        applied.append("migrate")
+    # Create the database connection in autocommit mode
+    conn = open_connection(database, isolation_level=None)
+    try:
+        # Create cursor
+        cur = conn.cursor()
+
+        for fix in DOCTOR_FIXES:
+            if fix not in fixes or fix == "migrate":
+                continue
+            if fix == "types":
+                _apply_step(cur, _repair_types)
+            elif fix == "indexes":
+                _apply_step(cur, _migrate_indexes)
+            elif fix == "analyze":
+                cur.execute("ANALYZE;")
+            elif fix == "journal":
+                cur.execute("PRAGMA journal_mode = WAL;")
+            elif fix == "vacuum":
+                cur.execute("VACUUM;")
+            applied.append(fix)
+    finally:
+        conn.close()
+
+    return applied
+
+
 def create_configuration_table(database):
     """Create configuration table
 
@@ -183,7 +1176,7 @@ def create_configuration_table(database):
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -258,7 +1251,7 @@ def add_configuration(
     :return: int
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -302,7 +1295,7 @@ def enable_configuration(database, row_id):
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -342,7 +1335,7 @@ def reset_configuration(database):
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -363,7 +1356,7 @@ def get_configurations(database, user=None, enabled=False):
     :return: Cursor
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database, readonly=True) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -389,18 +1382,13 @@ def get_current_configuration(database, user):
     :param user: user in configuration table
     :return: tuple
     """
-    # Create the database connection
-    with sqlite3.connect(database) as conn:
-        # Create cursor
-        cur = conn.cursor()
-
-        # Get active configuration for user
-        cur.execute(
-            r"SELECT * FROM configuration WHERE user = ? AND active = 1;", (user,)
+    # Session with cache keeps configurations until database changes
+    session = current_session(database)
+    if session and session.cache:
+        return session.cached(
+            ("configuration", user), _current_configuration, database, user
         )
-        result = cur.fetchone()
-
-        return UserConfiguration(*result) if result else ()
+    return _current_configuration(database, user)
 
 
 def get_working_hours(
@@ -432,7 +1420,7 @@ def get_working_hours(
     :return: Cursor
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database, readonly=True) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -440,23 +1428,19 @@ def get_working_hours(
         date_id = build_dateid(date, year, month, day)
 
         # Get working day
-        query = f"SELECT * FROM '{user}' WHERE date_id='{date_id}'"
-        # Check if return only holiday
-        if holiday:
-            query += " AND (holiday IS NOT 0 AND holiday IS NOT NULL)"
-        elif disease:
-            query += " AND (disease IS NOT 0 AND disease IS NOT NULL)"
-        elif extraordinary:
-            query += " AND (extraordinary IS NOT 0 AND extraordinary IS NOT NULL)"
-        elif permit_hours:
-            query += " AND (permit_hours IS NOT 0 AND permit_hours IS NOT NULL)"
-        elif other_hours:
-            query += " AND (other_hours IS NOT 0 AND other_hours IS NOT NULL)"
-        cur.execute(query)
+        table, key = _working_hours_source(cur, user)
+        query = _select_working_hours(table) + _where(
+            key,
+            "date_id = ?",
+            # Check if return only flagged days
+            flags_condition(holiday, disease, extraordinary, permit_hours, other_hours),
+        )
+        cur.execute(query, (*key.values(), date_id))
 
     return cur
 
 
+@measured("get_year")
 def get_whole_year(
     database,
     user,
@@ -480,28 +1464,24 @@ def get_whole_year(
     :return: Cursor
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database, readonly=True) as conn:
         # Create cursor
         cur = conn.cursor()
 
         # Get working day from whole year
-        query = f"SELECT * FROM '{user}' WHERE year = ?"
-        # Check if return only holiday
-        if holiday:
-            query += " AND (holiday IS NOT 0 AND holiday IS NOT NULL)"
-        elif disease:
-            query += " AND (disease IS NOT 0 AND disease IS NOT NULL)"
-        elif extraordinary:
-            query += " AND (extraordinary IS NOT 0 AND extraordinary IS NOT NULL)"
-        elif permit_hours:
-            query += " AND (permit_hours IS NOT 0 AND permit_hours IS NOT NULL)"
-        elif other_hours:
-            query += " AND (other_hours IS NOT 0 AND other_hours IS NOT NULL)"
-        cur.execute(query, (year,))
+        table, key = _working_hours_source(cur, user)
+        query = _select_working_hours(table) + _where(
+            key,
+            "year = ?",
+            # Check if return only flagged days
+            flags_condition(holiday, disease, extraordinary, permit_hours, other_hours),
+        )
+        cur.execute(query, (*key.values(), year))
 
     return cur
 
 
+@measured("get_month")
 def get_whole_month(
     database,
     user,
@@ -527,24 +1507,20 @@ def get_whole_month(
     :return: Cursor
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database, readonly=True) as conn:
         # Create cursor
         cur = conn.cursor()
 
         # Get working day from whole month
-        query = rf"SELECT * FROM '{user}' WHERE year = ? AND month = ?"
-        # Check if return only holiday
-        if holiday:
-            query += " AND (holiday IS NOT 0 AND holiday IS NOT NULL)"
-        elif disease:
-            query += " AND (disease IS NOT 0 AND disease IS NOT NULL)"
-        elif extraordinary:
-            query += " AND (extraordinary IS NOT 0 AND extraordinary IS NOT NULL)"
-        elif permit_hours:
-            query += " AND (permit_hours IS NOT 0 AND permit_hours IS NOT NULL)"
-        elif other_hours:
-            query += " AND (other_hours IS NOT 0 AND other_hours IS NOT NULL)"
-        cur.execute(query, (year, month))
+        table, key = _working_hours_source(cur, user)
+        query = _select_working_hours(table) + _where(
+            key,
+            "year = ?",
+            "month = ?",
+            # Check if return only flagged days
+            flags_condition(holiday, disease, extraordinary, permit_hours, other_hours),
+        )
+        cur.execute(query, (*key.values(), year, month))
 
     return cur
 
@@ -570,24 +1546,177 @@ def get_all_days(
     :return: Cursor
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database, readonly=True) as conn:
         # Create cursor
         cur = conn.cursor()
 
         # Get all working days
-        query = rf"SELECT * FROM '{user}'"
-        # Check if return only holiday
-        if holiday:
-            query += " WHERE (holiday IS NOT 0 AND holiday IS NOT NULL)"
-        elif disease:
-            query += " WHERE (disease IS NOT 0 AND disease IS NOT NULL)"
-        elif extraordinary:
-            query += " WHERE (extraordinary IS NOT 0 AND extraordinary IS NOT NULL)"
-        elif permit_hours:
-            query += " WHERE (permit_hours IS NOT 0 AND permit_hours IS NOT NULL)"
-        elif other_hours:
-            query += " WHERE (other_hours IS NOT 0 AND other_hours IS NOT NULL)"
-        cur.execute(query)
+        table, key = _working_hours_source(cur, user)
+        query = _select_working_hours(table) + _where(
+            key,
+            # Check if return only flagged days
+            flags_condition(holiday, disease, extraordinary, permit_hours, other_hours),
+        )
+        cur.execute(query, tuple(key.values()))
+
+    return cur
+
+
+def get_location_hours(database, user, year=None, month=None):
+    """Get worked hours grouped by location from database
+
+    :param database: database file path
+    :param user: user in configuration table
+    :param year: year of the date
+    :param month: month of the date
+    :return: Cursor
+    """
+    # Create the database connection
+    with connect(database, readonly=True) as conn:
+        # Create cursor
+        cur = conn.cursor()
+
+        # Get worked hours for every location
+        table, key = _working_hours_source(cur, user)
+        # Filter by year and month
+        params = (year, month) if year and month else (year,) if year else ()
+        conditions = ("year = ?", "month = ?")[: len(params)]
+        query = (
+            r"SELECT clocking_location.name AS location, COUNT(date_id) AS days, "
+            r"SUM(hours) AS hours, SUM(extraordinary) AS extraordinary, "
+            r"SUM(permit_hours) AS permit_hours, SUM(other_hours) AS other_hours "
+            rf"FROM {table} LEFT JOIN clocking_location "
+            r"ON clocking_location.id = location_id"
+            + _where(key, *conditions)
+            + " GROUP BY location_id"
+        )
+        cur.execute(query, (*key.values(), *params))
+
+    return cur
+
+
+def get_users_hours(database, year=None, month=None):
+    """Get worked hours grouped by user from database
+
+    :param database: database file path
+    :param year: year of the date
+    :param month: month of the date
+    :return: Cursor
+    """
+    # Create the database connection
+    with connect(database, readonly=True) as conn:
+        # Create cursor
+        cur = conn.cursor()
+
+        # Filter by year and month
+        params = (year, month) if year and month else (year,) if year else ()
+        where = _where({}, *("year = ?", "month = ?")[: len(params)])
+        # Get worked hours for every user
+        totals = (
+            r"COUNT(date_id) AS days, SUM(hours) AS hours, "
+            r"SUM(extraordinary) AS extraordinary, SUM(permit_hours) AS permit_hours, "
+            r"SUM(other_hours) AS other_hours"
+        )
+        if _is_unified(cur):
+            # One indexed query for all users
+            cur.execute(
+                rf"SELECT clocking_user.name AS user, {totals} "
+                r"FROM clocking_working_hours "
+                rf"JOIN clocking_user ON clocking_user.id = user_id{where} "
+                r"GROUP BY user_id ORDER BY clocking_user.name;",
+                params,
+            )
+        elif _user_tables(cur):
+            # One query for every user table
+            users = _user_tables(cur)
+            cur.execute(
+                " UNION ALL ".join(
+                    rf"SELECT ? AS user, {totals} FROM {quote_identifier(user)}{where}"
+                    for user in users
+                )
+                + " ORDER BY user;",
+                [value for user in users for value in (user, *params)],
+            )
+        else:
+            # No working hours tables
+            cur.execute(
+                r"SELECT NULL AS user, NULL AS days, NULL AS hours, "
+                r"NULL AS extraordinary, NULL AS permit_hours, NULL AS other_hours "
+                r"WHERE 0;"
+            )
+
+    return cur
+
+
+def _database_users_hours(database, year=None, month=None):
+    """Get worked hours grouped by user from one database of many
+
+    :param database: database file path
+    :param year: year of the date
+    :param month: month of the date
+    :return: tuple of database, rows and error message
+    """
+    try:
+        # Never create or lock database of other users
+        with Session(database, readonly=True):
+            return database, get_users_hours(database, year, month).fetchall(), None
+    except sqlite3.DatabaseError as err:
+        return database, [], str(err)
+
+
+def get_databases_hours(databases, year=None, month=None, workers=None, warn=None):
+    """Get worked hours grouped by user from many databases
+
+    Every database is read on a process of a pool, with a read-only
+    connection; partial sums of users are merged.
+
+    :param databases: database file paths
+    :param year: year of the date
+    :param month: month of the date
+    :param workers: number of processes; None is number of CPUs
+    :param warn: function that prints errors of skipped databases
+    :return: Cursor
+    :raise: sqlite3.DatabaseError
+    """
+    databases = list(databases)
+    workers = workers or os.cpu_count() or 1
+    read = partial(_database_users_hours, year=year, month=month)
+    # Processes don't pay off for one database
+    if workers == 1 or len(databases) < 2:
+        results = map(read, databases)
+        executor = None
+    else:
+        # Import only when databases are read in parallel
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(min(workers, len(databases)))
+        # Few chunks for every process: less pickling of tasks
+        chunksize = max(1, len(databases) // (workers * 4))
+        results = executor.map(read, databases, chunksize=chunksize)
+    # Merge partial sums on memory database
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    cur.execute(
+        r"CREATE TABLE partial (user TEXT, days INTEGER, hours REAL, "
+        r"extraordinary REAL, permit_hours REAL, other_hours REAL);"
+    )
+    try:
+        for database, rows, error in results:
+            if error:
+                if not warn:
+                    raise sqlite3.DatabaseError(f"{database}: {error}")
+                warn(f"warning: skip database {database}: {error}")
+            cur.executemany(r"INSERT INTO partial VALUES (?, ?, ?, ?, ?, ?);", rows)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    # User tables without days of period have empty sums
+    cur.execute(
+        r"SELECT user, SUM(days) AS days, SUM(hours) AS hours, "
+        r"SUM(extraordinary) AS extraordinary, SUM(permit_hours) AS permit_hours, "
+        r"SUM(other_hours) AS other_hours FROM partial WHERE days > 0 "
+        r"GROUP BY user ORDER BY user;"
+    )
 
     return cur
 
@@ -600,7 +1729,7 @@ def delete_configuration(database, row_id):
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -620,34 +1749,64 @@ def create_working_hours_table(database, user):
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
+        # Register user into unified table
+        if _is_unified(cur):
+            _create_unified_table(cur)
+            _working_hours_source(cur, user, create=True)
+            return True
+
         # Create user table
-        cur.execute(
-            rf"CREATE TABLE IF NOT EXISTS '{user}' ("
-            r"date_id INTEGER PRIMARY KEY,"
-            r"year INTEGER NOT NULL,"
-            r"month INTEGER NOT NULL,"
-            r"day INTEGER NOT NULL,"
-            r"hours FLOAT NOT NULL,"
-            r"description TEXT,"
-            r"location TEXT,"
-            r"extraordinary FLOAT,"
-            r"permit_hours FLOAT,"
-            r"other_hours FLOAT ,"
-            r"holiday TEXT,"
-            r"disease TEXT"
-            r");"
-        )
+        _create_user_table(cur, user)
 
         # Return boolean if user table was created
-        cur.execute(f"SELECT name FROM sqlite_master WHERE name='{user}'")
+        cur.execute("SELECT name FROM sqlite_master WHERE name = ?;", (user,))
 
     return bool(cur.fetchone())
 
 
+def unify_working_hours_tables(database):
+    """Move all per user tables into unified working hours table
+
+    :param database: database file path
+    :return: list
+    """
+    # Upgrade every user table before moving it
+    migrate_database(database)
+    # Create the database connection
+    with connect(database) as conn:
+        # Create cursor
+        cur = conn.cursor()
+
+        users = _user_tables(cur)
+        # Create unified table
+        _create_unified_table(cur)
+
+        # Move every user table into unified table
+        for user in users:
+            cur.execute(
+                "INSERT OR IGNORE INTO clocking_user (name) VALUES (?);", (user,)
+            )
+            cur.execute(
+                r"INSERT OR REPLACE INTO clocking_working_hours ("
+                r"user_id, date_id, year, month, day, hours, description_id, "
+                r"location_id, extraordinary, permit_hours, other_hours, holiday, "
+                r"disease, flags) "
+                r"SELECT (SELECT id FROM clocking_user WHERE name = ?), "
+                r"date_id, year, month, day, hours, description_id, location_id, "
+                r"extraordinary, permit_hours, other_hours, holiday, disease, flags "
+                rf"FROM {quote_identifier(user)};",
+                (user,),
+            )
+            cur.execute(rf"DROP TABLE {quote_identifier(user)};")
+
+    return users
+
+
+@measured("insert", rows=int)
 def insert_working_hours(
     database,
     user,
@@ -685,14 +1844,12 @@ def insert_working_hours(
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
         # Check if user table exists
-        cur.execute(f"SELECT name FROM sqlite_master WHERE name='{user}'")
-        if not cur.fetchone():
-            create_working_hours_table(database, user)
+        table, key = _working_hours_source(cur, user, create=True)
 
         # Get date_id
         date_id = build_dateid(date, year, month, day)
@@ -700,17 +1857,28 @@ def insert_working_hours(
 
         # Check empty hours
         hours = hours if hours else empty_value if empty_value else 0
+        flags = build_flags(holiday, disease, extraordinary, permit_hours, other_hours)
+        # Encode dimension values
+        description = _dimension_id(cur, "clocking_description", description)
+        location = _dimension_id(cur, "clocking_location", location)
 
         # Check if date_id exists
-        cur.execute(f"SELECT date_id FROM '{user}' WHERE date_id='{date_id}'")
+        cur.execute(
+            f"SELECT date_id FROM {table}{_where(key, 'date_id = ?')}",
+            (*key.values(), date_id),
+        )
         if not cur.fetchone():
             # Insert into database
             cur.execute(
-                rf"INSERT INTO '{user}' ("
-                r"date_id, year, month, day, hours, description, location, "
-                r"extraordinary, permit_hours, other_hours, holiday, disease) "
-                r"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+                rf"INSERT INTO {table} ("
+                + "".join(f"{column}, " for column in key)
+                + r"date_id, year, month, day, hours, description_id, location_id, "
+                r"extraordinary, permit_hours, other_hours, holiday, disease, flags) "
+                r"VALUES ("
+                + "?, " * len(key)
+                + r"?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
                 (
+                    *key.values(),
                     date_id,
                     year,
                     month,
@@ -723,16 +1891,17 @@ def insert_working_hours(
                     other_hours,
                     holiday,
                     disease,
+                    flags,
                 ),
             )
         else:
             # Update into database
             cur.execute(
-                rf"UPDATE '{user}' "
-                r"SET hours = ?, description = ?, "
-                r"location = ?, extraordinary = ?, permit_hours = ?, "
-                r"other_hours = ?, holiday = ?, disease = ? "
-                r"WHERE date_id = ?;",
+                rf"UPDATE {table} "
+                r"SET hours = ?, description_id = ?, "
+                r"location_id = ?, extraordinary = ?, permit_hours = ?, "
+                r"other_hours = ?, holiday = ?, disease = ?, flags = ?"
+                + _where(key, "date_id = ?"),
                 (
                     hours,
                     description,
@@ -742,6 +1911,8 @@ def insert_working_hours(
                     other_hours,
                     holiday,
                     disease,
+                    flags,
+                    *key.values(),
                     date_id,
                 ),
             )
@@ -766,7 +1937,7 @@ def remove_working_hours(
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -777,15 +1948,20 @@ def remove_working_hours(
         hours = empty_value if empty_value else 0
 
         # Check if date_id exists
-        cur.execute(f"SELECT date_id FROM '{user}' WHERE date_id='{date_id}'")
+        table, key = _working_hours_source(cur, user)
+        cur.execute(
+            f"SELECT date_id FROM {table}{_where(key, 'date_id = ?')}",
+            (*key.values(), date_id),
+        )
         if cur.fetchone():
             # Update empty day into database
             cur.execute(
-                rf"UPDATE '{user}' "
-                r"SET hours = ?, description = ?, location = ?, extraordinary = ?, permit_hours = ?, "
-                r"other_hours = ?, holiday = ?, disease = ? "
-                r"WHERE date_id = ?;",
-                (hours, None, None, 0, 0, 0, None, None, date_id),
+                rf"UPDATE {table} "
+                r"SET hours = ?, description_id = ?, location_id = ?, "
+                r"extraordinary = ?, permit_hours = ?, "
+                r"other_hours = ?, holiday = ?, disease = ?, flags = ?"
+                + _where(key, "date_id = ?"),
+                (hours, None, None, 0, 0, 0, None, None, 0, *key.values(), date_id),
             )
 
         else:
@@ -810,7 +1986,7 @@ def delete_working_hours(database, user, date=None, day=None, month=None, year=N
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
@@ -818,10 +1994,17 @@ def delete_working_hours(database, user, date=None, day=None, month=None, year=N
         date_id = build_dateid(date, year, month, day)
 
         # Check if date_id exists
-        cur.execute(f"SELECT date_id FROM '{user}' WHERE date_id='{date_id}'")
+        table, key = _working_hours_source(cur, user)
+        cur.execute(
+            f"SELECT date_id FROM {table}{_where(key, 'date_id = ?')}",
+            (*key.values(), date_id),
+        )
         if cur.fetchone():
             # Delete day into database
-            cur.execute(rf"DELETE FROM '{user}' " r"WHERE date_id = ?;", (date_id,))
+            cur.execute(
+                rf"DELETE FROM {table}" + _where(key, "date_id = ?"),
+                (*key.values(), date_id),
+            )
 
         result = False if cur.rowcount <= 0 else True
 
@@ -837,12 +2020,16 @@ def delete_whole_year(database, user, year):
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
         # Delete whole year into database
-        cur.execute(rf"DELETE FROM '{user}' " r"WHERE year = ?;", (year,))
+        table, key = _working_hours_source(cur, user)
+        cur.execute(
+            rf"DELETE FROM {table}" + _where(key, "year = ?"),
+            (*key.values(), year),
+        )
 
         result = False if cur.rowcount <= 0 else True
 
@@ -859,14 +2046,15 @@ def delete_whole_month(database, user, year, month):
     :return: bool
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
         # Delete whole month into database
+        table, key = _working_hours_source(cur, user)
         cur.execute(
-            rf"DELETE FROM '{user}' " r"WHERE year = ? " r"AND month = ?;",
-            (year, month),
+            rf"DELETE FROM {table}" + _where(key, "year = ?", "month = ?"),
+            (*key.values(), year, month),
         )
 
         result = False if cur.rowcount <= 0 else True
@@ -882,18 +2070,199 @@ def delete_user(database, user):
     :return:
     """
     # Create the database connection
-    with sqlite3.connect(database) as conn:
+    with connect(database) as conn:
         # Create cursor
         cur = conn.cursor()
 
         # Delete whole month into database
-        cur.execute(rf"DELETE FROM '{user}';")
+        table, key = _working_hours_source(cur, user)
+        cur.execute(rf"DELETE FROM {table}" + _where(key), tuple(key.values()))
 
         result = False if cur.rowcount <= 0 else True
 
     return result
 
 
+def import_working_hours(
+    database,
+    user,
+    stream,
+    fmt="csv",
+    batch_size=IMPORT_BATCH_SIZE,
+    checkpoint=None,
+    warn=None,
+):
+    """Import working days from stream
+
+    Rows are read lazily and written by batches, every batch in its own
+    transaction. With a checkpoint name, number of imported rows is saved
+    with every batch, and an interrupted import resumes after it.
+
+    :param database: database file path
+    :param user: user in configuration table
+    :param stream: text file object with csv, json or ndjson rows
+    :param fmt: format of stream: csv, json or ndjson
+    :param batch_size: number of rows written in one transaction
+    :param checkpoint: name of import checkpoint; None is no checkpoint
+    :param warn: function that prints warning messages of rules
+    :return: int
+    :raise: UserConfigurationError, WorkingDayError, ValueError
+    """
+    # Get current configuration
+    configuration = get_current_configuration(database, user)
+    if not configuration:
+        raise UserConfigurationError(f"no active configuration found for user '{user}'")
+    warn = warn if warn else lambda message: None
+    # Resume after imported rows
+    done = 0
+    if checkpoint:
+        with connect(database) as conn:
+            conn.execute(
+                r"CREATE TABLE IF NOT EXISTS clocking_checkpoint ("
+                r"name TEXT PRIMARY KEY, rows INTEGER NOT NULL);"
+            )
+            result = conn.execute(
+                r"SELECT rows FROM clocking_checkpoint WHERE name = ?;", (checkpoint,)
+            ).fetchone()
+            done = result[0] if result else 0
+    rows = islice(_import_rows(stream, fmt), done, None)
+    imported = _write_working_days(
+        database,
+        user,
+        (_import_values(row, configuration, warn) for row in rows),
+        batch_size,
+        checkpoint,
+        done,
+    )
+    # Import completed
+    if checkpoint:
+        with connect(database) as conn:
+            conn.execute(
+                r"DELETE FROM clocking_checkpoint WHERE name = ?;", (checkpoint,)
+            )
+
+    return imported
+
+
+def _generate_days(configuration, rng, years, start_year):
+    """Generate realistic working days of user
+
+    :param configuration: UserConfiguration object
+    :param rng: Random object of user
+    :param years: number of years
+    :param start_year: first year
+    :return: Generator of tuples of working hours table values
+    """
+    locations = tuple(GENERATE_LOCATIONS)
+    weights = tuple(GENERATE_LOCATIONS.values())
+    daily_hours = configuration.daily_hours
+    for year in range(start_year, start_year + years):
+        # About four weeks of vacation for every year
+        vacation = set(rng.sample(range(1, 366), 20))
+        date = datetime(year, 1, 1)
+        while date.year == year:
+            working_day = date.strftime("%a") in configuration.working_days
+            hours, description = daily_hours, rng.choice(GENERATE_DESCRIPTIONS)
+            extraordinary = permit_hours = 0
+            holiday = disease = None
+            chance = rng.random()
+            if (date.day, date.month) in GENERATE_HOLIDAYS or (
+                working_day and date.timetuple().tm_yday in vacation
+            ):
+                hours, description, holiday = 0, configuration.holiday, True
+            elif not working_day:
+                # Few weekends with overtime
+                if chance >= 0.03:
+                    date += timedelta(days=1)
+                    continue
+                hours, extraordinary = 0, rng.choice((2, 4))
+            elif chance < 0.03:
+                hours, description = 0, configuration.disease
+                disease = configuration.disease
+            elif chance < 0.18:
+                extraordinary = rng.choice((0.5, 1, 1.5, 2))
+            elif chance < 0.23:
+                permit_hours = rng.choice((1, 2))
+                hours = daily_hours - permit_hours
+            yield (
+                int(date.strftime("%Y%m%d")),
+                date.year,
+                date.month,
+                date.day,
+                hours if hours else configuration.empty_value,
+                description,
+                rng.choices(locations, weights)[0],
+                extraordinary,
+                permit_hours,
+                0,
+                holiday,
+                disease,
+                build_flags(holiday, disease, extraordinary, permit_hours, 0),
+            )
+            date += timedelta(days=1)
+
+
+def generate_working_hours(
+    database,
+    users=1,
+    years=1,
+    seed=0,
+    start_year=GENERATE_START_YEAR,
+    prefix="user",
+    batch_size=IMPORT_BATCH_SIZE,
+):
+    """Generate synthetic working days of users for load tests
+
+    Days have holidays, vacations, diseases, overtime, permits and
+    locations; the same seed generates the same data. Users without
+    an active configuration get a default one.
+
+    :param database: database file path
+    :param users: number of users
+    :param years: number of years of every user
+    :param seed: seed of random data
+    :param start_year: first year of data
+    :param prefix: prefix of user names, followed by user number
+    :param batch_size: number of days written in one transaction
+    :return: dict of days by user
+    """
+    # Import only when load tests generate data
+    import random
+
+    create_configuration_table(database)
+    generated = {}
+    for number in range(users):
+        user = f"{prefix}{number}"
+        if not get_current_configuration(database, user):
+            add_configuration(
+                database,
+                active=True,
+                user=user,
+                location=tuple(GENERATE_LOCATIONS)[0],
+                empty_value="X",
+                daily_hours=8.0,
+                working_days="Mon Tue Wed Thu Fri",
+                extraordinary=0.5,
+                permit_hours=1.0,
+                disease="disease",
+                holiday="holiday",
+                currency="€",
+                hour_reward=10.0,
+                extraordinary_reward=12.0,
+                food_ticket=0,
+                other_hours=0,
+                other_reward=0,
+            )
+        # Same data of user for every number of users
+        rng = random.Random(f"{seed}:{user}")
+        days = _generate_days(
+            get_current_configuration(database, user), rng, years, start_year
+        )
+        generated[user] = _write_working_days(database, user, days, batch_size)
+
+    return generated
+
+
 def print_configurations(cursor):
     """Print in stdout the configuration table
 
@@ -942,6 +2311,7 @@ def print_working_table(
         print(working_table)
 
 
+@measured("export")
 def save_working_table(
     cursor, file, sort=False, csv=False, json=False, html=False, rewards=None
 ):
@@ -969,17 +2339,144 @@ def save_working_table(
     # Sort form date_id
     if sort:
         working_table.sortby = "date_id"
-    # Write stdout into file
-    with open(file, "wt") as fh:
-        # Check format to print
-        if csv:
-            fh.write(working_table.get_csv_string())
-        elif json:
-            fh.write(working_table.get_json_string())
-        elif html:
-            fh.write(working_table.get_html_string())
-        else:
-            fh.write(working_table.get_string())
+    # Check format to print
+    if csv:
+        content = working_table.get_csv_string()
+    elif json:
+        content = working_table.get_json_string()
+    elif html:
+        content = working_table.get_html_string()
+    else:
+        content = working_table.get_string()
+    # Devices and pipes are written directly
+    if os.path.exists(file) and not os.path.isfile(file):
+        with open(file, "wt") as fh:
+            fh.write(content)
+        return
+    # Write stdout into file: interrupted writes never replace it
+    temp = f"{file}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "wt") as fh:
+            fh.write(content)
+        os.replace(temp, file)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def _observed_exports(exports):
+    """Record exports of users of other processes on active metrics
+
+    :param exports: iterable of tuple of user, file path and seconds
+    :return: Generator of tuple of user, file path and seconds
+    """
+    for user, file, seconds in exports:
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.observe("export", seconds)
+        yield user, file, seconds
+
+
+def _open_export_session(database):
+    """Open read-only session of export process
+
+    :param database: database file path
+    :return: None
+    """
+    # Kept until the end of process: every job reuses its connection
+    Session(database, readonly=True).__enter__()
+
+
+def _export_user(
+    database, user, directory, year=None, month=None, fmt="txt", rewards=False
+):
+    """Export working hours table of user into its file
+
+    :param database: database file path
+    :param user: user in configuration table
+    :param directory: directory of exported files
+    :param year: year of the date
+    :param month: month of the date
+    :param fmt: format of file: txt, csv, json or html
+    :param rewards: add rewards column
+    :return: tuple of user, file path and seconds
+    """
+    start = time.perf_counter()
+    # Select data like print command
+    if month:
+        cursor = get_whole_month(database, user, year, month)
+    elif year:
+        cursor = get_whole_year(database, user, year)
+    else:
+        cursor = get_all_days(database, user)
+    file = os.path.join(directory, f"{user}.{fmt}")
+    save_working_table(
+        cursor,
+        file,
+        csv=fmt == "csv",
+        json=fmt == "json",
+        html=fmt == "html",
+        rewards=get_current_configuration(database, user) if rewards else None,
+    )
+    return user, file, time.perf_counter() - start
+
+
+def export_working_tables(
+    database,
+    directory,
+    users=None,
+    year=None,
+    month=None,
+    fmt="txt",
+    rewards=False,
+    workers=None,
+):
+    """Export working hours table of every user into its own file
+
+    Every user is a job of a pool of processes: query and rendering
+    run in parallel, on one read-only connection by process.
+
+    :param database: database file path
+    :param directory: directory of exported files
+    :param users: users in configuration table; None is users with active configuration
+    :param year: year of the date
+    :param month: month of the date
+    :param fmt: format of files: txt, csv, json or html
+    :param rewards: add rewards column
+    :param workers: number of processes; None is number of CPUs
+    :return: Generator of tuple of user, file path and seconds
+    :raise: ValueError
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"{fmt} is not one of {', '.join(EXPORT_FORMATS)}")
+    if users is None:
+        users = sorted({row[2] for row in get_configurations(database) if row[1]})
+    users = list(users)
+    os.makedirs(directory, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(users) or 1)
+    export = partial(
+        _export_user,
+        database,
+        directory=directory,
+        year=year,
+        month=month,
+        fmt=fmt,
+        rewards=rewards,
+    )
+    # Processes don't pay off for one user
+    if workers == 1:
+        # Exports are recorded by save_working_table
+        with Session(database, readonly=True):
+            yield from map(export, users)
+        return
+    # Import only when users are exported in parallel
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(
+        workers, initializer=_open_export_session, initargs=(database,)
+    ) as executor:
+        yield from _observed_exports(executor.map(export, users))
 
 
 # endregion
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# daemon -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""clocking module that contains Unix socket daemon"""
+
+# region imports
+import io
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+from contextlib import redirect_stderr, redirect_stdout
+from socketserver import StreamRequestHandler, UnixStreamServer
+
+from .client import DEFAULT_SOCKET
+from .log import setup_logging
+from .session import CACHED_STATEMENTS, Session
+
+# endregion
+
+# region globals
+__all__ = (
+    "ClockingDaemon",
+    "DaemonRequestHandler",
+    "daemon_running",
+    "stop_daemon",
+    "run_daemon",
+)
+CLIENT_TIMEOUT = 5.0
+LOCAL_COMMANDS = (
+    "serve",
+    "srv",
+    "daemon",
+    "dmn",
+    "batch",
+    "bat",
+    "import",
+    "imp",
+    "doctor",
+    "doc",
+    "shell",
+    "sh",
+)
+
+
+# endregion
+
+
+# region classes
+class ClockingDaemon(UnixStreamServer):
+    """Unix socket server that runs commands of a clocking database
+
+    Commands are run one at a time on the thread of serve_forever,
+    so writes are serialized on the warm connection of its session.
+
+    :param path: socket file path
+    :param database: database file path
+    :param client_timeout: seconds to wait command-line of a client
+    """
+
+    def __init__(self, path, database, client_timeout=CLIENT_TIMEOUT):
+        self.path = path
+        self.database = os.path.abspath(database)
+        self.client_timeout = client_timeout
+        super().__init__(path, DaemonRequestHandler)
+
+    def server_close(self):
+        """Close and remove socket file
+
+        :return: None
+        """
+        super().server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class DaemonRequestHandler(StreamRequestHandler):
+    """Run one command-line sent as JSON line and answer with its output"""
+
+    def setup(self):
+        """Set timeout of client connection
+
+        :return: None
+        """
+        # Stalled clients never block commands of other ones
+        self.timeout = self.server.client_timeout
+        super().setup()
+
+    def handle(self):
+        """Handle command request
+
+        :return: None
+        """
+        try:
+            line = self.rfile.readline()
+        except socket.timeout:
+            # Drop client without a whole command-line
+            return
+        # Connection to check if daemon is running
+        if not line:
+            return
+        request = json.loads(line)
+        if request.get("stop"):
+            response = {"status": 0, "stdout": "", "stderr": ""}
+            # Shutdown waits the end of serve_forever loop
+            threading.Thread(target=self.server.shutdown).start()
+        else:
+            response = self.run(request.get("argv", []), request.get("cwd"))
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+    def run(self, argv, cwd=None):
+        """Run command-line arguments like main function
+
+        :param argv: command-line arguments
+        :param cwd: working directory of client
+        :return: dict
+        """
+        from .cli import get_args, cli_select_command
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        status = 0
+        # Prompts read an empty stdin instead of daemon terminal
+        stdin, sys.stdin = sys.stdin, io.StringIO()
+        # Relative paths refer to working directory of client
+        workdir = os.getcwd()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                # Only before dispatch: fallback runs command locally
+                try:
+                    os.chdir(cwd or workdir)
+                    args = get_args(argv)
+                except OSError:
+                    # Client directory is missing
+                    return {"fallback": True}
+                cmd = cli_select_command(args.command)
+                # Other databases, long, profiled, measured and prompting commands
+                if (
+                    os.path.abspath(args.database) != self.server.database
+                    or args.command in LOCAL_COMMANDS
+                    or args.profile
+                    or args.profile_top
+                    or args.trace_sql
+                    or args.trace_slow is not None
+                    or args.metrics
+                    or args.timeout
+                    or args.progress
+                    or _asks_confirmation(cmd, args)
+                ):
+                    return {"fallback": True}
+                # Same path of session database
+                args.database = self.server.database
+                if cmd:
+                    setup_logging(args.verbose, args.log_format)
+                    # Started command never runs again on client
+                    try:
+                        cmd(**vars(args))
+                    except sqlite3.DatabaseError as err:
+                        print(f"error: an error has occurred on database. {err}")
+                    except EOFError:
+                        print("error: confirmation required, use --force")
+                        status = 1
+                    except Exception as err:
+                        print(f"error: {err}", file=sys.stderr)
+                        status = 1
+            except SystemExit as err:
+                status = err.code or 0
+            finally:
+                sys.stdin = stdin
+                os.chdir(workdir)
+        return {
+            "status": status,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+        }
+
+
+# endregion
+
+
+# region functions
+def _asks_confirmation(cmd, args):
+    """Check if command asks confirmation on terminal
+
+    :param cmd: command function
+    :param args: Namespace of command-line arguments
+    :return: bool
+    """
+    from .cli import configurate, deleting, setting
+
+    if getattr(args, "force", True):
+        return False
+    # Every delete action asks confirmation
+    if cmd is deleting:
+        return True
+    options = {
+        configurate: ("delete_db", "delete_id", "unify", "reset"),
+        setting: ("reset", "remove"),
+    }.get(cmd, ())
+    return any(getattr(args, option, None) for option in options)
+
+
+def daemon_running(path=DEFAULT_SOCKET):
+    """Check if a daemon is listening on socket
+
+    :param path: socket file path
+    :return: bool
+    """
+    if not os.path.exists(path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def stop_daemon(path=DEFAULT_SOCKET):
+    """Stop running daemon
+
+    :param path: socket file path
+    :return: bool
+    """
+    if not daemon_running(path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps({"stop": True}).encode() + b"\n")
+        sock.recv(1024)
+    return True
+
+
+def run_daemon(database, path=DEFAULT_SOCKET, cached_statements=CACHED_STATEMENTS):
+    """Run commands of database sent on socket until stopped
+
+    :param database: database file path
+    :param path: socket file path
+    :param cached_statements: number of prepared statements cached by connection
+    :return: None
+    :raise: FileExistsError
+    """
+    if daemon_running(path):
+        raise FileExistsError(f"a daemon is already listening on {path}")
+    # Remove stale socket file
+    if os.path.exists(path):
+        os.unlink(path)
+    database = os.path.abspath(database)
+    # Keep one warm connection for all commands
+    with Session(database, cached_statements=cached_statements):
+        with ClockingDaemon(path, database) as server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+
+# endregion
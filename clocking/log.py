@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# log -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""clocking module that contains logging of commands"""
+
+# region imports
+import sys
+
+# endregion
+
+# region globals
+__all__ = (
+    "LOG_FORMATS",
+    "ClockingLogger",
+    "logger",
+    "setup_logging",
+)
+LOG_FORMATS = ("text", "json")
+
+
+# endregion
+
+
+# region classes
+class ClockingLogger:
+    """Logger of clocking, without cost until logging module is imported
+
+    While nothing imports logging, records are discarded: default commands
+    never load it. Then, records go to the standard clocking logger.
+    """
+
+    name = "clocking"
+
+    def __getattr__(self, name):
+        logging = sys.modules.get("logging")
+        # Nothing can receive records without logging
+        if logging is None:
+            return self.discard
+        standard = logging.getLogger(self.name)
+        # Silent library until a command configures it
+        if not standard.handlers:
+            standard.addHandler(logging.NullHandler())
+            standard.setLevel(logging.WARNING)
+        return getattr(standard, name)
+
+    @staticmethod
+    def discard(*args, **kwargs):
+        """Discard record
+
+        :param args: positional arguments of logging method
+        :param kwargs: keyword arguments of logging method
+        :return: None
+        """
+
+
+logger = ClockingLogger()
+
+
+# endregion
+
+
+# region functions
+def setup_logging(verbose=False, fmt="text"):
+    """Configure clocking logger of a command
+
+    Without verbosity, debug records are discarded before formatting.
+
+    :param verbose: enable debug records
+    :param fmt: text or json lines
+    :return: Logger
+    :raise: ValueError
+    """
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"{fmt} is not one of {', '.join(LOG_FORMATS)}")
+    # Import only when a command configures logging
+    import logging
+
+    from .loghandler import ElapsedFilter, JSONFormatter, StderrHandler, TextFormatter
+
+    standard = logging.getLogger(logger.name)
+    handler = next(
+        (
+            handler
+            for handler in standard.handlers
+            if isinstance(handler, StderrHandler)
+        ),
+        None,
+    )
+    # Reuse handler of previous commands of shell and daemon
+    if handler is None:
+        handler = StderrHandler()
+        handler.addFilter(ElapsedFilter())
+        standard.addHandler(handler)
+    for elapsed in handler.filters:
+        elapsed.reset()
+    handler.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter())
+    standard.setLevel(logging.DEBUG if verbose else logging.WARNING)
+    return standard
+
+
+# endregion
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# loghandler -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""clocking module that contains filter, formats and handler of logging records"""
+
+# region imports
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+
+# endregion
+
+# region globals
+__all__ = ("ElapsedFilter", "TextFormatter", "JSONFormatter", "StderrHandler")
+# Attributes of every record: other ones are extra fields
+RECORD_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys()
+    | {"message", "asctime", "elapsed", "step"}
+)
+
+
+# endregion
+
+
+# region classes
+class ElapsedFilter(logging.Filter):
+    """Add seconds from start and from previous record
+
+    elapsed is time from start of command, step is time of last step.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.reset()
+
+    def reset(self):
+        """Restart elapsed time
+
+        :return: None
+        """
+        self.start = self.previous = time.perf_counter()
+
+    def filter(self, record):
+        now = time.perf_counter()
+        record.elapsed = now - self.start
+        record.step = now - self.previous
+        self.previous = now
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """Lower-case level before message, like debug: message"""
+
+    def format(self, record):
+        return f"{record.levelname.lower()}: {record.getMessage()}"
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object by line, with timing and extra fields"""
+
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+            "elapsed": round(getattr(record, "elapsed", 0.0), 6),
+            "step": round(getattr(record, "step", 0.0), 6),
+        }
+        data.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in RECORD_ATTRIBUTES
+        )
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class StderrHandler(logging.StreamHandler):
+    """Stream handler of current sys.stderr, also when redirected"""
+
+    def emit(self, record):
+        self.stream = sys.stderr
+        super().emit(record)
+
+
+# endregion
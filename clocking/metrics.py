@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# metrics -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""clocking module that contains opt-in metrics of operations"""
+
+# region imports
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# endregion
+
+# region globals
+__all__ = (
+    "METRICS_FORMATS",
+    "METRICS_INTERVAL",
+    "Histogram",
+    "Metrics",
+    "MeasuredCursor",
+    "measured",
+    "current_metrics",
+)
+METRICS_FORMATS = ("prometheus", "json")
+METRICS_INTERVAL = 60.0
+SECONDS_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+ROWS_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+METRICS = {
+    "seconds": ("clocking_operation_seconds", "Latency of clocking operations"),
+    "rows": ("clocking_operation_rows", "Rows of clocking operations"),
+}
+_SAMPLE = re.compile(
+    r'^(\w+)_(bucket|sum|count)\{operation="([^"]*)"(?:,le="([^"]*)")?\} (\S+)$'
+)
+_metrics = None
+
+
+# endregion
+
+
+# region classes
+class Histogram:
+    """Cumulative histogram of observed values
+
+    :param buckets: upper bounds of buckets
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        # Last count is +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Add value into its bucket
+
+        :param value: observed value
+        :return: None
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other, sign=1):
+        """Add counts of histogram with same buckets
+
+        :param other: Histogram object
+        :param sign: -1 subtracts counts
+        :return: None
+        """
+        for index, count in enumerate(other.counts):
+            self.counts[index] += sign * count
+        self.sum += sign * other.sum
+        self.count += sign * other.count
+
+    def cumulative(self):
+        """Cumulative counts by upper bound
+
+        :return: list of tuple of bound and count
+        """
+        bounds = [*(f"{bound:g}" for bound in self.buckets), "+Inf"]
+        total = 0
+        cumulative = []
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+class Metrics:
+    """Histograms of latency and rows of core operations
+
+    While active, measured operations of every thread are recorded;
+    histograms are flushed into file on exit and, for long-running
+    commands, every interval seconds. Counts of an existing file are
+    accumulated, so file of cron jobs grows like a counter; processes
+    merge their counts into file one at a time.
+
+    :param file: file path of metrics; None is never flushed
+    :param fmt: prometheus or json; None is json for .json files, otherwise prometheus
+    :param interval: seconds between flushes while active; None is only on exit
+    """
+
+    def __init__(self, file=None, fmt=None, interval=METRICS_INTERVAL):
+        if fmt is None:
+            fmt = "json" if str(file).endswith(".json") else "prometheus"
+        if fmt not in METRICS_FORMATS:
+            raise ValueError(f"{fmt} is not one of {', '.join(METRICS_FORMATS)}")
+        self.file = file
+        self.fmt = fmt
+        self.interval = interval
+        self.histograms = {}
+        self._flushed = time.monotonic()
+        self._written = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, metric, operation):
+        """Get histogram of metric and operation
+
+        :param metric: seconds or rows
+        :param operation: name of operation
+        :return: Histogram
+        """
+        key = (metric, operation)
+        if key not in self.histograms:
+            buckets = SECONDS_BUCKETS if metric == "seconds" else ROWS_BUCKETS
+            self.histograms[key] = Histogram(buckets)
+        return self.histograms[key]
+
+    def observe(self, operation, seconds, rows=None):
+        """Record an operation
+
+        :param operation: name of operation
+        :param seconds: latency of operation
+        :param rows: rows read or written by operation
+        :return: None
+        """
+        with self._lock:
+            self.histogram("seconds", operation).observe(seconds)
+            if rows is not None:
+                self.histogram("rows", operation).observe(rows)
+            flush = (
+                self.file
+                and self.interval is not None
+                and time.monotonic() - self._flushed >= self.interval
+            )
+        if flush:
+            self.flush()
+
+    def prometheus(self):
+        """Histograms in Prometheus text format
+
+        :return: str
+        """
+        lines = []
+        for metric, (name, description) in METRICS.items():
+            histograms = sorted(
+                (operation, histogram)
+                for (kind, operation), histogram in self.histograms.items()
+                if kind == metric
+            )
+            if not histograms:
+                continue
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for operation, histogram in histograms:
+                label = f'operation="{operation}"'
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f"{name}_sum{{{label}}} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{{{label}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def json(self):
+        """Histograms as JSON dictionary
+
+        :return: dict
+        """
+        data = {}
+        for (metric, operation), histogram in sorted(self.histograms.items()):
+            data.setdefault(operation, {})[metric] = {
+                "buckets": dict(histogram.cumulative()),
+                "sum": histogram.sum,
+                "count": histogram.count,
+            }
+        return data
+
+    def load(self, file):
+        """Read histograms of a metrics file
+
+        :param file: file path of metrics
+        :return: dict of Histogram by metric and operation
+        """
+        loaded = {}
+
+        def histogram(metric, operation):
+            # Same buckets of new histograms
+            key = (metric, operation)
+            if key not in loaded:
+                loaded[key] = Metrics(fmt=self.fmt).histogram(metric, operation)
+            return loaded[key]
+
+        def restore(target, buckets):
+            # Cumulative counts back to counts of every bucket
+            previous = 0
+            for index, (bound, count) in enumerate(buckets):
+                target.counts[index] = int(count) - previous
+                previous = int(count)
+
+        with open(file) as fh:
+            if self.fmt == "json":
+                for operation, metrics in json.load(fh).items():
+                    for metric, values in metrics.items():
+                        target = histogram(metric, operation)
+                        restore(target, values["buckets"].items())
+                        target.sum = values["sum"]
+                        target.count = values["count"]
+                return loaded
+            names = {name: metric for metric, (name, _) in METRICS.items()}
+            buckets = {}
+            for line in fh:
+                sample = _SAMPLE.match(line.strip())
+                if not sample or sample.group(1) not in names:
+                    continue
+                name, kind, operation, bound, value = sample.groups()
+                target = histogram(names[name], operation)
+                if kind == "bucket":
+                    buckets.setdefault(id(target), (target, []))[1].append(
+                        (bound, float(value))
+                    )
+                elif kind == "sum":
+                    target.sum = float(value)
+                else:
+                    target.count = int(float(value))
+            for target, counts in buckets.values():
+                restore(target, counts)
+        return loaded
+
+    def flush(self):
+        """Write histograms into file, atomically for collectors
+
+        Counts of file are read again under a lock of sidecar .lock file,
+        so counts of other processes are never overwritten.
+
+        :return: None
+        """
+        if not self.file:
+            return
+        # Import only when metrics are written
+        import tempfile
+
+        try:
+            import fcntl
+        except ImportError:
+            # No lock between processes on Windows
+            fcntl = None
+
+        with self._lock, open(f"{self.file}.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                current = self.load(self.file)
+            except (OSError, ValueError, KeyError):
+                current = {}
+            # File has counts of previous flushes: add only new ones
+            snapshot, written = Metrics(fmt=self.fmt), Metrics(fmt=self.fmt)
+            for key, histogram in (*current.items(), *self.histograms.items()):
+                snapshot.histogram(*key).merge(histogram)
+            for key, histogram in self._written.items():
+                snapshot.histogram(*key).merge(histogram, sign=-1)
+            for key, histogram in self.histograms.items():
+                written.histogram(*key).merge(histogram)
+            content = (
+                json.dumps(snapshot.json(), indent=4)
+                if self.fmt == "json"
+                else snapshot.prometheus()
+            )
+            directory = os.path.dirname(os.path.abspath(self.file))
+            fd, temp = tempfile.mkstemp(dir=directory, prefix=".clocking-metrics-")
+            try:
+                with os.fdopen(fd, "w") as fh:
+                    fh.write(content)
+                os.chmod(temp, 0o644)
+                # Collectors never read half-written files
+                os.replace(temp, self.file)
+            except OSError:
+                os.unlink(temp)
+                raise
+            self._written = written.histograms
+            self._flushed = time.monotonic()
+
+    def __enter__(self):
+        global _metrics
+        self._outer, _metrics = _metrics, self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _metrics
+        _metrics = self._outer
+        self.flush()
+
+
+class MeasuredCursor:
+    """Cursor that records operation when its rows are read
+
+    Latency is from execution of query to last row read; cursors
+    not read until last row are recorded when closed or released.
+
+    :param cursor: sqlite3 Cursor object
+    :param metrics: Metrics object
+    :param operation: name of operation
+    :param start: perf_counter of execution
+    """
+
+    def __init__(self, cursor, metrics, operation, start):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._operation = operation
+        self._start = start
+        self._end = time.perf_counter()
+        self._rows = 0
+        self._done = False
+
+    def _read(self, rows, last):
+        """Count rows and record operation after last row
+
+        :param rows: number of rows read
+        :param last: no more rows to read
+        :return: None
+        """
+        self._rows += rows
+        self._end = time.perf_counter()
+        if last:
+            self._record()
+
+    def _record(self):
+        """Record operation only once
+
+        :return: None
+        """
+        if not self._done:
+            self._done = True
+            self._metrics.observe(self._operation, self._end - self._start, self._rows)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._read(row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(self._cursor.arraysize if size is None else size)
+        self._read(len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._read(len(rows), True)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def close(self):
+        self._record()
+        self._cursor.close()
+
+    def __del__(self):
+        self._record()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+# endregion
+
+
+# region functions
+def current_metrics():
+    """Get active metrics
+
+    :return: Metrics
+    """
+    return _metrics
+
+
+def measured(operation, rows=None):
+    """Record latency and rows of function while metrics are active
+
+    Cursor results are recorded when their rows are read.
+
+    :param operation: name of operation
+    :param rows: function that gets rows from result; None is no rows
+    :return: decorator
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = _metrics
+            # Disabled: only one global lookup
+            if metrics is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            if rows is None and hasattr(result, "fetchone"):
+                return MeasuredCursor(result, metrics, operation, start)
+            metrics.observe(
+                operation,
+                time.perf_counter() - start,
+                rows(result) if rows else None,
+            )
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# endregion
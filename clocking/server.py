@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# server -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""clocking module that contains local HTTP JSON service"""
+
+# region imports
+import json
+import sqlite3
+from contextlib import nullcontext
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from . import __version__
+from .core import (
+    get_schema_version,
+    get_current_configuration,
+    get_working_hours,
+    get_whole_month,
+    get_whole_year,
+    get_all_days,
+    get_location_hours,
+    get_users_hours,
+    insert_working_hours,
+)
+from .session import CACHED_STATEMENTS, QueryProgress, Session, current_session
+from .util import check_working_day, datestring_to_datetime, datetime, sum_rewards
+
+# endregion
+
+# region globals
+__all__ = (
+    "DEFAULT_HOST",
+    "DEFAULT_PORT",
+    "ClockingServer",
+    "ClockingRequestHandler",
+    "serve",
+)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+FLAGS = ("holiday", "disease", "extraordinary", "permit_hours", "other_hours")
+
+
+# endregion
+
+
+# region classes
+class ClockingServer(HTTPServer):
+    """HTTP server of a clocking database
+
+    Requests are served one at a time on the thread of serve_forever,
+    so all of them run on the warm connection of its session.
+
+    :param server_address: tuple of host and port
+    :param database: database file path
+    :param request_timeout: seconds before queries of a request are interrupted
+    """
+
+    def __init__(self, server_address, database, request_timeout=None):
+        super().__init__(server_address, ClockingRequestHandler)
+        self.database = database
+        self.request_timeout = request_timeout
+        self._configurations = {}
+        self._data_version = None
+
+    def refresh(self):
+        """Clear configuration cache when another connection changed database
+
+        :return: None
+        """
+        session = current_session(self.database)
+        if session is None:
+            self._configurations.clear()
+            return
+        data_version = session.connection.execute("PRAGMA data_version;").fetchone()
+        if data_version != self._data_version:
+            self._configurations.clear()
+            self._data_version = data_version
+
+    def configuration(self, user):
+        """Get cached active configuration of user
+
+        :param user: user in configuration table
+        :return: UserConfiguration
+        """
+        if user not in self._configurations:
+            self._configurations[user] = get_current_configuration(self.database, user)
+        return self._configurations[user]
+
+
+class ClockingRequestHandler(BaseHTTPRequestHandler):
+    """JSON endpoints of clocking database
+
+    GET  /version                     clocking and schema version
+    GET  /hours                       worked hours grouped by user
+    GET  /users/USER/configuration    active configuration of user
+    GET  /users/USER/hours            working days of user
+    GET  /users/USER/locations        worked hours of user grouped by location
+    POST /users/USER/hours            insert working day of user
+    """
+
+    server_version = "clocking"
+
+    def log_message(self, format, *args):
+        """Suppress request log
+
+        :return: None
+        """
+
+    def send_json(self, data, status=HTTPStatus.OK):
+        """Send data as JSON response
+
+        :param data: serializable data
+        :param status: HTTP status
+        :return: None
+        """
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def dispatch(self, method):
+        """Route request to its endpoint
+
+        :param method: HTTP method
+        :return: None
+        """
+        url = urlsplit(self.path)
+        parts = tuple(unquote(part) for part in url.path.strip("/").split("/"))
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        routes = {
+            ("GET", 1, "version"): self.get_version,
+            ("GET", 1, "hours"): self.get_users,
+            ("GET", 3, "configuration"): self.get_configuration,
+            ("GET", 3, "hours"): self.get_hours,
+            ("GET", 3, "locations"): self.get_locations,
+            ("POST", 3, "hours"): self.post_hours,
+        }
+        endpoint = routes.get((method, len(parts), parts[-1]))
+        if endpoint is None or (len(parts) == 3 and parts[0] != "users"):
+            return self.send_json({"error": "not found"}, HTTPStatus.NOT_FOUND)
+        timeout = self.server.request_timeout
+        try:
+            # Deadline of every request
+            with QueryProgress(timeout) if timeout else nullcontext():
+                self.server.refresh()
+                # User endpoints need an active configuration
+                if len(parts) == 3 and not self.server.configuration(parts[1]):
+                    error = f"no active configuration found for user '{parts[1]}'"
+                    return self.send_json({"error": error}, HTTPStatus.NOT_FOUND)
+                endpoint(*parts[1:-1], **query)
+        except TimeoutError as err:
+            self.send_json({"error": str(err)}, HTTPStatus.GATEWAY_TIMEOUT)
+        except (ValueError, TypeError) as err:
+            self.send_json({"error": str(err)}, HTTPStatus.BAD_REQUEST)
+        except sqlite3.DatabaseError as err:
+            self.send_json({"error": str(err)}, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    def do_GET(self):
+        """Serve GET request
+
+        :return: None
+        """
+        self.dispatch("GET")
+
+    def do_POST(self):
+        """Serve POST request
+
+        :return: None
+        """
+        self.dispatch("POST")
+
+    def send_rows(self, cursor, rewards=None):
+        """Send rows of cursor as list of objects
+
+        :param cursor: sqlite3 Cursor object
+        :param rewards: UserConfiguration tuple
+        :return: None
+        """
+        rows = cursor.fetchall()
+        columns = [column[0] for column in cursor.description]
+        data = [dict(zip(columns, row)) for row in rows]
+        # Add rewards to every row
+        if rewards:
+            for item, reward in zip(data, sum_rewards(rows, rewards)):
+                item["rewards"] = reward
+        self.send_json(data)
+
+    def get_version(self):
+        """Send clocking and schema version
+
+        :return: None
+        """
+        self.send_json(
+            {
+                "version": __version__,
+                "schema_version": get_schema_version(self.server.database),
+            }
+        )
+
+    def get_users(self, year=None, month=None):
+        """Send worked hours grouped by user
+
+        :param year: year of the date
+        :param month: month of the date
+        :return: None
+        """
+        self.send_rows(
+            get_users_hours(
+                self.server.database,
+                year=int(year) if year else None,
+                month=int(month) if month else None,
+            )
+        )
+
+    def get_configuration(self, user):
+        """Send active configuration of user
+
+        :param user: user in configuration table
+        :return: None
+        """
+        self.send_json(self.server.configuration(user)._asdict())
+
+    def get_hours(self, user, date=None, day=None, month=None, year=None, **options):
+        """Send working days of user
+
+        :param user: user in configuration table
+        :param date: date of working day
+        :param day: day of the date
+        :param month: month of the date
+        :param year: year of the date
+        :param options: flags filters and rewards
+        :return: None
+        """
+        db = self.server.database
+        # Day is only a date with month and year
+        if day and not date:
+            _working_date(day=day, month=month, year=year)
+        flags = {flag: options.get(flag) in ("1", "true") for flag in FLAGS}
+        rewards = (
+            self.server.configuration(user)
+            if options.get("rewards") in ("1", "true")
+            else None
+        )
+        # Select data like print command
+        if date or day:
+            cursor = get_working_hours(
+                db, user, date=date, day=day, month=month, year=year, **flags
+            )
+        elif month:
+            cursor = get_whole_month(
+                db, user, year=int(year), month=int(month), **flags
+            )
+        elif year:
+            cursor = get_whole_year(db, user, year=int(year), **flags)
+        else:
+            cursor = get_all_days(db, user, **flags)
+        self.send_rows(cursor, rewards=rewards)
+
+    def get_locations(self, user, year=None, month=None):
+        """Send worked hours of user grouped by location
+
+        :param user: user in configuration table
+        :param year: year of the date
+        :param month: month of the date
+        :return: None
+        """
+        self.send_rows(
+            get_location_hours(
+                self.server.database,
+                user,
+                year=int(year) if year else None,
+                month=int(month) if month else None,
+            )
+        )
+
+    def post_hours(self, user):
+        """Insert working day of user from JSON body
+
+        Values follow configuration rules like set command; their
+        warnings are sent with the result.
+
+        :param user: user in configuration table
+        :return: None
+        :raise: ValueError
+        """
+        configuration = self.server.configuration(user)
+        length = int(self.headers.get("Content-Length", 0))
+        values = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(values, dict):
+            raise ValueError("body must be a JSON object")
+        date = _working_date(
+            values.get("date"),
+            values.get("day"),
+            values.get("month"),
+            values.get("year"),
+        )
+        # Apply configuration rules before insert
+        warnings = []
+        values.update(
+            check_working_day(
+                configuration,
+                date.strftime("%a"),
+                hours=values.get("hours"),
+                extraordinary=values.get("extraordinary") or 0,
+                permit_hours=values.get("permit_hours") or 0,
+                other_hours=values.get("other_hours") or 0,
+                disease=values.get("disease"),
+                description=values.get("description"),
+                empty_value=values.get("empty_value"),
+                warn=warnings.append,
+            )
+        )
+        # Default values of configuration
+        values.setdefault("location", configuration.location)
+        inserted = insert_working_hours(self.server.database, user, **values)
+        self.send_json({"inserted": inserted, "warnings": warnings}, HTTPStatus.CREATED)
+
+
+# endregion
+
+
+# region functions
+def _working_date(date=None, day=None, month=None, year=None):
+    """Date of working day of request, like set command
+
+    :param date: date in string format
+    :param day: day of the date
+    :param month: month of the date
+    :param year: year of the date
+    :return: datetime; today without values
+    :raise: ValueError
+    """
+    if date:
+        return datestring_to_datetime(str(date))
+    if day or month or year:
+        # Never today with a part of date
+        if not (day and month and year):
+            raise ValueError("day, month and year of date are all required")
+        return datetime(int(year), int(month), int(day))
+    return datetime.today()
+
+
+def serve(
+    database,
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    cached_statements=CACHED_STATEMENTS,
+    request_timeout=None,
+):
+    """Serve database as JSON endpoints until interrupted
+
+    :param database: database file path
+    :param host: listening address
+    :param port: listening port
+    :param cached_statements: number of prepared statements cached by connection
+    :param request_timeout: seconds before queries of a request are interrupted
+    :return: None
+    """
+    # Keep one warm connection for all requests
+    with Session(database, cached_statements=cached_statements):
+        with ClockingServer((host, port), database, request_timeout) as server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+
+# endregion
@@ -0,0 +1,960 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# session -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""clocking module that contains database session"""
+
+# region imports
+import heapq
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from urllib.parse import quote
+
+# endregion
+
+# region globals
+__all__ = (
+    "CACHED_STATEMENTS",
+    "Session",
+    "ConnectionPool",
+    "PooledSession",
+    "SQLTrace",
+    "QueryProgress",
+    "connect",
+    "open_connection",
+    "current_session",
+    "current_pool",
+    "current_trace",
+    "current_progress",
+)
+CACHED_STATEMENTS = 256
+PROGRESS_STEPS = 10000
+PROGRESS_DELAY = 0.5
+PROGRESS_INTERVAL = 0.1
+PROGRESS_SPINNER = "|/-\\"
+_current_session = ContextVar("clocking_session", default=None)
+_current_trace = ContextVar("clocking_trace", default=None)
+_current_progress = ContextVar("clocking_progress", default=None)
+_pools = {}
+
+
+# endregion
+
+
+# region classes
+class Session:
+    """Reusable connection to a clocking database
+
+    While a session is active, every core function called on its database
+    runs on the same connection and reuses its prepared statements.
+
+    :param database: database file path
+    :param cached_statements: number of prepared statements cached by connection
+    :param cache: cache lookups like active configurations until database changes
+    :param readonly: open a read-only connection
+    :param connect_options: other sqlite3.connect keyword arguments
+    """
+
+    def __init__(
+        self,
+        database,
+        cached_statements=CACHED_STATEMENTS,
+        cache=False,
+        readonly=False,
+        **connect_options,
+    ):
+        self.database = database
+        self.cached_statements = cached_statements
+        self.readonly = readonly
+        self.connect_options = connect_options
+        self.autocommit = True
+        self.cache = cache
+        self._lookups = {}
+        self._state = None
+        self._connection = None
+        self._tokens = []
+
+    @property
+    def connection(self):
+        """Open connection on first use
+
+        :return: Connection
+        """
+        if self._connection is None:
+            if self.readonly:
+                self._connection = open_connection(
+                    _readonly_uri(self.database),
+                    uri=True,
+                    cached_statements=self.cached_statements,
+                    **self.connect_options,
+                )
+            else:
+                self._connection = open_connection(
+                    self.database,
+                    cached_statements=self.cached_statements,
+                    **self.connect_options,
+                )
+        return self._connection
+
+    def close(self):
+        """Close session connection
+
+        :return: None
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @contextmanager
+    def transaction(self):
+        """Run core functions of block in one transaction
+
+        Core functions don't commit: the transaction is committed at the end
+        of the block, or by commit method, and rolled back on error.
+
+        :return: Session
+        """
+        autocommit, self.autocommit = self.autocommit, False
+        try:
+            with self.connection:
+                yield self
+        finally:
+            self.autocommit = autocommit
+
+    def cached(self, key, func, *args):
+        """Get result of lookup function, cached until database changes
+
+        Database changes are commits of other connections (data_version)
+        and writes of session connection (total_changes).
+
+        :param key: hashable key of lookup
+        :param func: lookup function
+        :param args: arguments of function
+        :return: result of function
+        """
+        if not self.cache:
+            return func(*args)
+        conn = self.connection
+        state = (
+            conn.execute("PRAGMA data_version;").fetchone()[0],
+            conn.total_changes,
+        )
+        if state != self._state:
+            self._lookups.clear()
+            self._state = state
+        if key not in self._lookups:
+            self._lookups[key] = func(*args)
+        return self._lookups[key]
+
+    def commit(self):
+        """Commit pending changes of session
+
+        :return: None
+        """
+        if self._connection is not None:
+            self._connection.commit()
+
+    def __enter__(self):
+        self._tokens.append(_current_session.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_session.reset(self._tokens.pop())
+        if not self._tokens:
+            self.close()
+
+
+class _Connections:
+    """Bounded set of reusable connections
+
+    :param factory: function that opens a new connection
+    :param size: maximum number of connections
+    """
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = size
+        self.idle = []
+        self.opened = 0
+        self.available = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Get an idle connection, open a new one or wait a released one
+
+        :param timeout: seconds to wait a released connection
+        :return: Connection
+        :raise: sqlite3.OperationalError
+        """
+        with self.available:
+            while not self.idle and self.opened >= self.size:
+                if not self.available.wait(timeout):
+                    raise sqlite3.OperationalError(
+                        f"no connection available in pool of {self.size}"
+                    )
+            if self.idle:
+                return self.idle.pop()
+            self.opened += 1
+        try:
+            return self.factory()
+        except sqlite3.Error:
+            self.discard()
+            raise
+
+    def release(self, conn):
+        """Give back connection to pool
+
+        :param conn: Connection
+        :return: None
+        """
+        with self.available:
+            self.idle.append(conn)
+            self.available.notify()
+
+    def discard(self, conn=None):
+        """Close broken connection and free its place
+
+        :param conn: Connection
+        :return: None
+        """
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        with self.available:
+            self.opened -= 1
+            self.available.notify()
+
+    def close(self):
+        """Close idle connections
+
+        :return: None
+        """
+        with self.available:
+            while self.idle:
+                self.idle.pop().close()
+                self.opened -= 1
+
+
+class ConnectionPool:
+    """Thread-safe pools of read and write connections to a clocking database
+
+    While a pool is open, every core function called on its database
+    borrows a connection from it: getters from read pool, the others
+    from write pool.
+
+    :param database: database file path
+    :param readers: maximum number of read connections
+    :param writers: maximum number of write connections
+    :param timeout: seconds to wait a locked database or a free connection
+    :param health_check: test connections before lending them
+    :param wal: enable WAL journal mode on database
+    :param cached_statements: number of prepared statements cached by connection
+    """
+
+    def __init__(
+        self,
+        database,
+        readers=4,
+        writers=1,
+        timeout=5.0,
+        health_check=True,
+        wal=True,
+        cached_statements=CACHED_STATEMENTS,
+    ):
+        self.database = database
+        self.timeout = timeout
+        self.health_check = health_check
+        self.wal = wal
+        self.cached_statements = cached_statements
+        self._readers = _Connections(self._open_reader, readers)
+        self._writers = _Connections(self._open_writer, writers)
+
+    def _open(self, database, **options):
+        """Open connection usable from every thread
+
+        :param database: database file path or URI
+        :param options: other sqlite3.connect keyword arguments
+        :return: Connection
+        """
+        return open_connection(
+            database,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            tracked=True,
+            **options,
+        )
+
+    def _open_reader(self):
+        """Open read-only connection
+
+        :return: Connection
+        """
+        return self._open(_readonly_uri(self.database), uri=True)
+
+    def _open_writer(self):
+        """Open write connection
+
+        :return: Connection
+        """
+        return self._open(self.database)
+
+    def acquire(self, readonly=False):
+        """Borrow a connection
+
+        :param readonly: borrow from read pool
+        :return: Connection
+        :raise: sqlite3.OperationalError
+        """
+        connections = self._readers if readonly else self._writers
+        conn = connections.acquire(self.timeout)
+        # Replace connection that fails health check
+        if self.health_check:
+            try:
+                conn.execute("SELECT 1;").fetchone()
+            except sqlite3.Error:
+                connections.discard(conn)
+                return self.acquire(readonly)
+        return conn
+
+    def release(self, conn, readonly=False):
+        """Give back borrowed connection, after rows of its cursors are read
+
+        :param conn: TracedConnection object
+        :param readonly: connection of read pool
+        :return: None
+        """
+        # Never lend a connection with rows to read
+        conn.after_rows(partial(self._give_back, conn, readonly))
+
+    def _give_back(self, conn, readonly):
+        """Give back connection to its pool
+
+        :param conn: Connection
+        :param readonly: connection of read pool
+        :return: None
+        """
+        connections = self._readers if readonly else self._writers
+        try:
+            # Never lend an open transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            connections.discard(conn)
+        else:
+            connections.release(conn)
+
+    @contextmanager
+    def connection(self, readonly=False):
+        """Borrow a connection for the block
+
+        :param readonly: borrow from read pool
+        :return: Connection
+        """
+        conn = self.acquire(readonly)
+        try:
+            yield conn
+        finally:
+            self.release(conn, readonly)
+
+    def session(self, readonly=False):
+        """Session on a borrowed connection
+
+        :param readonly: borrow from read pool
+        :return: PooledSession
+        """
+        return PooledSession(self, readonly)
+
+    def open(self):
+        """Use pool for core functions on its database
+
+        :return: ConnectionPool
+        """
+        # Readers don't block writer and vice versa
+        if self.wal:
+            with self.connection() as conn:
+                conn.execute("PRAGMA journal_mode=WAL;")
+        _pools[self.database] = self
+        return self
+
+    def close(self):
+        """Stop using pool and close its idle connections
+
+        :return: None
+        """
+        if _pools.get(self.database) is self:
+            del _pools[self.database]
+        self._readers.close()
+        self._writers.close()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class PooledSession(Session):
+    """Session on a connection borrowed from a pool
+
+    :param pool: ConnectionPool object
+    :param readonly: borrow from read pool
+    """
+
+    def __init__(self, pool, readonly=False):
+        super().__init__(pool.database, readonly=readonly)
+        self.pool = pool
+
+    @property
+    def connection(self):
+        """Borrow connection on first use
+
+        :return: Connection
+        """
+        if self._connection is None:
+            self._connection = self.pool.acquire(self.readonly)
+        return self._connection
+
+    def close(self):
+        """Give back borrowed connection
+
+        :return: None
+        """
+        if self._connection is not None:
+            self.pool.release(self._connection, self.readonly)
+            self._connection = None
+
+
+class SQLTrace:
+    """Statistics of SQL statements executed on connections opened while active
+
+    Statements are counted by trace callback of sqlite3, and timed
+    with their parameters by cursor wrappers.
+
+    :param slow: seconds over which a statement is logged
+    :param top: number of slowest statements kept
+    :param log: function that prints slow statements and report
+    """
+
+    def __init__(self, slow=None, top=5, log=None):
+        self.slow = slow
+        self.top = top
+        self.log = log if log else lambda message: print(message, file=sys.stderr)
+        self.statements = 0
+        self.elapsed = 0.0
+        self.connections = 0
+        self.slowest = []
+        self._lock = threading.Lock()
+        self._tokens = []
+
+    def attach(self, conn):
+        """Trace statements of connection
+
+        :param conn: TracedConnection object
+        :return: Connection
+        """
+        conn.trace = self
+        conn.set_trace_callback(self.statement)
+        with self._lock:
+            self.connections += 1
+        return conn
+
+    def statement(self, sql):
+        """Count executed statement
+
+        :param sql: statement with bound parameters
+        :return: None
+        """
+        with self._lock:
+            self.statements += 1
+
+    def timed(self, seconds, sql, parameters):
+        """Record time of statement
+
+        :param seconds: elapsed seconds
+        :param sql: statement
+        :param parameters: parameters of statement
+        :return: None
+        """
+        with self._lock:
+            self.elapsed += seconds
+            item = (seconds, " ".join(sql.split()), repr(parameters))
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+        if self.slow is not None and seconds >= self.slow:
+            self.log(
+                f"trace: slow statement {seconds * 1e3:.1f} ms: {item[1]} {item[2]}"
+            )
+
+    def report(self):
+        """Report of traced statements
+
+        :return: str
+        """
+        lines = [
+            f"trace: {self.statements} statements in {self.elapsed * 1e3:.1f} ms "
+            f"on {self.connections} connections"
+        ]
+        lines.extend(
+            f"trace: {seconds * 1e3:>8.1f} ms {sql} {parameters}"
+            for seconds, sql, parameters in sorted(self.slowest, reverse=True)
+        )
+        return "\n".join(lines)
+
+    def __enter__(self):
+        self._tokens.append(_current_trace.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_trace.reset(self._tokens.pop())
+
+
+class QueryProgress:
+    """Progress, timeout and cancellation of queries of core functions
+
+    While active, connections used by core functions call a progress
+    handler every steps SQLite instructions: it draws the indicator and
+    interrupts queries after timeout or when cancelled. Interrupted
+    queries are raised on exit as TimeoutError or KeyboardInterrupt.
+
+    :param timeout: seconds before queries are interrupted; None is no limit
+    :param show: draw progress indicator on stream after half a second
+    :param interrupt: cancel queries on SIGINT; only on main thread
+    :param steps: SQLite instructions between two calls of handler
+    :param stream: stream of indicator; None is sys.stderr
+    :param label: text before indicator
+    """
+
+    def __init__(
+        self,
+        timeout=None,
+        show=False,
+        interrupt=False,
+        steps=PROGRESS_STEPS,
+        stream=None,
+        label="working",
+    ):
+        self.timeout = timeout
+        self.show = show
+        self.interrupt = interrupt
+        self.steps = steps
+        self.stream = stream
+        self.label = label
+        self.rows = 0
+        self.cancelled = False
+        self.start = self.deadline = None
+        self._connections = set()
+        self._drawn = None
+        self._frame = 0
+        self._signal = None
+        self._tokens = []
+
+    @property
+    def expired(self):
+        """Timeout is expired
+
+        :return: bool
+        """
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def attach(self, conn):
+        """Call progress handler on queries of connection
+
+        :param conn: Connection
+        :return: Connection
+        """
+        if conn not in self._connections:
+            conn.set_progress_handler(self.progress, self.steps)
+            self._connections.add(conn)
+        return conn
+
+    def detach(self, conn):
+        """Stop progress handler on queries of connection
+
+        :param conn: Connection
+        :return: None
+        """
+        if conn in self._connections:
+            self._connections.discard(conn)
+            try:
+                conn.set_progress_handler(None, 0)
+            except sqlite3.ProgrammingError:
+                # Connection already closed
+                pass
+
+    def progress(self):
+        """Progress handler of sqlite3: not zero interrupts query
+
+        :return: int
+        """
+        if self.cancelled or self.expired:
+            return 1
+        if self.show:
+            self.draw()
+        return 0
+
+    def advance(self, rows):
+        """Count rows written or read
+
+        :param rows: number of rows
+        :return: None
+        """
+        self.rows += rows
+        if self.show:
+            self.draw()
+
+    def draw(self):
+        """Draw indicator, at most every tenth of second
+
+        :return: None
+        """
+        now = time.monotonic()
+        if now - self.start < PROGRESS_DELAY or (
+            self._drawn is not None and now - self._drawn < PROGRESS_INTERVAL
+        ):
+            return
+        self._drawn = now
+        self._frame += 1
+        stream = self.stream or sys.stderr
+        spinner = PROGRESS_SPINNER[self._frame % len(PROGRESS_SPINNER)]
+        rows = f" {self.rows} rows" if self.rows else ""
+        stream.write(f"\r{self.label} {spinner} {now - self.start:.1f}s{rows}")
+        stream.flush()
+
+    def cancel(self):
+        """Interrupt running and next queries
+
+        :return: None
+        """
+        self.cancelled = True
+
+    def _interrupted(self, signum, frame):
+        self.cancel()
+        raise KeyboardInterrupt
+
+    def __enter__(self):
+        self._tokens.append(_current_progress.set(self))
+        self.start = time.monotonic()
+        if self.timeout is not None:
+            self.deadline = self.start + self.timeout
+        if self.interrupt and threading.current_thread() is threading.main_thread():
+            self._signal = signal.signal(signal.SIGINT, self._interrupted)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_progress.reset(self._tokens.pop())
+        if self._signal is not None:
+            signal.signal(signal.SIGINT, self._signal)
+            self._signal = None
+        for conn in list(self._connections):
+            self.detach(conn)
+        # Clear indicator line
+        if self._drawn is not None:
+            stream = self.stream or sys.stderr
+            stream.write("\r\033[K")
+            stream.flush()
+        # Progress handler interrupts queries with OperationalError
+        if isinstance(exc_val, sqlite3.OperationalError) and "interrupted" in str(
+            exc_val
+        ):
+            if self.cancelled:
+                raise KeyboardInterrupt from exc_val
+            if self.expired:
+                raise TimeoutError(
+                    f"queries interrupted after timeout of {self.timeout} seconds"
+                ) from exc_val
+        return False
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor that times statements on trace of its connection
+
+    Time of a statement includes fetches of its rows: it is recorded
+    after last row, on next statement, or when cursor is closed or released.
+    """
+
+    _statement = None
+
+    def _record(self):
+        """Record time of current statement only once
+
+        :return: None
+        """
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            self.connection.read(self, statement)
+
+    def _timed(self, func, sql, parameters):
+        """Run and time statement
+
+        :param func: method of Cursor
+        :param sql: statement
+        :param parameters: parameters of statement
+        :return: Cursor
+        """
+        self._record()
+        start = time.perf_counter()
+        try:
+            return func(self, sql, parameters)
+        finally:
+            self._statement = [time.perf_counter() - start, sql, parameters]
+            # Statements without rows are complete
+            if self.description is None:
+                self._record()
+            else:
+                self.connection.reading(self)
+
+    def _fetched(self, func, *args):
+        """Run fetch and add its time to statement
+
+        :param func: method of Cursor
+        :param args: arguments of method
+        :return: result of method
+        """
+        start = time.perf_counter()
+        result = func(self, *args)
+        if self._statement is not None:
+            self._statement[0] += time.perf_counter() - start
+        return result
+
+    def execute(self, sql, parameters=()):
+        return self._timed(sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # Parameters are consumed by statement
+        seq_of_parameters = list(seq_of_parameters)
+        return self._timed(sqlite3.Cursor.executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        row = self._fetched(sqlite3.Cursor.fetchone)
+        if row is None:
+            self._record()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetched(
+            sqlite3.Cursor.fetchmany, self.arraysize if size is None else size
+        )
+        if not rows:
+            self._record()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetched(sqlite3.Cursor.fetchall)
+        self._record()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._fetched(sqlite3.Cursor.__next__)
+        except StopIteration:
+            self._record()
+            raise
+
+    def close(self):
+        self._record()
+        super().close()
+
+    def __del__(self):
+        self._record()
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection with cursors that time statements and track their rows
+
+    Pooled connections are given back, and query progress is detached,
+    after rows of their cursors are read.
+    """
+
+    trace = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = set()
+        self._after_rows = []
+        self._lock = threading.Lock()
+
+    def reading(self, cursor):
+        """Cursor has rows to read
+
+        :param cursor: TracedCursor object
+        :return: None
+        """
+        with self._lock:
+            self._cursors.add(id(cursor))
+
+    def read(self, cursor, statement):
+        """Rows of cursor are read: record statement on trace
+
+        :param cursor: TracedCursor object
+        :param statement: list of seconds, statement and parameters
+        :return: None
+        """
+        if self.trace is not None:
+            self.trace.timed(*statement)
+        with self._lock:
+            self._cursors.discard(id(cursor))
+            if self._cursors:
+                return
+            functions, self._after_rows = self._after_rows, []
+        for func in functions:
+            func()
+
+    def after_rows(self, func):
+        """Call function now, or when rows of every cursor are read
+
+        Functions are called in order of registration.
+
+        :param func: function without arguments
+        :return: None
+        """
+        with self._lock:
+            if self._cursors:
+                self._after_rows.append(func)
+                return
+        func()
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# endregion
+
+
+# region functions
+def open_connection(database, tracked=False, **options):
+    """Open connection, traced when a SQL trace is active
+
+    :param database: database file path or URI
+    :param tracked: track rows of cursors, see TracedConnection.after_rows
+    :param options: other sqlite3.connect keyword arguments
+    :return: Connection
+    """
+    trace = current_trace()
+    if trace is None and not tracked:
+        return sqlite3.connect(database, **options)
+    conn = sqlite3.connect(database, factory=TracedConnection, **options)
+    return conn if trace is None else trace.attach(conn)
+
+
+def current_progress():
+    """Get active query progress
+
+    :return: QueryProgress
+    """
+    return _current_progress.get()
+
+
+def current_trace():
+    """Get active SQL trace
+
+    :return: SQLTrace
+    """
+    return _current_trace.get()
+
+
+def _readonly_uri(database):
+    """Build URI of read-only database connection
+
+    :param database: database file path
+    :return: str
+    """
+    return f"file:{quote(os.path.abspath(database))}?mode=ro"
+
+
+def current_session(database=None):
+    """Get active session
+
+    :param database: database file path of session
+    :return: Session
+    """
+    session = _current_session.get()
+    if session is not None and database is not None and session.database != database:
+        return None
+    return session
+
+
+def current_pool(database):
+    """Get open pool of database
+
+    :param database: database file path
+    :return: ConnectionPool
+    """
+    return _pools.get(database)
+
+
+@contextmanager
+def connect(database, readonly=False):
+    """Connection to database: the active session, a pooled or a new connection
+
+    :param database: database file path
+    :param readonly: connection is used only to read
+    :return: Connection
+    """
+    session = current_session(database)
+    pool = current_pool(database)
+    progress = current_progress()
+    if session:
+        conn = session.connection
+    elif pool:
+        conn = pool.acquire(readonly)
+    else:
+        conn = open_connection(
+            database,
+            tracked=progress is not None,
+            cached_statements=CACHED_STATEMENTS,
+        )
+    # Bound and show progress of queries
+    if progress is not None:
+        progress.attach(conn)
+    try:
+        if session and not session.autocommit:
+            # Session transaction commits
+            yield conn
+        else:
+            # Commit on success, rollback on error
+            with conn:
+                yield conn
+    finally:
+        # Progress never keeps connections of finished functions
+        if not session and progress is not None:
+            conn.after_rows(partial(progress.detach, conn))
+        if not session and pool:
+            pool.release(conn, readonly)
+
+
+# endregion
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8 -*-
+# vim: se ts=4 et syn=python:
+
+# created by: matteo.guadrini
+# shell -- clocking
+#
+#     Copyright (C) 2024 Matteo Guadrini <matteo.guadrini@hotmail.it>
+#
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""clocking module that contains interactive shell"""
+
+# region imports
+import cmd
+import shlex
+import sqlite3
+
+from .core import get_configurations, get_all_days
+from .log import setup_logging
+from .session import current_session
+
+# endregion
+
+# region globals
+__all__ = ("ClockingShell",)
+COMMANDS = (
+    "config",
+    "set",
+    "delete",
+    "print",
+    "report",
+    "export",
+    "batch",
+    "import",
+)
+USER_OPTIONS = ("-u", "--user")
+DAY_OPTIONS = ("-d", "--day")
+MONTH_OPTIONS = ("-m", "--month")
+YEAR_OPTIONS = ("-y", "--year")
+DATE_OPTIONS = ("-D", "--date")
+
+
+# endregion
+
+
+# region classes
+class ClockingShell(cmd.Cmd):
+    """Interactive loop of clocking commands on one session
+
+    Every line is a command like command-line arguments; database,
+    user and verbosity are the ones of shell.
+
+    :param database: database file path
+    :param user: default user of commands
+    :param verbose: enable verbosity
+    :param stdin: input stream
+    :param stdout: output stream
+    """
+
+    intro = "clocking shell: type help or ? to list commands, exit to quit"
+
+    def __init__(self, database, user, verbose=False, stdin=None, stdout=None):
+        super().__init__(stdin=stdin, stdout=stdout)
+        self.database = database
+        self.user = user
+        self.verbose = verbose
+        self.use_rawinput = stdin is None
+        self.parsers = {}
+        self.prompt = f"clocking({user})> "
+
+    def users(self):
+        """Users of configuration table, cached by session
+
+        :return: list
+        """
+        return self.lookup(
+            "users",
+            lambda: sorted({row[2] for row in get_configurations(self.database)}),
+        )
+
+    def dates(self, user):
+        """Dates of user working hours, cached by session
+
+        :param user: user in configuration table
+        :return: list of day/month/year strings
+        """
+
+        def read():
+            try:
+                return [
+                    f"{day:02}/{month:02}/{year}"
+                    for _, year, month, day, *_ in get_all_days(self.database, user)
+                ]
+            except (sqlite3.DatabaseError, ValueError):
+                return []
+
+        return self.lookup(("dates", user), read)
+
+    def lookup(self, key, func):
+        """Cache lookup on session
+
+        :param key: hashable key of lookup
+        :param func: lookup function
+        :return: result of function
+        """
+        session = current_session(self.database)
+        return session.cached(key, func) if session else func()
+
+    def default(self, line):
+        """Run clocking command
+
+        :param line: command line
+        :return: None
+        """
+        from .cli import cli_select_command, get_command, get_parser
+        from .cli import serving, daemonizing, interactive
+
+        try:
+            argv = shlex.split(line, comments=True)
+        except ValueError as err:
+            print(f"error: {err}", file=self.stdout)
+            return
+        command = get_command(argv)
+        try:
+            # Build parser of every command only once
+            if command not in self.parsers:
+                self.parsers[command] = get_parser(
+                    command,
+                    database=self.database,
+                    user=self.user,
+                    verbose=self.verbose,
+                )
+            args = self.parsers[command].parse_args(argv)
+            function = cli_select_command(args.command)
+            if function in (serving, daemonizing, interactive):
+                print(f"error: {args.command} not allowed in shell", file=self.stdout)
+                return
+            setup_logging(args.verbose, args.log_format)
+            function(**vars(args))
+        except SystemExit:
+            # Errors are already printed
+            pass
+        except EOFError:
+            print("error: confirmation required, use --force", file=self.stdout)
+        except sqlite3.DatabaseError as err:
+            print(f"error: an error has occurred on database. {err}", file=self.stdout)
+        except ValueError as err:
+            # Also working day and configuration errors
+            print(f"error: {err}", file=self.stdout)
+
+    def emptyline(self):
+        """Do nothing on empty line"""
+
+    def do_help(self, arg):
+        """List commands or show help of a command: help [COMMAND]"""
+        if arg in COMMANDS:
+            return self.default(f"{arg} --help")
+        super().do_help(arg)
+
+    def do_user(self, arg):
+        """Change user of next commands: user NAME"""
+        if arg:
+            self.user = arg
+            self.parsers.clear()
+            self.prompt = f"clocking({arg})> "
+        print(self.user, file=self.stdout)
+
+    def do_exit(self, arg):
+        """Exit from shell"""
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg):
+        """Exit from shell on end of input"""
+        print(file=self.stdout)
+        return True
+
+    def completenames(self, text, *ignored):
+        """Complete command names
+
+        :param text: text to complete
+        :return: list
+        """
+        return [
+            name
+            for name in (*COMMANDS, "user", "exit", "quit", "help")
+            if name.startswith(text)
+        ]
+
+    def complete_user(self, text, line, begidx, endidx):
+        """Complete user names
+
+        :return: list
+        """
+        return [user for user in self.users() if user.startswith(text)]
+
+    def completedefault(self, text, line, begidx, endidx):
+        """Complete options, users and dates of clocking commands
+
+        :param text: text to complete
+        :param line: whole line
+        :param begidx: start index of text
+        :param endidx: end index of text
+        :return: list
+        """
+        from .cli import get_command, get_parser
+
+        words = line[:begidx].split()
+        previous = words[-1] if words else ""
+        user = self.user
+        for option, value in zip(words, words[1:]):
+            if option in USER_OPTIONS:
+                user = value
+        # Complete option values
+        if previous in USER_OPTIONS:
+            candidates = self.users()
+        elif previous in DATE_OPTIONS:
+            candidates = self.dates(user)
+        elif previous in YEAR_OPTIONS:
+            candidates = sorted({date[-4:] for date in self.dates(user)})
+        elif previous in MONTH_OPTIONS:
+            candidates = [str(month) for month in range(1, 13)]
+        elif previous in DAY_OPTIONS:
+            candidates = [str(day) for day in range(1, 32)]
+        # Complete options of command
+        elif text.startswith("-"):
+            command = get_command(words)
+            if command not in self.parsers:
+                self.parsers[command] = get_parser(
+                    command, database=self.database, user=self.user
+                )
+            subparsers = self.parsers[command]._subparsers._group_actions[0]
+            parser = subparsers.choices.get(command)
+            candidates = [
+                option
+                for action in (parser._actions if parser else ())
+                for option in action.option_strings
+            ]
+        else:
+            candidates = []
+        return [candidate for candidate in candidates if candidate.startswith(text)]
+
+
+# endregion
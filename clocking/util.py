@@ -23,12 +23,12 @@
 """clocking module that contains some utility"""
 
 # region imports
+import sys
 from collections import namedtuple
 from datetime import datetime
+from enum import IntFlag
 from sqlite3 import Cursor
 
-from prettytable import PrettyTable
-
 from .exception import UserConfigurationError
 
 # endregion
@@ -37,11 +37,19 @@ from .exception import UserConfigurationError
 __all__ = (
     "UserConfiguration",
     "DataTable",
+    "Finding",
+    "WorkingFlag",
     "datestring_to_datetime",
     "build_dateid",
     "split_dateid",
+    "build_flags",
+    "flags_condition",
+    "quote_identifier",
     "make_printable_table",
     "sum_rewards",
+    "check_default_hours",
+    "find_extraordinary_hours",
+    "check_working_day",
     "datetime",
 )
 UserConfiguration = namedtuple(
@@ -67,6 +75,17 @@ UserConfiguration = namedtuple(
     ],
 )
 DataTable = namedtuple("DataTable", ["data", "table"])
+Finding = namedtuple("Finding", ["severity", "check", "target", "message", "fix"])
+
+
+class WorkingFlag(IntFlag):
+    """Bitfield flags of a working day"""
+
+    HOLIDAY = 1
+    DISEASE = 2
+    EXTRAORDINARY = 4
+    PERMIT_HOURS = 8
+    OTHER_HOURS = 16
 
 
 # endregion
@@ -152,12 +171,104 @@ def split_dateid(date_id, fmt="%Y%m%d"):
     return date.tm_year, date.tm_mon, date.tm_mday
 
 
+def _flagged(value):
+    """Check if value of working day field sets its flag
+
+    Text of imports and requests is normalized like numbers: "0" isn't set.
+
+    :param value: value of field
+    :return: bool
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            return float(value.replace(",", ".")) != 0
+        except ValueError:
+            return bool(value)
+    return value is not None and value != 0
+
+
+def build_flags(
+    holiday=None, disease=None, extraordinary=0, permit_hours=0, other_hours=0
+):
+    """Build flags bitfield for database
+
+    :param holiday: holiday value
+    :param disease: disease value
+    :param extraordinary: extraordinary hours
+    :param permit_hours: permit hours
+    :param other_hours: other working hours
+    :return: int
+    """
+    flags = 0
+    # Set flag for every valued field
+    for flag, value in (
+        (WorkingFlag.HOLIDAY, holiday),
+        (WorkingFlag.DISEASE, disease),
+        (WorkingFlag.EXTRAORDINARY, extraordinary),
+        (WorkingFlag.PERMIT_HOURS, permit_hours),
+        (WorkingFlag.OTHER_HOURS, other_hours),
+    ):
+        if _flagged(value):
+            flags |= flag
+    return int(flags)
+
+
+def flags_condition(
+    holiday=False,
+    disease=False,
+    extraordinary=False,
+    permit_hours=False,
+    other_hours=False,
+):
+    """Build SQL condition to select only flagged working days
+
+    :param holiday: select only holiday values
+    :param disease: select only disease values
+    :param extraordinary: select only extraordinary values
+    :param permit_hours: select only permit hour values
+    :param other_hours: select only other hour values
+    :return: str
+    """
+    # Select first required flag
+    if holiday:
+        flag = WorkingFlag.HOLIDAY
+    elif disease:
+        flag = WorkingFlag.DISEASE
+    elif extraordinary:
+        flag = WorkingFlag.EXTRAORDINARY
+    elif permit_hours:
+        flag = WorkingFlag.PERMIT_HOURS
+    elif other_hours:
+        flag = WorkingFlag.OTHER_HOURS
+    else:
+        return ""
+    # Same expression of partial indexes
+    return f"flags & {flag.value}"
+
+
+def quote_identifier(name):
+    """Quote name as SQL identifier
+
+    :param name: table or index name
+    :return: str
+    :raise: ValueError
+    """
+    # Check identifier
+    if not isinstance(name, str) or not name or "\x00" in name:
+        raise ValueError(f"{name!r} is not a valid identifier")
+    return '"{0}"'.format(name.replace('"', '""'))
+
+
 def make_printable_table(cursor: Cursor):
     """Create a PrettyTable object from sqlite3 Cursor object
 
     :param cursor: sqlite3 Cursor object
     :return: DataTable
     """
+    # Import only when something is rendered
+    from prettytable import PrettyTable
+
     # Create table
     working_data = cursor.fetchall()
     working_table = PrettyTable([col[0] for col in cursor.description])
@@ -168,6 +279,23 @@ def make_printable_table(cursor: Cursor):
 def sum_rewards(data, configuration: UserConfiguration):
     """Sum working hours rewards
 
+    While metrics are active, it's recorded as rewards operation.
+
+    :param data: tuple of working hours
+    :param configuration: UserConfiguration object
+    :return: float
+    :raises: ValueError, UserConfigurationError
+    """
+    # Active metrics have already imported their module
+    metrics = sys.modules.get("clocking.metrics")
+    if metrics is None:
+        return _sum_rewards(data, configuration)
+    return metrics.measured("rewards", rows=len)(_sum_rewards)(data, configuration)
+
+
+def _sum_rewards(data, configuration):
+    """Sum working hours rewards, without metrics
+
     :param data: tuple of working hours
     :param configuration: UserConfiguration object
     :return: float
@@ -200,4 +328,127 @@ def sum_rewards(data, configuration: UserConfiguration):
     return rewards
 
 
+def check_default_hours(hours, default, t="", warn=print):
+    """Check if hours value is into defaults
+
+    :param hours: hour values
+    :param default: default hour values
+    :param t: type of hours
+    :param warn: function that prints warning messages
+    :return: float
+    """
+    if default:
+        if hours / default < 1.0:
+            hours = 0
+            warn(f"warning: {t} hours must be greater than default {default}")
+    return hours
+
+
+def find_extraordinary_hours(hours, default):
+    """Find extraordinary hours into worked hours
+
+    :param hours: hour values
+    :param default: default hour values
+    :return: float
+    """
+    extraordinary = 0
+    if hours > default:
+        extraordinary = hours - default
+    return extraordinary
+
+
+def check_working_day(
+    configuration: UserConfiguration,
+    weekday,
+    hours=None,
+    extraordinary=0,
+    permit_hours=0,
+    other_hours=0,
+    disease=None,
+    description=None,
+    empty_value=None,
+    warn=print,
+):
+    """Apply configuration rules to values of a working day
+
+    :param configuration: UserConfiguration object
+    :param weekday: abbreviated name of weekday, like Mon
+    :param hours: number of working hours
+    :param extraordinary: extraordinary hours
+    :param permit_hours: permit hours
+    :param other_hours: other working hours
+    :param disease: disease value
+    :param description: description of working day
+    :param empty_value: empty value if worked hours is 0
+    :param warn: function that prints warning messages
+    :return: dict of hours, description, extraordinary, permit_hours,
+        other_hours and empty_value
+    """
+    # Default configuration values
+    empty_value = empty_value if empty_value else configuration.empty_value
+    # Default: check hours value
+    if not hours:
+        hours = empty_value
+    # Default: check disease value
+    if disease:
+        hours = 0
+        description = configuration.disease
+    # Default: check extraordinary, permit and other values
+    extraordinary = (
+        check_default_hours(
+            extraordinary, configuration.extraordinary, "extraordinary", warn
+        )
+        if extraordinary
+        else 0
+    )
+    permit_hours = (
+        check_default_hours(permit_hours, configuration.permit_hours, "permit", warn)
+        if permit_hours
+        else 0
+    )
+    other_hours = (
+        check_default_hours(other_hours, configuration.other_hours, "other", warn)
+        if other_hours
+        else 0
+    )
+    if isinstance(hours, (int, float)) and isinstance(extraordinary, (int, float)):
+        # Check if day is in working days
+        if weekday not in configuration.working_days:
+            extraordinary = hours
+            hours = 0
+        # Check if worked hours is less than of default
+        elif hours < configuration.daily_hours and extraordinary:
+            warn(
+                "warning: no extraordinary because the hours worked are "
+                f"lower than the default({configuration.daily_hours})"
+            )
+            extraordinary = 0
+        # Check if worked hours is greater than of default
+        elif hours > configuration.daily_hours and permit_hours:
+            warn(
+                "warning: no permit because the hours worked are "
+                f"greater than the default({configuration.daily_hours})"
+            )
+            permit_hours = 0
+        # Check if permit and extraordinary are specified
+        elif permit_hours and extraordinary:
+            warn("warning: no permit and extraordinary hours in the same day")
+            permit_hours = 0
+            extraordinary = 0
+        # Check if hours value contains extraordinary hours
+        more_extraordinary = find_extraordinary_hours(hours, configuration.daily_hours)
+        hours = hours - more_extraordinary
+        if more_extraordinary:
+            extraordinary = extraordinary + more_extraordinary
+
+    return {
+        "hours": hours,
+        "description": description,
+        "extraordinary": extraordinary,
+        "permit_hours": permit_hours,
+        "other_hours": other_hours,
+        "empty_value": empty_value,
+    }
+
+
 # endregion
@@ -21,9 +21,18 @@
 #     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 """Unit testing module for core logic"""
+import asyncio
+import io
+import json
 import os
+import socket
+import sqlite3
+import threading
+import time
 from sqlite3 import Cursor
 from tempfile import gettempdir
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
 
 from pytest import raises
 
@@ -33,7 +42,12 @@ from clocking.core import (
     make_database,
     create_configuration_table,
     get_current_version,
+    get_schema_version,
+    migrate_database,
+    diagnose_database,
+    repair_database,
     update_version,
+    SCHEMA_VERSION,
     add_configuration,
     enable_configuration,
     reset_configuration,
@@ -52,15 +66,58 @@ from clocking.core import (
     get_whole_year,
     get_whole_month,
     get_all_days,
+    get_location_hours,
+    get_users_hours,
+    get_databases_hours,
+    unify_working_hours_tables,
+    import_working_hours,
+    generate_working_hours,
     print_working_table,
     print_configurations,
     save_working_table,
+    export_working_tables,
+)
+from clocking.exception import WorkingDayError, UserConfigurationError
+from clocking.aio import AsyncClocking, AsyncCursor
+from clocking.client import forward
+from clocking.daemon import ClockingDaemon, daemon_running, stop_daemon
+from clocking.server import ClockingServer
+from clocking.shell import ClockingShell
+from clocking.log import logger, setup_logging
+from clocking.metrics import Metrics, current_metrics
+from clocking.session import (
+    ConnectionPool,
+    QueryProgress,
+    Session,
+    SQLTrace,
+    connect,
+    current_pool,
+    current_progress,
+    current_session,
+    current_trace,
+)
+from clocking.util import (
+    build_flags,
+    flags_condition,
+    quote_identifier,
+    sum_rewards,
+    WorkingFlag,
 )
-from clocking.exception import WorkingDayError
 
 TEMP_DB = os.path.join(gettempdir(), "test_database.db")
 
 
+# --------------------------------------------------
+def test_lazy_names():
+    """Public names of package are the names of its sub-modules"""
+    from importlib import import_module
+
+    for submodule, names in clocking._SUBMODULES.items():
+        assert names == import_module(f"clocking.{submodule}").__all__
+    assert clocking.Session is import_module("clocking.session").Session
+    assert not hasattr(clocking, "missing_name")
+
+
 # --------------------------------------------------
 def test_create_database():
     """Check database creation"""
@@ -75,6 +132,92 @@ def test_update_version():
     assert get_current_version(TEMP_DB) == clocking.__version__
 
 
+# --------------------------------------------------
+def test_migrate_database():
+    """Apply schema migrations on a database created by older versions"""
+    assert get_schema_version(TEMP_DB) == SCHEMA_VERSION
+    assert migrate_database(TEMP_DB) == []
+    old_db = os.path.join(gettempdir(), "test_old_database.db")
+    with sqlite3.connect(old_db) as conn:
+        conn.execute(
+            "CREATE TABLE version (version_id TEXT PRIMARY KEY, name TEXT NOT NULL);"
+        )
+        conn.execute("INSERT INTO version VALUES ('0.1.2', 'clocking');")
+        conn.execute(
+            "CREATE TABLE 'old' (date_id INTEGER PRIMARY KEY, year INTEGER NOT NULL,"
+            "month INTEGER NOT NULL, day INTEGER NOT NULL, hours FLOAT NOT NULL,"
+            "description TEXT, location TEXT, extraordinary FLOAT, permit_hours FLOAT,"
+            "other_hours FLOAT, holiday TEXT, disease TEXT);"
+        )
+        conn.execute(
+            "INSERT INTO 'old' VALUES "
+            "(20240101, 2024, 1, 1, 0, 'Holiday', 'Office', 0, 0, 0, 1, NULL);"
+        )
+        # User with name of a lookup table
+        conn.execute("CREATE TABLE 'location' AS SELECT * FROM 'old';")
+    assert get_schema_version(old_db) == 0
+    assert update_version(old_db)
+    assert get_schema_version(old_db) == SCHEMA_VERSION
+    assert get_current_version(old_db) == clocking.__version__
+    assert migrate_database(old_db) == []
+    assert get_all_days(old_db, "old", holiday=True).fetchall() == [
+        (20240101, 2024, 1, 1, 0.0, "Holiday", "Office", 0.0, 0.0, 0.0, "1", None)
+    ]
+    assert insert_working_hours(old_db, "old", 8, location="Home", date="2024-01-02")
+    assert get_all_days(old_db, "location").fetchall() == [
+        (20240101, 2024, 1, 1, 0.0, "Holiday", "Office", 0.0, 0.0, 0.0, "1", None)
+    ]
+    delete_database(old_db)
+
+
+# --------------------------------------------------
+def test_diagnose_database(tmp_path):
+    """Check and repair a database created by older versions"""
+    old_db = str(tmp_path / "test_doctor_database.db")
+    with sqlite3.connect(old_db) as conn:
+        conn.execute(
+            "CREATE TABLE 'old' (date_id INTEGER PRIMARY KEY, year INTEGER NOT NULL,"
+            "month INTEGER NOT NULL, day INTEGER NOT NULL, hours FLOAT NOT NULL,"
+            "description TEXT, location TEXT, extraordinary FLOAT, permit_hours FLOAT,"
+            "other_hours FLOAT, holiday TEXT, disease TEXT);"
+        )
+        conn.execute(
+            "INSERT INTO 'old' VALUES "
+            "(20240101, 2024, 1, 1, '8,5', NULL, NULL, 'none', 0, 0, NULL, NULL);"
+        )
+    findings = {(finding.check, finding.fix) for finding in diagnose_database(old_db)}
+    assert ("schema", "migrate") in findings
+    assert ("index", "indexes") in findings
+    assert ("type", "types") in findings
+    assert ("type", None) in findings
+    assert ("pragma", "journal") in findings
+    assert repair_database(old_db, ["migrate", "types", "indexes", "journal"]) == [
+        "migrate",
+        "types",
+        "indexes",
+        "journal",
+    ]
+    findings = diagnose_database(old_db)
+    assert {finding.fix for finding in findings} == {None, "analyze"}
+    assert get_all_days(old_db, "old").fetchone()[4] == 8.5
+    with raises(ValueError):
+        repair_database(old_db, ["unknown"])
+
+
+# --------------------------------------------------
+def test_user_names(tmp_path):
+    """Names of users never clash with indexes and tables of other users"""
+    names_db = str(tmp_path / "test_names_database.db")
+    make_database(names_db)
+    assert insert_working_hours(names_db, "alice", 8, date="2024-02-05")
+    assert insert_working_hours(names_db, "alice_location", 7, date="2024-02-05")
+    assert insert_working_hours(names_db, "alice_holiday", 6, date="2024-02-05")
+    assert [row[4] for row in get_all_days(names_db, "alice_location")] == [7.0]
+    assert [row[4] for row in get_all_days(names_db, "alice_holiday")] == [6.0]
+    with raises(UserConfigurationError):
+        insert_working_hours(names_db, "clocking_alice", 8, date="2024-02-05")
+
+
 # --------------------------------------------------
 def test_database_exists():
     """Check if database exists"""
@@ -261,6 +404,626 @@ def test_get_values():
     assert isinstance(get_working_hours(TEMP_DB, user, date="2023.22.08"), Cursor)
 
 
+# --------------------------------------------------
+def test_working_flags():
+    """Flags bitfield and partial indexes"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    assert build_flags() == 0
+    assert build_flags(holiday="Oktoberfest") == WorkingFlag.HOLIDAY
+    assert build_flags(disease=True, extraordinary=2) == (
+        WorkingFlag.DISEASE | WorkingFlag.EXTRAORDINARY
+    )
+    assert build_flags(holiday=False, permit_hours=0.0, other_hours=None) == 0
+    assert build_flags(holiday="0", disease=" ", extraordinary="0,0") == 0
+    assert build_flags(disease="1", permit_hours="0.5") == (
+        WorkingFlag.DISEASE | WorkingFlag.PERMIT_HOURS
+    )
+    assert flags_condition() == ""
+    assert flags_condition(holiday=True) == "flags & 1"
+    with sqlite3.connect(TEMP_DB) as conn:
+        plan = conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM '{user}' "
+            f"WHERE {flags_condition(holiday=True)}"
+        ).fetchall()
+    assert f"clocking_holiday_{user}" in plan[0][-1]
+
+
+# --------------------------------------------------
+def test_location_hours():
+    """Get worked hours per location"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    assert insert_working_hours(
+        TEMP_DB, user, 8, day=1, month=3, year=2021, location="Home"
+    )
+    assert insert_working_hours(
+        TEMP_DB, user, 6, day=2, month=3, year=2021, location="Home"
+    )
+    assert insert_working_hours(
+        TEMP_DB, user, 7, day=1, month=4, year=2021, location="Lab"
+    )
+    assert get_location_hours(TEMP_DB, user, year=2021).fetchall() == [
+        ("Home", 2, 14.0, 0.0, 0.0, 0.0),
+        ("Lab", 1, 7.0, 0.0, 0.0, 0.0),
+    ]
+    assert get_location_hours(TEMP_DB, user, year=2021, month=4).fetchall() == [
+        ("Lab", 1, 7.0, 0.0, 0.0, 0.0),
+    ]
+    with sqlite3.connect(TEMP_DB) as conn:
+        assert conn.execute(
+            "SELECT COUNT(*) FROM clocking_location WHERE name = 'Home';"
+        ).fetchone() == (1,)
+    assert delete_whole_year(TEMP_DB, user, year=2021)
+
+
+# --------------------------------------------------
+def test_unified_table():
+    """Move user tables into unified working hours table"""
+    unified_db = os.path.join(gettempdir(), "test_unified.db")
+    make_database(unified_db)
+    assert insert_working_hours(unified_db, "alice", 8, day=1, month=2, year=2024)
+    assert insert_working_hours(unified_db, "bob", 6, day=1, month=2, year=2024)
+    assert get_users_hours(unified_db, year=2024).fetchall() == [
+        ("alice", 1, 8.0, 0.0, 0.0, 0.0),
+        ("bob", 1, 6.0, 0.0, 0.0, 0.0),
+    ]
+    assert unify_working_hours_tables(unified_db) == ["alice", "bob"]
+    assert insert_working_hours(
+        unified_db, "alice", 0, day=2, month=2, year=2024, holiday="Holiday"
+    )
+    assert get_users_hours(unified_db, year=2024, month=2).fetchall() == [
+        ("alice", 2, 8.0, 0.0, 0.0, 0.0),
+        ("bob", 1, 6.0, 0.0, 0.0, 0.0),
+    ]
+    assert [
+        row[0] for row in get_whole_month(unified_db, "alice", year=2024, month=2)
+    ] == [20240201, 20240202]
+    assert [row[0] for row in get_all_days(unified_db, "alice", holiday=True)] == [
+        20240202
+    ]
+    assert delete_working_hours(unified_db, "bob", day=1, month=2, year=2024)
+    assert get_all_days(unified_db, "bob").fetchall() == []
+    assert delete_user(unified_db, "alice")
+    delete_database(unified_db)
+
+
+# --------------------------------------------------
+def test_databases_hours():
+    """Merge worked hours of many databases"""
+    databases = [
+        os.path.join(gettempdir(), f"test_team_{team}.db") for team in ("a", "b")
+    ]
+    for database, hours in zip(databases, (8, 6)):
+        make_database(database)
+        assert insert_working_hours(database, "alice", hours, day=1, month=3, year=2024)
+        assert insert_working_hours(database, "bob", hours, day=2, month=3, year=2024)
+    assert unify_working_hours_tables(databases[1])
+    result = [("alice", 2, 14.0, 0.0, 0.0, 0.0), ("bob", 2, 14.0, 0.0, 0.0, 0.0)]
+    assert get_databases_hours(databases, 2024, 3, workers=2).fetchall() == result
+    assert get_databases_hours(databases, 2024, 3, workers=1).fetchall() == result
+    assert get_databases_hours(databases, 2023).fetchall() == []
+    # Missing databases aren't created
+    missing = os.path.join(gettempdir(), "test_team_missing.db")
+    with raises(sqlite3.DatabaseError):
+        get_databases_hours([*databases, missing], workers=2)
+    warnings = []
+    assert (
+        get_databases_hours([*databases, missing], warn=warnings.append).fetchall()
+        == result
+    )
+    assert len(warnings) == 1 and not os.path.exists(missing)
+    for database in databases:
+        delete_database(database)
+
+
+# --------------------------------------------------
+def test_generate_working_hours():
+    """Generate same synthetic working days from same seed"""
+    databases = [
+        os.path.join(gettempdir(), f"test_generate_{number}.db") for number in (1, 2)
+    ]
+    for database, users in zip(databases, (2, 3)):
+        make_database(database)
+        generated = generate_working_hours(database, users=users, years=2, seed=42)
+        assert list(generated) == [f"user{number}" for number in range(users)]
+    days = get_all_days(databases[0], "user1").fetchall()
+    assert len(days) == generated["user1"]
+    assert days == get_all_days(databases[1], "user1").fetchall()
+    assert {day[1] for day in days} == {2010, 2011}
+    # Holidays, diseases, overtime and permits
+    for column in (10, 11, 7, 8):
+        assert any(day[column] for day in days)
+    assert get_all_days(databases[0], "user1", holiday=True).fetchall()
+    assert get_current_configuration(databases[0], "user1")
+    for database in databases:
+        delete_database(database)
+
+
+# --------------------------------------------------
+def test_quoted_user():
+    """Users with quotes into name and reserved names"""
+    assert quote_identifier("test") == '"test"'
+    assert quote_identifier('we"ird') == '"we""ird"'
+    with raises(ValueError):
+        quote_identifier("")
+    for user in ("o'brien", 'we"ird'):
+        assert insert_working_hours(TEMP_DB, user, 8, day=1, month=2, year=2024)
+        assert get_working_hours(TEMP_DB, user, day=1, month=2, year=2024).fetchall()
+        assert delete_user(TEMP_DB, user)
+    with raises(UserConfigurationError):
+        insert_working_hours(TEMP_DB, "configuration", 8)
+
+
+# --------------------------------------------------
+def test_session():
+    """Share one connection between core functions"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    with Session(TEMP_DB, cached_statements=16) as session:
+        assert current_session(TEMP_DB) is session
+        assert current_session("other.db") is None
+        connection = session.connection
+        assert insert_working_hours(TEMP_DB, user, 8, day=1, month=2, year=2020)
+        assert insert_working_hours(TEMP_DB, user, 7, day=2, month=2, year=2020)
+        assert session.connection is connection
+        assert len(get_whole_month(TEMP_DB, user, year=2020, month=2).fetchall()) == 2
+    assert current_session() is None
+    assert delete_whole_year(TEMP_DB, user, year=2020)
+
+
+# --------------------------------------------------
+def test_server():
+    """Serve database as JSON endpoints"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    server = ClockingServer(("127.0.0.1", 0), TEMP_DB)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def serve():
+        with Session(TEMP_DB):
+            server.serve_forever()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    try:
+        # Insert working day
+        request = Request(
+            f"{url}/users/{user}/hours",
+            data=json.dumps({"hours": 8, "day": 3, "month": 2, "year": 2020}).encode(),
+            method="POST",
+        )
+        with urlopen(request) as response:
+            assert response.status == 201
+            assert json.load(response) == {"inserted": True, "warnings": []}
+        # Configuration rules of set command
+        request = Request(
+            f"{url}/users/{user}/hours",
+            data=json.dumps(
+                {"hours": 6, "extraordinary": 2, "day": 4, "month": 2, "year": 2020}
+            ).encode(),
+            method="POST",
+        )
+        with urlopen(request) as response:
+            assert json.load(response)["warnings"][0].startswith("warning: no extra")
+        # Day without month and year, or invalid values
+        for body in ({"hours": 8, "day": 5}, {"hours": 8, "date": "31/02/2020"}):
+            request = Request(
+                f"{url}/users/{user}/hours", data=json.dumps(body).encode(), method="POST"
+            )
+            with raises(HTTPError) as error:
+                urlopen(request)
+            assert error.value.code == 400
+        with raises(HTTPError) as error:
+            urlopen(f"{url}/users/{user}/hours?day=3")
+        assert error.value.code == 400
+        # Get working days
+        with urlopen(f"{url}/users/{user}/hours?year=2020&month=2") as response:
+            days = json.load(response)
+        assert len(days) == 2
+        assert days[0]["date_id"] == 20200203
+        assert days[0]["hours"] == 8
+        assert days[1]["extraordinary"] == 0
+        # Get cached configuration
+        with urlopen(f"{url}/users/{user}/configuration") as response:
+            assert json.load(response)["user"] == user
+        assert user in server._configurations
+        # Unknown endpoint
+        with raises(HTTPError):
+            urlopen(f"{url}/unknown")
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+    assert delete_whole_year(TEMP_DB, user, year=2020)
+
+
+# --------------------------------------------------
+def test_daemon():
+    """Forward commands to daemon on Unix socket"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    path = os.path.join(gettempdir(), "test_clocking.sock")
+    assert forward(["print", "-B", TEMP_DB], path) is None
+    daemon = ClockingDaemon(path, TEMP_DB, client_timeout=0.5)
+
+    def serve():
+        with Session(daemon.database):
+            daemon.serve_forever()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    try:
+        assert daemon_running(path)
+        # Insert and print working day
+        argv = ["-B", TEMP_DB, "-u", user, "-d", "4", "-m", "2", "-y", "2020"]
+        assert forward(["set", "--hours", "8", *argv], path)["status"] == 0
+        response = forward(["print", "--csv", *argv], path)
+        assert response["status"] == 0
+        assert "20200204" in response["stdout"]
+        # Stalled clients are dropped
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stalled:
+            stalled.connect(path)
+            stalled.sendall(b'{"argv": ["print"')
+            assert forward(["print", "--csv", *argv], path)["status"] == 0
+            assert stalled.recv(1024) == b""
+        # Errors are sent back
+        response = forward(["print", "-B", TEMP_DB, "-u", "unknown"], path)
+        assert response["status"] == 1
+        assert response["stdout"].startswith("error: no active configuration")
+        # Failed commands never run again on client
+        response = forward(["set", "-w", "7", "-D", "31/02/2024", *argv[:4]], path)
+        assert response["status"] == 1
+        assert response["stderr"].startswith("error:")
+        export = os.path.join(gettempdir(), "test_missing_dir", "days.csv")
+        response = forward(["print", "--csv", "-E", export, *argv], path)
+        assert response["status"] == 1
+        assert "test_missing_dir" in response["stderr"]
+        # Other databases and prompts run locally
+        assert forward(["print", "-B", "other.db"], path) is None
+        assert forward(["delete", "-y", "2020", "-B", TEMP_DB, "-u", user], path) is None
+    finally:
+        assert stop_daemon(path)
+        thread.join()
+        daemon.server_close()
+    assert not daemon_running(path)
+    assert delete_whole_year(TEMP_DB, user, year=2020)
+
+
+# --------------------------------------------------
+def test_async_core():
+    """Await core functions on reader and writer threads"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+
+    async def run():
+        async with AsyncClocking(TEMP_DB, readers=2) as database:
+            # Concurrent writes on writer thread
+            inserted = await asyncio.gather(
+                *(
+                    database.insert_working_hours(user, 8, day=day, month=2, year=2020)
+                    for day in range(1, 11)
+                )
+            )
+            assert all(inserted)
+            # Concurrent reads on reader threads
+            cursors = await asyncio.gather(
+                database.get_whole_month(user, 2020, 2),
+                database.get_whole_year(user, 2020),
+            )
+            assert all(isinstance(cursor, AsyncCursor) for cursor in cursors)
+            assert len(await cursors[0].fetchall()) == 10
+            # Async iteration
+            days = [row[0] async for row in cursors[1]]
+            assert days == [20200201 + day for day in range(10)]
+            assert (await database.get_current_configuration(user)).user == user
+            assert await database.delete_whole_year(user, 2020)
+
+    asyncio.run(run())
+    assert not get_whole_year(TEMP_DB, user, 2020).fetchall()
+
+
+# --------------------------------------------------
+def test_connection_pool():
+    """Reuse pooled connections from many threads"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    errors = []
+
+    def work(day):
+        try:
+            assert insert_working_hours(TEMP_DB, user, 8, day=day, month=2, year=2020)
+            assert get_working_hours(TEMP_DB, user, day=day, month=2, year=2020)
+        except Exception as err:
+            errors.append(err)
+
+    with ConnectionPool(TEMP_DB, readers=2, writers=1) as pool:
+        assert current_pool(TEMP_DB) is pool
+        threads = [threading.Thread(target=work, args=(day,)) for day in range(1, 21)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert pool._readers.opened <= 2 and pool._writers.opened == 1
+        assert len(get_whole_month(TEMP_DB, user, 2020, 2).fetchall()) == 20
+        # Read-only session
+        with pool.session(readonly=True):
+            with raises(sqlite3.OperationalError):
+                delete_whole_year(TEMP_DB, user, 2020)
+        # Broken connection is replaced
+        conn = pool.acquire()
+        conn.close()
+        pool.release(conn)
+        assert delete_whole_year(TEMP_DB, user, 2020)
+    assert current_pool(TEMP_DB) is None
+
+
+# --------------------------------------------------
+def test_connection_pool_cursor():
+    """Lend pooled connection again only after rows of its cursor"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    for day in range(1, 4):
+        assert insert_working_hours(TEMP_DB, user, 8, day=day, month=2, year=2020)
+    rows = []
+    with ConnectionPool(TEMP_DB, readers=1) as pool:
+        cursor = get_whole_year(TEMP_DB, user, 2020)
+        assert cursor.fetchone()
+        thread = threading.Thread(
+            target=lambda: rows.extend(get_whole_year(TEMP_DB, user, 2020))
+        )
+        thread.start()
+        # Second reader waits rows of first one
+        thread.join(0.2)
+        assert thread.is_alive()
+        assert len(cursor.fetchall()) == 2
+        thread.join()
+        assert len(rows) == 3
+        assert pool._readers.opened == 1
+    assert delete_whole_year(TEMP_DB, user, 2020)
+
+
+# --------------------------------------------------
+def test_session_transaction():
+    """Run core functions in one transaction"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    with Session(TEMP_DB) as session:
+        with raises(WorkingDayError):
+            with session.transaction():
+                assert insert_working_hours(TEMP_DB, user, 8, day=1, month=2, year=2020)
+                assert get_working_hours(TEMP_DB, user, day=1, month=2, year=2020)
+                raise WorkingDayError("rollback")
+        assert not get_whole_year(TEMP_DB, user, 2020).fetchall()
+        with session.transaction():
+            assert insert_working_hours(TEMP_DB, user, 8, day=1, month=2, year=2020)
+            session.commit()
+            assert insert_working_hours(TEMP_DB, user, 8, day=2, month=2, year=2020)
+        assert session.autocommit
+    assert len(get_whole_year(TEMP_DB, user, 2020).fetchall()) == 2
+    assert delete_whole_year(TEMP_DB, user, 2020)
+
+
+# --------------------------------------------------
+def test_sql_trace():
+    """Count and time statements of traced connections"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    slow = []
+    assert current_trace() is None
+    with SQLTrace(slow=0, top=2, log=slow.append) as trace:
+        assert current_trace() is trace
+        with Session(TEMP_DB):
+            for day in range(1, 4):
+                assert insert_working_hours(TEMP_DB, user, 8, day=day, month=3, year=2020)
+            assert len(get_whole_month(TEMP_DB, user, 2020, 3).fetchall()) == 3
+        assert delete_whole_year(TEMP_DB, user, 2020)
+    assert current_trace() is None
+    assert trace.connections == 2
+    assert trace.statements >= 8
+    assert len(trace.slowest) == 2 and len(slow) >= 8
+    assert any("2020" in line for line in slow)
+    assert "statements" in trace.report()
+    # Connections out of trace aren't traced
+    assert get_whole_year(TEMP_DB, user, 2020).fetchall() == []
+    assert trace.connections == 2
+    # Fetches of rows are timed with their statement
+    rows = (
+        "WITH RECURSIVE numbers(x) AS (SELECT 1 UNION ALL SELECT x + 1 "
+        "FROM numbers WHERE x < 200000) SELECT x FROM numbers;"
+    )
+    with SQLTrace(top=1, log=slow.append) as trace:
+        with connect(TEMP_DB) as conn:
+            cursor = conn.execute(rows)
+            executed = trace.elapsed
+            start = time.perf_counter()
+            assert len(cursor.fetchall()) == 200000
+            fetched = time.perf_counter() - start
+    assert executed == 0
+    assert trace.elapsed >= fetched / 2
+    assert trace.slowest[0][1] == rows
+
+
+# --------------------------------------------------
+def test_query_progress():
+    """Interrupt queries after timeout or when cancelled"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    count = (
+        "WITH RECURSIVE numbers(x) AS (SELECT 1 UNION ALL SELECT x + 1 "
+        "FROM numbers WHERE x < 100000000) SELECT count(*) FROM numbers;"
+    )
+    with raises(TimeoutError):
+        with QueryProgress(timeout=0.05) as progress:
+            assert current_progress() is progress
+            with connect(TEMP_DB) as conn:
+                conn.execute(count).fetchone()
+    assert current_progress() is None
+    with raises(KeyboardInterrupt):
+        with QueryProgress(steps=1) as progress:
+            progress.cancel()
+            get_whole_year(TEMP_DB, user, 2020).fetchall()
+    # Handler is removed from connections on exit
+    with Session(TEMP_DB):
+        with QueryProgress(steps=100) as progress:
+            assert get_whole_year(TEMP_DB, user, 2020).fetchall() == []
+        progress.cancel()
+        assert get_whole_year(TEMP_DB, user, 2020).fetchall() == []
+    # Connections of functions are detached after their rows
+    with QueryProgress() as progress:
+        cursor = get_whole_year(TEMP_DB, user, 2020)
+        assert len(progress._connections) == 1
+        assert cursor.fetchall() == []
+        assert not progress._connections
+    # Indicator of imported rows
+    stream = io.StringIO()
+    with QueryProgress(show=True, stream=stream, label="import") as progress:
+        progress.start -= 1
+        days = ['{"date": "01/03/2020", "hours": 8}', '{"date": "02/03/2020"}']
+        assert import_working_hours(TEMP_DB, user, days, fmt="ndjson") == 2
+    assert progress.rows == 2
+    assert stream.getvalue().startswith("\rimport ")
+    assert stream.getvalue().endswith("\r\033[K")
+    assert delete_whole_year(TEMP_DB, user, 2020)
+
+
+# --------------------------------------------------
+def test_metrics():
+    """Record latency and rows of operations into metrics files"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    configuration = get_current_configuration(TEMP_DB, "test")
+    prom_file = os.path.join(gettempdir(), "test_metrics.prom")
+    json_file = os.path.join(gettempdir(), "test_metrics.json")
+    for _ in range(2):
+        with Metrics(prom_file) as metrics:
+            assert current_metrics() is metrics
+            assert insert_working_hours(TEMP_DB, user, 8, day=1, month=3, year=2020)
+            days = get_whole_month(TEMP_DB, user, 2020, 3).fetchall()
+            assert len(days) == 1
+            assert get_whole_year(TEMP_DB, user, 2020).fetchone()
+            assert sum_rewards(days, configuration)
+        assert current_metrics() is None
+    assert metrics.histogram("rows", "get_month").sum == 1
+    assert metrics.histogram("seconds", "get_year").count == 1
+    with open(prom_file) as fh:
+        content = fh.read()
+    # Counts of previous run are accumulated
+    assert 'clocking_operation_seconds_count{operation="insert"} 2' in content
+    assert 'clocking_operation_rows_bucket{operation="get_month",le="1"} 2' in content
+    assert 'clocking_operation_rows_sum{operation="rewards"} 2.000000' in content
+    with Metrics(json_file):
+        assert delete_whole_year(TEMP_DB, user, 2020)
+        assert not get_whole_year(TEMP_DB, user, 2020).fetchall()
+    with open(json_file) as fh:
+        data = json.load(fh)
+    assert data["get_year"]["rows"]["buckets"]["+Inf"] == 1
+    assert data["get_year"]["rows"]["sum"] == 0
+    # Concurrent writers never overwrite counts of other ones
+    def record():
+        writer = Metrics(json_file)
+        for _ in range(10):
+            writer.observe("shared", 0.001)
+            writer.flush()
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(json_file) as fh:
+        assert json.load(fh)["shared"]["seconds"]["count"] == 40
+    with raises(ValueError):
+        Metrics(json_file, fmt="xml")
+    for file in (prom_file, json_file):
+        os.remove(file)
+        os.remove(f"{file}.lock")
+
+
+# --------------------------------------------------
+def test_logging(capsys):
+    """Log lazy messages as text or JSON lines with elapsed seconds"""
+    calls = []
+
+    class Lazy:
+        def __str__(self):
+            calls.append(True)
+            return "lazy"
+
+    setup_logging(verbose=False)
+    logger.debug("message %s", Lazy())
+    assert not calls and not capsys.readouterr().err
+    setup_logging(verbose=True)
+    logger.debug("message %s", Lazy())
+    assert calls and capsys.readouterr().err == "debug: message lazy\n"
+    setup_logging(verbose=True, fmt="json")
+    logger.debug("first")
+    logger.info("imported %d days", 3, extra={"rows": 3})
+    first, second = map(json.loads, capsys.readouterr().err.splitlines())
+    assert first["level"] == "debug" and first["message"] == "first"
+    assert second["message"] == "imported 3 days" and second["rows"] == 3
+    assert second["elapsed"] >= first["elapsed"] and second["step"] >= 0
+    with raises(ValueError):
+        setup_logging(fmt="xml")
+    setup_logging()
+
+
+# --------------------------------------------------
+def test_shell(capsys):
+    """Run commands on interactive shell with cached lookups"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    with Session(TEMP_DB, cache=True) as session:
+        shell = ClockingShell(TEMP_DB, user)
+        shell.onecmd("set --hours 8 --day 3 --month 2 --year 2020")
+        shell.onecmd("print --day 3 --month 2 --year 2020 --csv")
+        assert "20200203,2020,2,3,8.0" in capsys.readouterr().out
+        # Configuration is cached until database changes
+        assert ("configuration", user) in session._lookups
+        shell.onecmd("print --day 3 --month 2 --year 2020 --json")
+        assert ("configuration", user) in session._lookups
+        # Errors don't stop shell
+        shell.onecmd("print --user unknown")
+        assert "no active configuration" in capsys.readouterr().out
+        shell.onecmd("serve")
+        assert "not allowed" in capsys.readouterr().out
+        shell.onecmd("print -D foo")
+        assert capsys.readouterr().out.startswith("error: ")
+        # Completion from cached lookups
+        assert shell.completedefault("", "print -u ", 9, 9) == [user]
+        assert "2020" in shell.completedefault("20", "print -y ", 9, 9)
+        assert "03/02/2020" in shell.completedefault("0", "print -D 0", 9, 10)
+        assert "--csv" in shell.completedefault("--c", "print --c", 6, 9)
+        assert shell.onecmd("exit")
+    assert delete_whole_year(TEMP_DB, user, 2020)
+
+
+# --------------------------------------------------
+def test_import_working_hours():
+    """Import working days by batches and resume from checkpoint"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    days = [f"{day:02}/01/2019,8,import" for day in range(1, 11)]
+    # Invalid row stops import after committed batches
+    csv_data = "date,hours,description\n" + "\n".join(days[:7] + ["wrong,8,"])
+    with raises(WorkingDayError):
+        import_working_hours(
+            TEMP_DB, user, io.StringIO(csv_data), batch_size=3, checkpoint="test"
+        )
+    assert len(get_whole_month(TEMP_DB, user, 2019, 1).fetchall()) == 6
+    # Resume after last checkpoint
+    csv_data = "date,hours,description\n" + "\n".join(days)
+    assert (
+        import_working_hours(
+            TEMP_DB, user, io.StringIO(csv_data), batch_size=3, checkpoint="test"
+        )
+        == 4
+    )
+    rows = get_whole_month(TEMP_DB, user, 2019, 1).fetchall()
+    assert len(rows) == 10
+    # Same rules of set command: saturday hours are extraordinary
+    assert rows[4][4:8] == ("X", "import", "Italy Office", 8.0)
+    ndjson_data = (
+        '{"date_id": 20190201, "hours": 9}\n'
+        '{"year": 2019, "month": 2, "day": 4, "hours": 8, "disease": "flu"}\n'
+    )
+    assert import_working_hours(TEMP_DB, user, io.StringIO(ndjson_data), "ndjson") == 2
+    row = get_working_hours(TEMP_DB, user, day=1, month=2, year=2019).fetchone()
+    assert row[4:8] == (8.0, None, "Italy Office", 1.0)
+    with raises(ValueError):
+        import_working_hours(TEMP_DB, user, io.StringIO(csv_data), "xml")
+    with raises(UserConfigurationError):
+        import_working_hours(TEMP_DB, "unknown", io.StringIO(csv_data))
+    assert delete_whole_year(TEMP_DB, user, 2019)
+
+
 # --------------------------------------------------
 def test_print_table(capsys):
     """Print tables"""
@@ -931,6 +1694,29 @@ def test_save_rewards():
         )
 
 
+# --------------------------------------------------
+def test_export_working_tables():
+    """Export table of every user into its own file"""
+    user = get_current_configuration(TEMP_DB, "test")[2]
+    directory = os.path.join(gettempdir(), "test_export")
+    for workers in (1, 2):
+        jobs = list(
+            export_working_tables(
+                TEMP_DB, directory, year=2023, month=9, fmt="csv", workers=workers
+            )
+        )
+        assert [job[:2] for job in jobs] == [
+            (user, os.path.join(directory, f"{user}.csv"))
+        ]
+        assert jobs[0][2] >= 0
+    with open(os.path.join(directory, f"{user}.csv")) as fh:
+        assert fh.readline().startswith("date_id,year,month,day,hours")
+        assert "20230916" in fh.read()
+    assert list(export_working_tables(TEMP_DB, directory, users=[])) == []
+    with raises(ValueError):
+        list(export_working_tables(TEMP_DB, directory, fmt="pdf"))
+
+
 # --------------------------------------------------
 def test_remove_daily_value():
     """Remove value on a user table value"""
@@ -22,6 +22,7 @@
 
 """Unit testing module for arguments parser"""
 
+import json
 import os
 from subprocess import getstatusoutput
 from tempfile import gettempdir
@@ -37,6 +38,24 @@ def test_exists():
     assert os.path.isfile(prg)
 
 
+# --------------------------------------------------
+def test_lazy_import():
+    """missing names don't import sub-modules"""
+
+    rv, out = getstatusoutput(
+        "python3 -c \"import sys, clocking; hasattr(clocking, 'missing'); "
+        "print(sorted(name for name in sys.modules if name.startswith('clocking.')))\""
+    )
+    assert rv == 0
+    assert out == "[]"
+
+    rv, out = getstatusoutput(
+        "python3 -c \"import sys, clocking.util; print('clocking.metrics' in sys.modules)\""
+    )
+    assert rv == 0
+    assert out == "False"
+
+
 # --------------------------------------------------
 def test_usage():
     """usage"""
@@ -232,6 +251,38 @@ def test_set_working_day():
     assert out == ""
 
 
+# --------------------------------------------------
+def test_set_startup():
+    """set imports only modules of its command"""
+
+    rv, out = getstatusoutput(
+        "python3 -c \"import sys, clocking.cli; "
+        "print(sorted(name for name in sys.modules if name.startswith('clocking.')))\""
+    )
+    assert rv == 0
+    assert out == "['clocking.cli', 'clocking.log']"
+
+    unused = (
+        "clocking.aio",
+        "clocking.daemon",
+        "clocking.server",
+        "clocking.shell",
+        "csv",
+        "glob",
+        "logging",
+        "prettytable",
+        "random",
+    )
+    rv, out = getstatusoutput(
+        "python3 -c \"import sys, clocking.cli; "
+        f"sys.argv = ['clocking', 'set', '-B', '{TEMP_DB}', '-u', 'test', '-w', '8']; "
+        "clocking.cli.main(); "
+        f"print(sorted(set(sys.modules) & set({unused})))\""
+    )
+    assert rv == 0
+    assert out == "[]"
+
+
 # --------------------------------------------------
 def test_set_disease():
     """set disease"""
@@ -1002,6 +1053,272 @@ def test_print_export():
     assert os.path.exists(tmp_file) is True
 
 
+# --------------------------------------------------
+def test_report():
+    """print worked hours of users and databases"""
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} report --database {TEMP_DB} --year 2023 --month 8 --csv"
+    )
+    assert rv == 0
+    assert out.startswith("user,days,hours")
+    assert "test," in out
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} rpt -B {TEMP_DB} -a '{gettempdir()}/test_database*.db' -w 2 -j"
+    )
+    assert rv == 0
+    assert '"user": "test"' in out
+
+    rv, out = getstatusoutput(f"python3 {prg} rpt -a '{gettempdir()}/no_db/*.db'")
+    assert rv == 8
+    assert "no database matches" in out
+
+
+# --------------------------------------------------
+def test_export():
+    """export working days of users, one file per user"""
+
+    directory = os.path.join(gettempdir(), "test_export_users")
+    rv, out = getstatusoutput(
+        f"python3 {prg} export --database {TEMP_DB} --all-users "
+        f"--output-dir {directory} --year 2023 --format json"
+    )
+    assert rv == 0
+    assert f"test: {os.path.join(directory, 'test.json')} exported in" in out
+    assert os.path.exists(os.path.join(directory, "test.json"))
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} exp -B {TEMP_DB} -u unknown -o {directory}"
+    )
+    assert rv == 1
+    assert "no active configuration" in out
+
+
+# --------------------------------------------------
+def test_generate():
+    """generate synthetic working days"""
+
+    generate_db = os.path.join(gettempdir(), "test_generate.db")
+    rv, out = getstatusoutput(
+        f"python3 {prg} generate --database {generate_db} --users 2 --years 1 "
+        f"--seed 3 --start-year 2020"
+    )
+    assert rv == 0
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} report --database {generate_db} --year 2020 --csv"
+    )
+    assert rv == 0
+    assert out.count("user") == 3
+    os.remove(generate_db)
+
+
+# --------------------------------------------------
+def test_profile():
+    """profile command"""
+
+    profile_file = os.path.join(gettempdir(), "test_profile.prof")
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2023 --csv "
+        f"--profile {profile_file} --profile-top 5 2> /dev/null"
+    )
+    assert rv == 0
+    assert out.startswith("date_id,")
+    assert os.path.exists(profile_file)
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2023 "
+        f"--profile-top 5"
+    )
+    assert rv == 0
+    assert "Ordered by: cumulative time" in out
+    assert "(printing)" in out
+    os.remove(profile_file)
+
+
+# --------------------------------------------------
+def test_trace_sql():
+    """trace SQL statements of command"""
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2023 --csv "
+        f"--trace-sql --trace-top 3 2> /dev/null"
+    )
+    assert rv == 0
+    assert "trace:" not in out
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2023 "
+        f"--trace-slow 0 > /dev/null"
+    )
+    assert rv == 0
+    assert "trace: slow statement" in out
+    assert "statements in" in out
+    assert "connections" in out
+
+
+# --------------------------------------------------
+def test_metrics():
+    """record metrics of command"""
+
+    metrics_file = os.path.join(gettempdir(), "test_metrics_cli.prom")
+    for _ in range(2):
+        rv, out = getstatusoutput(
+            f"python3 {prg} print --database {TEMP_DB} --user test --year 2023 "
+            f"--metrics {metrics_file}"
+        )
+        assert rv == 0
+    with open(metrics_file) as fh:
+        content = fh.read()
+    assert "# TYPE clocking_operation_seconds histogram" in content
+    assert 'clocking_operation_seconds_count{operation="get_year"} 2' in content
+
+    # Export of print command
+    export_file = os.path.join(gettempdir(), "test_metrics_cli.csv")
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2023 --csv "
+        f"--export {export_file} --metrics {metrics_file}"
+    )
+    assert rv == 0
+    with open(metrics_file) as fh:
+        content = fh.read()
+    assert 'clocking_operation_seconds_count{operation="export"} 1' in content
+    os.remove(metrics_file)
+    os.remove(f"{metrics_file}.lock")
+    os.remove(export_file)
+
+
+# --------------------------------------------------
+def test_log_format():
+    """verbose messages as JSON lines"""
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2023 --csv "
+        f"--verbose --log-format json 2>&1 > /dev/null"
+    )
+    assert rv == 0
+    lines = [json.loads(line) for line in out.splitlines()]
+    assert lines and all(line["level"] == "debug" for line in lines)
+    assert all("elapsed" in line and "step" in line for line in lines)
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2023 --csv "
+        f"2>&1 > /dev/null"
+    )
+    assert rv == 0
+    assert out == ""
+
+
+# --------------------------------------------------
+def test_timeout():
+    """bound queries of command"""
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2023 --csv "
+        f"--timeout 60 --progress 2> /dev/null"
+    )
+    assert rv == 0
+    assert "date_id" in out
+
+
+# --------------------------------------------------
+def test_doctor():
+    """check and repair database"""
+
+    rv, out = getstatusoutput(f"python3 {prg} doctor --database {TEMP_DB} --fix")
+    assert rv == 0
+    assert "error:" not in out
+    assert "warning:" not in out
+
+    rv, out = getstatusoutput(f"python3 {prg} doc -B {TEMP_DB} --json")
+    assert rv == 0
+    assert all(json.loads(line)["severity"] == "info" for line in out.splitlines())
+
+    rv, out = getstatusoutput(f"python3 {prg} doctor -a '/tmp/test_none_*.db'")
+    assert rv == 8
+    assert "no database matches" in out
+
+
+# --------------------------------------------------
+def test_batch():
+    """run commands of file in one transaction"""
+
+    batch_file = os.path.join(gettempdir(), "test_batch.txt")
+    with open(batch_file, "w") as fh:
+        fh.write("# corrections\n")
+        for day in range(1, 11):
+            fh.write(f"set --hours 8 --day {day} --month 3 --year 2021\n")
+        fh.write("\nprint --year 2021 --month 3 --csv\n")
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} batch --database {TEMP_DB} --user test {batch_file}"
+    )
+    assert rv == 0
+    assert out.count("2021,3,") == 10
+
+    # Failed command rolls back whole batch
+    rv, out = getstatusoutput(
+        f"printf 'set --hours 4 --day 1 --month 4 --year 2021\nset --wrong\n' | "
+        f"python3 {prg} batch --database {TEMP_DB} --user test"
+    )
+    assert rv == 2
+    assert "error: line 2" in out
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2021 --month 4 --csv"
+    )
+    assert rv == 0
+    assert "2021,4," not in out
+
+    # Commands that prompt need force option
+    rv, out = getstatusoutput(
+        f"echo 'delete --year 2021' | python3 {prg} batch -B {TEMP_DB} -u test -n 1"
+    )
+    assert rv == 6
+    assert "confirmation required" in out
+
+    # Invalid values stop batch with their line
+    rv, out = getstatusoutput(
+        f"printf 'set -w 8 -D 01/04/2021\nset -w 8 -D 31/02/2024\n' | "
+        f"python3 {prg} batch -B {TEMP_DB} -u test"
+    )
+    assert rv == 6
+    assert "error: line 2: 31/02/2024 is not a valid date format" in out
+    assert "Traceback" not in out
+
+
+# --------------------------------------------------
+def test_import():
+    """import working days from file"""
+
+    import_file = os.path.join(gettempdir(), "test_import.ndjson")
+    with open(import_file, "w") as fh:
+        for day in range(1, 6):
+            fh.write(f'{{"date": "{day:02}/05/2021", "hours": 8}}\n')
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} import --database {TEMP_DB} --user test -n 2 {import_file}"
+    )
+    assert rv == 0
+
+    rv, out = getstatusoutput(
+        f"python3 {prg} print --database {TEMP_DB} --user test --year 2021 --month 5 --csv"
+    )
+    assert rv == 0
+    assert out.count("2021,5,") == 5
+
+    rv, out = getstatusoutput(
+        f"printf 'date,hours\n01/06/2021,8\n' | "
+        f"python3 {prg} imp -B {TEMP_DB} -u test -F csv -"
+    )
+    assert rv == 0
+
+    rv, out = getstatusoutput(f"python3 {prg} import -B {TEMP_DB} -u test file.txt")
+    assert rv == 7
+    assert "unknown format" in out
+
+
 # --------------------------------------------------
 def test_delete_database():
     """delete database"""